@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+class LocalLRUCache:
+    """Small thread-safe in-process LRU used as the first cache tier."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+STOCKS_VERSION_KEY = "data-version:stocks"
+
+_local_responses = LocalLRUCache(getattr(settings, "RESPONSE_LOCAL_CACHE_SIZE", 1024))
+
+def _user_version_key(user_id) -> str:
+    return f"data-version:user:{user_id}"
+
+def _versions(keys):
+    """
+    Current value of each version counter, from one round trip to Redis.
+    Missing counters are seeded from the clock, so an evicted counter never
+    comes back with a number that old cached entries were stored under.
+    """
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), timeout=None)
+        except Exception:
+            # Shared tier is best effort; cached responses still expire after RESPONSE_CACHE_TTL.
+            pass
+
+def bump_data_version(*user_ids):
+    """Invalidate every cached response of these users once the current transaction commits."""
+    keys = [_user_version_key(user_id) for user_id in set(user_ids)]
+    transaction.on_commit(lambda: _bump(keys))
+
+def bump_stocks_version():
+    """Invalidate every cached response that depends on stock prices (all users)."""
+    transaction.on_commit(lambda: _bump([STOCKS_VERSION_KEY]))
+
+def cached_response(name, build, user=None, params=(), stocks=False):
+    """
+    Return build() cached under name + params and the relevant data versions:
+    the user's (bumped by writes to their transactions, accounts, budget,
+    holdings and wishlist) and, with stocks=True, the global stock-price one.
+    Reads go to the in-process LRU first, then Redis, then build(); a version
+    bump changes the key, so entries never need explicit deletion. Exceptions
+    from build() propagate and nothing is cached.
+    """
+    version_keys = ([_user_version_key(user.pk)] if user is not None else []) + ([STOCKS_VERSION_KEY] if stocks else [])
+    try:
+        versions = _versions(version_keys)
+    except Exception:
+        return build()
+
+    key = ":".join(["response", name, str(user.pk) if user is not None else "-", *map(str, versions), *map(str, params)])
+    now = time.time()
+    entry = _local_responses.get(key)
+    if entry is None or entry["expires_at"] <= now:
+        try:
+            entry = cache.get(key)
+        except Exception:
+            entry = None
+        if entry is not None:
+            _local_responses.set(key, entry)
+    if entry is not None and entry["expires_at"] > now:
+        return entry["value"]
+
+    timeout = getattr(settings, "RESPONSE_CACHE_TTL", 300)
+    entry = {"value": build(), "expires_at": now + timeout}
+    _local_responses.set(key, entry)
+    try:
+        cache.set(key, entry, timeout=timeout)
+    except Exception:
+        pass
+    return entry["value"]
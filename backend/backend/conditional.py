@@ -0,0 +1,113 @@
+import hashlib
+from datetime import datetime
+from django.db.models import Count, Max
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from django.utils.translation import gettext_lazy as _
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+class ConditionalGetMixin:
+    """
+    Conditional GET for viewsets whose rows carry updated_at. The validators
+    come from one aggregate over the filtered queryset: Max(updated_at) of the
+    rows, Max() of every path in conditional_dependencies (related rows that
+    change the serialised body, e.g. the stock price behind a holding), the
+    row count, so a deleted or hidden row changes the ETag too, and whatever
+    conditional_fingerprint() adds for inputs that are not rows at all.
+
+    The aggregate runs at most once per request: before the body for a
+    conditional request, where a match answers 304 before any row is fetched
+    or serialised; otherwise after it, when finalize_response attaches the
+    validators to the 200. Lists only get an ETag: a deleted or hidden row
+    leaves Max(updated_at) where it was, so Last-Modified / If-Modified-Since
+    are used for single rows only.
+
+    apply_updated_since() narrows a list to rows changed after ?updated_since
+    (an ISO 8601 timestamp) for clients that keep a local copy.
+    """
+
+    updated_since_param = 'updated_since'
+    conditional_dependencies = ()
+
+    def apply_updated_since(self, queryset):
+        value = self.request.query_params.get(self.updated_since_param)
+        if not value:
+            return queryset
+        try:
+            since = parse_datetime(value.replace(' ', '+'))
+        except ValueError:
+            since = None
+        if since is None:
+            raise ValidationError({self.updated_since_param: [_("Enter a valid ISO 8601 timestamp.")]})
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+        return queryset.filter(updated_at__gt=since)
+
+    def conditional_fingerprint(self):
+        """
+        Extra ETag parts for bodies that depend on more than the rows (e.g. the
+        current month); datetimes among them count towards Last-Modified too.
+        """
+        return ()
+
+    def conditional_validators(self):
+        """(ETag, Last-Modified) of the queryset given to not_modified(), computed on first use."""
+        if getattr(self, '_validators', None) is None:
+            aggregates = {'count': Count('pk', distinct=bool(self.conditional_dependencies)), 'updated_at': Max('updated_at')}
+            for index, path in enumerate(self.conditional_dependencies):
+                aggregates[f'dependency_{index}'] = Max(path)
+            stats = self._conditional_queryset.order_by().aggregate(**aggregates)
+            extra = list(self.conditional_fingerprint())
+
+            timestamps = [value for name, value in stats.items() if name != 'count' and value is not None]
+            timestamps += [part for part in extra if isinstance(part, datetime)]
+            last_modified = max(timestamps) if timestamps else None
+            fingerprint = '|'.join([
+                str(self.request.user.pk), self.request.get_full_path(), str(stats.pop('count')),
+                *(value.isoformat() if value else '-' for value in stats.values()),
+                *(part.isoformat() if isinstance(part, datetime) else str(part) for part in extra),
+            ])
+            self._validators = ('W/"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest(), last_modified)
+        return self._validators
+
+    def not_modified(self, queryset, single=False):
+        """Remember `queryset` for the validators and return a 304 if the client's copy is current, else None."""
+        self._conditional_queryset, self._conditional_started = queryset, timezone.now()
+        self._conditional_single = single
+        if_none_match = self.request.headers.get('If-None-Match')
+        if_modified_since = self.request.headers.get('If-Modified-Since') if single else None
+        if not if_none_match and not if_modified_since:
+            return None
+
+        etag, last_modified = self.conditional_validators()
+        if if_none_match:
+            etags = {value.removeprefix('W/') for value in parse_etags(if_none_match)}
+            modified = '*' not in etags and etag.removeprefix('W/') not in etags
+        else:
+            since = parse_http_date_safe(if_modified_since)
+            modified = since is None or last_modified is None or int(last_modified.timestamp()) > since
+        return None if modified else Response(status=status.HTTP_304_NOT_MODIFIED)
+
+    def object_not_modified(self, instance):
+        """not_modified() for a single row already fetched with get_object()."""
+        return self.not_modified(self.get_queryset().filter(pk=instance.pk), single=True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, '_conditional_queryset', None) is None:
+            return response
+        if response.status_code not in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            return response
+        after_body = getattr(self, '_validators', None) is None
+        etag, last_modified = self.conditional_validators()
+        response['Cache-Control'] = 'private, no-cache'
+        if after_body and last_modified is not None and last_modified >= self._conditional_started:
+            # A row changed while the body was built, so it may not be in it: no validators, the next GET refetches.
+            return response
+        response['ETag'] = etag
+        if self._conditional_single and last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
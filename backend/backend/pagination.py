@@ -0,0 +1,95 @@
+import base64
+import json
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination over the view's keyset_ordering, a unique ordering such
+    as ('-date', '-created_at', '-id') backed by a composite index. Each page
+    is fetched by comparing against the last row of the previous page, so a
+    deep page costs the same as the first one (no OFFSET scan), and no COUNT
+    is issued unless the client asks for it with ?count=true.
+
+    Opt-in: it only kicks in when the request carries `cursor` or
+    `page_size`; without either the endpoint keeps returning the full list.
+    In cursor mode ?ordering= is ignored, since the cursor only makes sense
+    for the keyset order.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.keys = [(name.lstrip('-'), name.startswith('-')) for name in view.keyset_ordering]
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if params.get(self.count_query_param, '').lower() in ('1', 'true'):
+            self.count = queryset.count()
+
+        queryset = queryset.order_by(*view.keyset_ordering)
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self.after(self.decode_cursor(cursor, queryset.model)))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.next_cursor = self.encode_cursor(rows[self.page_size - 1]) if len(rows) > self.page_size else None
+        return rows[:self.page_size]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(size, 1), self.max_page_size)
+
+    def after(self, values):
+        """(a, b, c) strictly after the cursor: a past it, or a equal and b past it, and so on."""
+        condition, equal = Q(), Q()
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def encode_cursor(self, row):
+        values = [row._meta.get_field(name).value_to_string(row) for name, _descending in self.keys]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            names = [name for name, _descending in self.keys]
+            if len(values) != len(names):
+                raise ValueError(cursor)
+            return [model._meta.get_field(name).to_python(value) for name, value in zip(names, values)]
+        except (ValueError, TypeError, DjangoValidationError):
+            raise NotFound('Invalid cursor')
+
+    def get_paginated_response(self, data):
+        response = {
+            'results': data,
+            'next': self.get_next_link(),
+            'next_cursor': self.next_cursor,
+            'page_size': self.page_size,
+        }
+        if self.count is not None:
+            response['count'] = self.count
+        return Response(response)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from datetime import timedelta
 from pathlib import Path
 
+from celery.schedules import crontab
 from decouple import config
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -139,6 +140,10 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# Uploaded files (stored transaction imports); must be shared storage between web and worker hosts.
+MEDIA_URL = 'media/'
+MEDIA_ROOT = config('MEDIA_ROOT', default=str(BASE_DIR / 'media'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -163,6 +168,89 @@ CELERY_BROKER_CONNECTION_MAX_RETRIES = 100
 # Redis-specific optimizations
 CELERY_REDIS_MAX_CONNECTIONS = 20
 
+# Shared cache tier on the same Redis instance (separate db from the broker)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('CACHE_REDIS_URL', default='redis://localhost:6378/1'),
+        'KEY_PREFIX': 'financeapp',
+    }
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'refresh-stock-prices': {
+        'task': 'portfolio.tasks.refresh_stock_prices',
+        'schedule': config('STOCK_PRICE_REFRESH_INTERVAL', default=60, cast=int),
+    },
+    'refresh-all-portfolio-summaries': {
+        'task': 'portfolio.tasks.refresh_all_portfolio_summaries',
+        'schedule': crontab(hour=2, minute=0),
+    },
+    'process-recurring-transactions': {
+        'task': 'expense.tasks.process_recurring_transactions',
+        'schedule': crontab(minute=5),
+    },
+    # Catch-up passes for retries; new mails also wake the dispatchers directly.
+    'dispatch-pending-emails': {
+        'task': 'user.tasks.dispatch_pending_emails',
+        'schedule': 60,
+    },
+    'dispatch-price-alert-emails': {
+        'task': 'portfolio.tasks.dispatch_price_alert_emails',
+        'schedule': 60,
+    },
+    'prune-email-outbox': {
+        'task': 'user.tasks.prune_email_outbox',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'prune-sync-tombstones': {
+        'task': 'user.tasks.prune_sync_tombstones',
+        'schedule': crontab(hour=3, minute=30),
+    },
+}
+
+# Finnhub setup
+FINNHUB_API_KEY = config('FINNHUB_API_KEY', default='')
+HTTP_TIMEOUT = 8
+FINNHUB_REQUESTS_PER_SECOND = config('FINNHUB_REQUESTS_PER_SECOND', default=25, cast=float)
+FINNHUB_MAX_WORKERS = config('FINNHUB_MAX_WORKERS', default=8, cast=int)
+STOCK_PRICE_REFRESH_BATCH_SIZE = 200
+FINNHUB_LOCAL_CACHE_SIZE = 2048
+FINNHUB_PROFILE_CACHE_TTL = 60 * 60 * 24 * 7
+FINNHUB_PROFILE_STALE_TTL = 60 * 60 * 24 * 30
+FINNHUB_QUOTE_CACHE_TTL = 30
+FINNHUB_QUOTE_STALE_TTL = 60 * 5
+
+PORTFOLIO_SUMMARY_REFRESH_CHUNK_SIZE = 1000
+PORTFOLIO_SUMMARY_FANOUT_CHUNK_SIZE = 500
+
+TRANSACTION_IMPORT_CHUNK_SIZE = 1000
+TRANSACTION_IMPORT_ERROR_SAMPLE_ROWS = 20
+TRANSACTION_IMPORT_MAX_STREAM_SIZE = 200 * 1024 * 1024
+TRANSACTION_IMPORT_SYNC_MAX_SIZE = 5 * 1024 * 1024
+
+RECURRING_BATCH_SIZE = 500
+RECURRING_MAX_CATCH_UP = 366
+
+# Utilisation percentages that trigger a budget alert when a write crosses them
+BUDGET_ALERT_THRESHOLDS = (80, 100)
+
+ANALYTICS_MAX_BUCKETS = 400
+
+# Cached read endpoints (invalidated by per-user / stock-price data versions)
+RESPONSE_CACHE_TTL = 60 * 5
+RESPONSE_LOCAL_CACHE_SIZE = 1024
+
+# Mobile delta sync (user/sync/); changes younger than the lag (or, on Postgres, than the oldest open transaction) wait for the next call
+SYNC_PAGE_SIZE = 500
+SYNC_MAX_PAGE_SIZE = 2000
+SYNC_COMMIT_LAG_SECONDS = 2
+SYNC_TOMBSTONE_RETENTION_DAYS = 90
+
+PRICE_ALERT_COOLDOWN_HOURS = 24
+PRICE_ALERT_BATCH_SIZE = 5000
+ALERT_INDEX_REBUILD_SECONDS = 60 * 60
+
 # Email setup
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = 'smtp.gmail.com'
@@ -171,6 +259,12 @@ EMAIL_HOST_USER = 'atlantic.march11@gmail.com'
 EMAIL_HOST_PASSWORD = 'wqum nrfq myjy gder'
 EMAIL_USE_TLS = True
 DEFAULT_FROM_EMAIL = 'FinancialApp <noreply@hello.com>'
+EMAIL_DISPATCH_BATCH_SIZE = 200
+EMAIL_MAX_ATTEMPTS = 5
+EMAIL_RETRY_BASE_SECONDS = 60
+EMAIL_RETRY_MAX_SECONDS = 60 * 60
+EMAIL_CLAIM_LEASE_SECONDS = 60 * 10
+EMAIL_OUTBOX_RETENTION_DAYS = 3
 
 # Google setup
 GOOGLE_OAUTH2_CLIENT_ID = '1034638916922-m87ikgv2679tj17bnb7skda96l3s98g1.apps.googleusercontent.com'
@@ -0,0 +1,70 @@
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+
+class DateRange:
+    """
+    Half-open [start, end) range of aware timestamps built from inclusive
+    day bounds (?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD) in the current
+    timezone. Filtering with date__gte/date__lt keeps the comparison on the
+    raw indexed column; date__date lookups wrap it in a cast, so the
+    (user, type, date) style indexes cannot be used.
+    """
+
+    def __init__(self, date_from=None, date_to=None):
+        self.date_from = date_from
+        self.date_to = date_to
+        self.start = self.start_of_day(date_from) if date_from else None
+        self.end = self.start_of_day(date_to + timedelta(days=1)) if date_to else None
+
+    @staticmethod
+    def start_of_day(day):
+        return timezone.make_aware(datetime.combine(day, time.min))
+
+    @classmethod
+    def from_params(cls, params, from_param='date_from', to_param='date_to'):
+        errors, bounds = {}, {}
+        for param in (from_param, to_param):
+            value = params.get(param)
+            if not value:
+                bounds[param] = None
+                continue
+            try:
+                bounds[param] = parse_date(value)
+            except ValueError:
+                bounds[param] = None
+            if bounds[param] is None:
+                errors[param] = [_("Enter a valid date in YYYY-MM-DD format.")]
+        if not errors and bounds[from_param] and bounds[to_param] and bounds[from_param] > bounds[to_param]:
+            errors[to_param] = [_("End date must be on or after the start date.")]
+        if errors:
+            raise ValidationError(errors)
+        return cls(bounds[from_param], bounds[to_param])
+
+    @classmethod
+    def for_month(cls, value):
+        """The calendar month containing `value` (a date or aware datetime)."""
+        if isinstance(value, datetime):
+            value = timezone.localtime(value).date()
+        first = value.replace(day=1)
+        last = (first + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        return cls(first, last)
+
+    def __bool__(self):
+        return self.start is not None or self.end is not None
+
+    def filter(self, queryset, field='date'):
+        if self.start is not None:
+            queryset = queryset.filter(**{f'{field}__gte': self.start})
+        if self.end is not None:
+            queryset = queryset.filter(**{f'{field}__lt': self.end})
+        return queryset
+
+    def as_period(self):
+        return {
+            'from': self.date_from.isoformat() if self.date_from else None,
+            'to': self.date_to.isoformat() if self.date_to else None,
+        }
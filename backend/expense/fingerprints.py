@@ -0,0 +1,55 @@
+import hashlib
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+
+CENT = Decimal('0.01')
+
+
+def normalize_description(description):
+    return ' '.join((description or '').lower().split())
+
+
+def base_fingerprint(user_id, account_id, date, amount, transaction_type, description):
+    """Identity of a transaction's content, before telling identical rows apart."""
+    key = '|'.join((
+        str(user_id),
+        str(account_id),
+        date.astimezone(dt_timezone.utc).isoformat(),
+        str(Decimal(amount).quantize(CENT)),
+        transaction_type,
+        normalize_description(description),
+    ))
+    return hashlib.sha256(key.encode('utf-8')).digest()
+
+
+def split_known(transactions):
+    """
+    Split unsaved fingerprinted transactions into (new, known): known ones
+    repeat a fingerprint already stored for their user, or one earlier in
+    `transactions`. One indexed IN query. Fingerprints cover the account, so
+    with the accounts locked (balance_service.lock_accounts) a concurrent
+    writer of the same rows waits and then finds them stored.
+    """
+    from expense.models import Transaction
+
+    stored = set(
+        Transaction.objects.filter(
+            user_id__in={transaction_obj.user_id for transaction_obj in transactions},
+            fingerprint__in=[transaction_obj.fingerprint for transaction_obj in transactions],
+        ).values_list('user_id', 'fingerprint')
+    )
+    new, known = [], []
+    for transaction_obj in transactions:
+        key = (transaction_obj.user_id, transaction_obj.fingerprint)
+        (known if key in stored else new).append(transaction_obj)
+        stored.add(key)
+    return new, known
+
+
+def transaction_fingerprint(base, occurrence):
+    """
+    Final fingerprint: the base content hash plus the row's occurrence number
+    among identical rows of the same upload, so two genuine identical coffees
+    on one day stay two transactions while a re-upload still matches both.
+    """
+    return hashlib.sha256(base + occurrence.to_bytes(4, 'big')).hexdigest()
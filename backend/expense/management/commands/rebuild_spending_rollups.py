@@ -0,0 +1,33 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from expense.models import MonthlySpendingRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly spending rollup table from transactions'
+
+    CHUNK_SIZE = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            help='Only rebuild the user with this email',
+        )
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('pk')
+        if options['user']:
+            users = users.filter(email=options['user'])
+            if not users.exists():
+                self.stdout.write(self.style.WARNING(f"⚠ No user with email {options['user']}"))
+                return
+
+        user_ids = list(users.values_list('pk', flat=True))
+        buckets = 0
+        for start in range(0, len(user_ids), self.CHUNK_SIZE):
+            buckets += MonthlySpendingRollup.rebuild(user_ids[start:start + self.CHUNK_SIZE])
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {buckets} rollup buckets for {len(user_ids)} users'))
+        self.stdout.write('='*50)
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+from expense.fingerprints import base_fingerprint, transaction_fingerprint
+
+
+def backfill_fingerprints(apps, schema_editor):
+    Transaction = apps.get_model('expense', 'Transaction')
+    rows = Transaction.objects.order_by('user_id', 'created_at', 'id')
+    occurrences, current_user, batch = {}, None, []
+    for transaction in rows.iterator(chunk_size=2000):
+        if transaction.user_id != current_user:
+            occurrences, current_user = {}, transaction.user_id
+        base = base_fingerprint(
+            transaction.user_id, transaction.account_id, transaction.date,
+            transaction.amount, transaction.type, transaction.description,
+        )
+        occurrence = occurrences.get(base, 0)
+        occurrences[base] = occurrence + 1
+        transaction.fingerprint = transaction_fingerprint(base, occurrence)
+        batch.append(transaction)
+        if len(batch) >= 2000:
+            Transaction.objects.bulk_update(batch, ['fingerprint'])
+            batch = []
+    if batch:
+        Transaction.objects.bulk_update(batch, ['fingerprint'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0004_transactionimportjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='fingerprint',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_fingerprints, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='transactionimportjob',
+            name='duplicate_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['user', 'fingerprint'], name='main_transa_user_id_1da599_idx'),
+        ),
+    ]
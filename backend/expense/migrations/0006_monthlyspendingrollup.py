@@ -0,0 +1,52 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:20
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Transaction = apps.get_model('expense', 'Transaction')
+    MonthlySpendingRollup = apps.get_model('expense', 'MonthlySpendingRollup')
+    rows = (
+        Transaction.objects.annotate(month=TruncMonth('date', output_field=DateField()))
+        .values('user_id', 'month', 'category', 'type', 'status')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+    MonthlySpendingRollup.objects.bulk_create(
+        (MonthlySpendingRollup(**row) for row in rows.iterator()), batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0005_transaction_fingerprint'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlySpendingRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('category', models.CharField(choices=[('SALARY', 'Salary'), ('BUSINESS', 'Business Income'), ('INVESTMENT', 'Investment Returns'), ('FREELANCE', 'Freelance/Consulting'), ('RENTAL', 'Rental Income'), ('BONUS', 'Bonus/Commission'), ('REFUND', 'Refunds'), ('GIFT', 'Gifts Received'), ('FOOD', 'Food & Dining'), ('GROCERIES', 'Groceries'), ('TRANSPORT', 'Transportation'), ('FUEL', 'Fuel/Gas'), ('BILLS', 'Bills & Utilities'), ('RENT', 'Rent/Mortgage'), ('INSURANCE', 'Insurance'), ('HEALTHCARE', 'Healthcare'), ('SHOPPING', 'Shopping'), ('CLOTHING', 'Clothing & Accessories'), ('ENTERTAINMENT', 'Entertainment'), ('EDUCATION', 'Education'), ('TRAVEL', 'Travel'), ('FITNESS', 'Fitness & Sports'), ('PERSONAL_CARE', 'Personal Care'), ('SUBSCRIPTIONS', 'Subscriptions'), ('SAVINGS', 'Savings'), ('INVESTMENTS', 'Investments'), ('LOAN_PAYMENT', 'Loan Payments'), ('CREDIT_CARD', 'Credit Card Payment'), ('BANK_FEES', 'Bank Fees'), ('TAXES', 'Taxes'), ('CHILDCARE', 'Childcare'), ('PET_CARE', 'Pet Care'), ('CHARITY', 'Charity/Donations'), ('GIFTS_GIVEN', 'Gifts Given'), ('HOME_IMPROVEMENT', 'Home Improvement'), ('MAINTENANCE', 'Maintenance & Repairs'), ('OTHER', 'Other')], max_length=20)),
+                ('type', models.CharField(choices=[('INCOME', 'Income'), ('EXPENSE', 'Expense')], max_length=10)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], max_length=10)),
+                ('total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20)),
+                ('count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spending_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'main_monthly_spending_rollups',
+                'constraints': [models.UniqueConstraint(fields=('user', 'month', 'category', 'type', 'status'), name='unique_spending_rollup_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
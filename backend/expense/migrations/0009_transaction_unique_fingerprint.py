@@ -0,0 +1,39 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_duplicate_fingerprints(apps, schema_editor):
+    # Rows that slipped past the old read-then-insert check: the oldest keeps the fingerprint.
+    Transaction = apps.get_model('expense', 'Transaction')
+    duplicated = (
+        Transaction.objects.filter(fingerprint__isnull=False)
+        .values('user_id', 'fingerprint')
+        .annotate(rows=models.Count('id'))
+        .filter(rows__gt=1)
+    )
+    for group in duplicated.iterator():
+        rows = Transaction.objects.filter(user_id=group['user_id'], fingerprint=group['fingerprint'])
+        keep = rows.order_by('created_at', 'id').values_list('id', flat=True).first()
+        rows.exclude(id=keep).update(fingerprint=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('expense', '0008_transaction_updated_at_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_fingerprints, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('fingerprint__isnull', False)), fields=('user', 'fingerprint'), name='unique_transaction_fingerprint'),
+        ),
+        migrations.RemoveIndex(
+            model_name='transaction',
+            name='main_transa_user_id_1da599_idx',
+        ),
+    ]
@@ -1,16 +1,26 @@
-from django.db import models, transaction
+from django.db import IntegrityError, models, transaction
 from decimal import Decimal
 import uuid
 from django.core.validators import MinValueValidator
 from django.contrib.auth import get_user_model
+from django.db.models import ExpressionWrapper
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.functional import cached_property
 from datetime import timedelta, datetime
 from django.core.exceptions import ValidationError
+from backend.cache import bump_data_version
+from user.models import SyncTombstone
 
 
 User = get_user_model()
 
 
+def clear_cached_properties(instance):
+    for name in instance.CACHED_PROPERTIES:
+        instance.__dict__.pop(name, None)
+
+
 class AccountType(models.TextChoices):
     CURRENT = 'CURRENT', 'Current Account'
     SAVINGS = 'SAVINGS', 'Savings Account'
@@ -132,8 +142,21 @@ class Account(TimeStampedModel):
     
     def save(self, *args, **kwargs):
         if self.is_default:
-            Account.objects.filter(user=self.user, is_default=True).update(is_default=False)
+            Account.objects.filter(user=self.user, is_default=True).update(is_default=False, updated_at=timezone.now())
         super().save(*args, **kwargs)
+        bump_data_version(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        bump_data_version(self.user_id)
+        with transaction.atomic():
+            # The account's transactions go with it through the cascade, which skips Transaction.delete,
+            # so their tombstones and rollup contributions are handled here.
+            cascaded = list(self.transactions.only('id', 'user_id', 'date', 'category', 'type', 'status', 'amount'))
+            SyncTombstone.record(self.user_id, SyncTombstone.Entity.TRANSACTION, [transaction_obj.pk for transaction_obj in cascaded])
+            SyncTombstone.record(self.user_id, SyncTombstone.Entity.ACCOUNT, [self.pk])
+            result = super().delete(*args, **kwargs)
+            MonthlySpendingRollup.apply_keys(removed=[transaction_obj.rollup_key() for transaction_obj in cascaded])
+        return result
 
 
 class Transaction(TimeStampedModel):
@@ -174,6 +197,8 @@ class Transaction(TimeStampedModel):
         default=TransactionStatus.COMPLETED,
         db_index=True
     )
+    # Content hash used to skip rows already imported (see expense.fingerprints).
+    fingerprint = models.CharField(max_length=64, blank=True, null=True, editable=False)
 
     user = models.ForeignKey(
         User,
@@ -197,6 +222,16 @@ class Transaction(TimeStampedModel):
             models.Index(fields=['is_recurring', 'next_recurring_date']),
             models.Index(fields=['status', 'date']),
             models.Index(fields=['user', 'account', 'type', 'status']),
+            models.Index(fields=['user', '-date', '-created_at', '-id']),
+            models.Index(fields=['user', 'updated_at']),
+        ]
+        constraints = [
+            # Imports and recurring generation check fingerprints before inserting; this catches what slips past.
+            models.UniqueConstraint(
+                fields=['user', 'fingerprint'],
+                condition=models.Q(fingerprint__isnull=False),
+                name='unique_transaction_fingerprint'
+            )
         ]
     
     def __str__(self):
@@ -209,12 +244,45 @@ class Transaction(TimeStampedModel):
         if not self.is_recurring and self.recurring_interval:
             raise ValidationError("Recurring interval should not be set for non-recurring transactions")
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_rollup_key = instance.rollup_key() if instance.has_rollup_fields() else None
+        return instance
+
+    def has_rollup_fields(self):
+        deferred = self.get_deferred_fields()
+        return not deferred.intersection(('date', 'category', 'type', 'status', 'amount', 'user_id'))
+
+    def rollup_key(self):
+        """
+        (user, month, category, type, status, amount, date): the bucket and
+        amount this row contributes to MonthlySpendingRollup, plus its date so
+        budget alerts can leave out charges that are not due yet.
+        """
+        return (self.user_id, month_start(self.date), self.category, self.type, self.status, self.amount, self.date)
+
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            previous = getattr(self, '_loaded_rollup_key', None)
+            current = self.rollup_key()
+            if previous != current:
+                MonthlySpendingRollup.apply_keys(removed=[previous] if previous else [], added=[current])
+            self._loaded_rollup_key = current
         
         if self.status == TransactionStatus.COMPLETED:
             self.update_account_balance()
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            previous = getattr(self, '_loaded_rollup_key', None)
+            SyncTombstone.record(self.user_id, SyncTombstone.Entity.TRANSACTION, [self.pk])
+            result = super().delete(*args, **kwargs)
+            if previous:
+                MonthlySpendingRollup.apply_keys(removed=[previous])
+        return result
     
     def update_account_balance(self):
         with transaction.atomic():
@@ -230,6 +298,166 @@ class Transaction(TimeStampedModel):
             account.save(update_fields=['balance', 'updated_at'])  # CHANGED: Removed 'is_default' from update_fields
 
 
+def month_start(value):
+    """First day of the month `value` falls in, in the active timezone (matches TruncMonth)."""
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+class MonthlySpendingRollup(models.Model):
+    """
+    Running totals of transactions per user, month, category, type and status.
+    Kept in step by Transaction.save()/delete() and by the bulk paths
+    (imports, recurring materialisation), so budget and summary reads touch
+    a handful of rows instead of scanning main_transactions.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='spending_rollups')
+    month = models.DateField()
+    category = models.CharField(max_length=20, choices=TransactionCategory.choices)
+    type = models.CharField(max_length=10, choices=TransactionType.choices)
+    status = models.CharField(max_length=10, choices=TransactionStatus.choices)
+    total = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
+    count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'main_monthly_spending_rollups'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'month', 'category', 'type', 'status'],
+                name='unique_spending_rollup_bucket'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} {self.month:%Y-%m} {self.category} {self.type} {self.status}: {self.total}"
+
+    @classmethod
+    def apply_keys(cls, removed=(), added=()):
+        """
+        Fold rollup keys (see Transaction.rollup_key) into the table: removed
+        keys subtract, added keys add. Deltas are summed per bucket first so
+        a bulk insert costs one UPDATE (or INSERT) per touched bucket.
+        Users whose completed expenses to date for the current month went up
+        are then checked for budget threshold crossings, and every touched
+        user's cached responses are invalidated once the write commits.
+        """
+        now = timezone.now()
+        current_month, deltas, increments = month_start(now), {}, {}
+        for sign, keys in ((-1, removed), (1, added)):
+            for user_id, month, category, type_, status, amount, date in keys:
+                bucket = (user_id, month, category, type_, status)
+                total, count = deltas.get(bucket, (Decimal('0.00'), 0))
+                deltas[bucket] = (total + sign * Decimal(amount), count + sign)
+                if (month == current_month and date <= now
+                        and type_ == TransactionType.EXPENSE and status == TransactionStatus.COMPLETED):
+                    increments[user_id] = increments.get(user_id, Decimal('0.00')) + sign * Decimal(amount)
+        with transaction.atomic():
+            for (user_id, month, category, type_, status), (total, count) in deltas.items():
+                if not total and not count:
+                    continue
+                bucket = dict(user_id=user_id, month=month, category=category, type=type_, status=status)
+                updated = cls.objects.filter(**bucket).update(
+                    total=models.F('total') + total, count=models.F('count') + count, updated_at=timezone.now()
+                )
+                if not updated:
+                    try:
+                        with transaction.atomic():
+                            cls.objects.create(total=total, count=count, **bucket)
+                    except IntegrityError:
+                        # Another writer created the bucket first.
+                        cls.objects.filter(**bucket).update(
+                            total=models.F('total') + total, count=models.F('count') + count, updated_at=timezone.now()
+                        )
+            increments = {user_id: total for user_id, total in increments.items() if total > 0}
+            if increments:
+                from expense.services.budget_alert_service import evaluate_budget_alerts
+                evaluate_budget_alerts(increments)
+        if deltas:
+            bump_data_version(*{user_id for user_id, *_bucket in deltas})
+
+    @classmethod
+    def add_transactions(cls, transactions):
+        """Account for freshly bulk-created transactions (bulk_create skips save())."""
+        cls.apply_keys(added=[transaction_obj.rollup_key() for transaction_obj in transactions])
+
+    @classmethod
+    def rebuild(cls, user_ids=None):
+        """Recompute buckets from main_transactions with one grouped query."""
+        from django.db.models.functions import TruncMonth
+
+        transactions = Transaction.objects.all()
+        buckets = cls.objects.all()
+        if user_ids is not None:
+            transactions = transactions.filter(user_id__in=user_ids)
+            buckets = buckets.filter(user_id__in=user_ids)
+        rows = (
+            transactions.annotate(month=TruncMonth('date', output_field=models.DateField()))
+            .values('user_id', 'month', 'category', 'type', 'status')
+            .annotate(total=models.Sum('amount'), count=models.Count('id'))
+            .order_by()
+        )
+        with transaction.atomic():
+            buckets.delete()
+            created = cls.objects.bulk_create((cls(**row) for row in rows.iterator()), batch_size=1000)
+        return len(created)
+
+    @classmethod
+    def month_totals(cls, user, month, type_=None, status=TransactionStatus.COMPLETED):
+        """{category: (total, count)} for one user and month."""
+        rows = cls.objects.filter(user=user, month=month, status=status)
+        if type_:
+            rows = rows.filter(type=type_)
+        return {
+            category: (total, count)
+            for category, total, count in rows.filter(count__gt=0).values_list('category', 'total', 'count')
+        }
+
+
+def not_yet_due_expenses(now):
+    """
+    Completed expenses dated after `now` but within its month: they are in
+    the month's rollup bucket, but budgets count spending to date only.
+    """
+    from expense.filters import DateRange
+
+    return Transaction.objects.filter(
+        type=TransactionType.EXPENSE,
+        status=TransactionStatus.COMPLETED,
+        date__gt=now,
+        date__lt=DateRange.for_month(now).end,
+    )
+
+
+class BudgetQuerySet(models.QuerySet):
+    def with_current_month_expenses(self):
+        """
+        Pre-fill current_month_expenses with correlated sums (the month's
+        rollup buckets minus the expenses not due yet), so serialising
+        budgets costs no extra queries.
+        """
+        now = timezone.now()
+        money = models.DecimalField(max_digits=15, decimal_places=2)
+        expenses = MonthlySpendingRollup.objects.filter(
+            user_id=models.OuterRef('user_id'),
+            month=month_start(now),
+            type=TransactionType.EXPENSE,
+            status=TransactionStatus.COMPLETED,
+        ).values('user_id').annotate(total=models.Sum('total')).values('total')
+        scheduled = (
+            not_yet_due_expenses(now).filter(user_id=models.OuterRef('user_id'))
+            .values('user_id').annotate(total=models.Sum('amount')).values('total')
+        )
+        return self.annotate(current_month_expenses=ExpressionWrapper(
+            Coalesce(models.Subquery(expenses), models.Value(Decimal('0.00')), output_field=money)
+            - Coalesce(models.Subquery(scheduled), models.Value(Decimal('0.00')), output_field=money),
+            output_field=money,
+        ))
+
+
 class Budget(TimeStampedModel):
     amount = models.DecimalField(
         max_digits=15,
@@ -243,6 +471,8 @@ class Budget(TimeStampedModel):
         on_delete=models.CASCADE,
         related_name='budget'
     )
+
+    objects = BudgetQuerySet.as_manager()
     
     class Meta:
         db_table = 'main_budgets'
@@ -250,25 +480,45 @@ class Budget(TimeStampedModel):
             models.Index(fields=['user', 'last_alert_sent']),
         ]
     
+    # Memoised per instance; cleared whenever the row is saved or reloaded.
+    CACHED_PROPERTIES = ('current_month_expenses', 'budget_utilization_percentage')
+
     def __str__(self):
         return f"{self.user.email} - Budget: {self.amount}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        clear_cached_properties(self)
+        bump_data_version(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        bump_data_version(self.user_id)
+        with transaction.atomic():
+            SyncTombstone.record(self.user_id, SyncTombstone.Entity.BUDGET, [self.pk])
+            return super().delete(*args, **kwargs)
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        clear_cached_properties(self)
     
-    @property
+    @cached_property
     def current_month_expenses(self):
+        """Completed expenses so far this month: the rollup bucket minus what is dated later in the month."""
         now = timezone.now()
-        start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        
-        return Transaction.objects.filter(
-            user=self.user,
+        bucket = MonthlySpendingRollup.objects.filter(
+            user_id=self.user_id,
+            month=month_start(now),
             type=TransactionType.EXPENSE,
             status=TransactionStatus.COMPLETED,
-            date__gte=start_of_month,
-            date__lte=now
         ).aggregate(
+            total=models.Sum('total')
+        )['total'] or Decimal('0.00')
+        scheduled = not_yet_due_expenses(now).filter(user_id=self.user_id).aggregate(
             total=models.Sum('amount')
         )['total'] or Decimal('0.00')
+        return bucket - scheduled
     
-    @property
+    @cached_property
     def budget_utilization_percentage(self):
         if self.amount == 0:
             return 0
@@ -286,3 +536,59 @@ class Budget(TimeStampedModel):
                 return False
         
         return True
+
+
+class ImportJobStatus(models.TextChoices):
+    PENDING = 'PENDING', 'Pending'
+    RUNNING = 'RUNNING', 'Running'
+    COMPLETED = 'COMPLETED', 'Completed'
+    FAILED = 'FAILED', 'Failed'
+
+
+class TransactionImportJob(TimeStampedModel):
+    csv_file = models.FileField(upload_to='transaction_imports/%Y/%m/')
+    original_filename = models.CharField(max_length=255)
+    status = models.CharField(
+        max_length=10,
+        choices=ImportJobStatus.choices,
+        default=ImportJobStatus.PENDING,
+        db_index=True
+    )
+    total_rows = models.IntegerField(blank=True, null=True)
+    rows_processed = models.IntegerField(default=0)
+    success_count = models.IntegerField(default=0)
+    duplicate_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='transaction_import_jobs',
+        db_index=True
+    )
+
+    class Meta:
+        db_table = 'main_transaction_import_jobs'
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Import {self.original_filename} ({self.status})"
+
+    @property
+    def progress_percentage(self):
+        if not self.total_rows:
+            return 100 if self.status == ImportJobStatus.COMPLETED else 0
+        return min(round(self.rows_processed * 100 / self.total_rows, 1), 100)
+
+    @property
+    def eta_seconds(self):
+        if self.status != ImportJobStatus.RUNNING or not self.started_at or not self.total_rows or not self.rows_processed:
+            return None
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining_rows = max(self.total_rows - self.rows_processed, 0)
+        return round(elapsed / self.rows_processed * remaining_rows)
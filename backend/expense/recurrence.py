@@ -0,0 +1,67 @@
+import calendar
+from datetime import datetime, timedelta
+from django.utils import timezone
+from .models import RecurringInterval
+
+FIXED_STEPS = {
+    RecurringInterval.DAILY: timedelta(days=1),
+    RecurringInterval.WEEKLY: timedelta(weeks=1),
+}
+MONTH_STEPS = {
+    RecurringInterval.MONTHLY: 1,
+    RecurringInterval.YEARLY: 12,
+}
+
+
+def local(value):
+    """
+    Aware datetimes in the active timezone, so steps follow the user's
+    calendar: a charge at 00:30 local on the 1st is still on the 1st even
+    though its UTC day-of-month is the previous one.
+    """
+    if isinstance(value, datetime) and timezone.is_aware(value):
+        return timezone.localtime(value)
+    return value
+
+
+def add_months(value, months):
+    """Same local day-of-month `months` later, clamped to the month's last day (Jan 31 -> Feb 28/29)."""
+    value = local(value)
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    day = min(value.day, calendar.monthrange(year, month)[1])
+    return value.replace(year=year, month=month, day=day)
+
+
+def add_interval(anchor, interval, periods=1):
+    """
+    The `periods`-th occurrence after `anchor`. Monthly and yearly steps are
+    always computed from the anchor, so a 31st-of-month schedule returns to
+    the 31st after a short month instead of drifting.
+    """
+    if interval in FIXED_STEPS:
+        return local(anchor) + FIXED_STEPS[interval] * periods
+    return add_months(anchor, MONTH_STEPS[interval] * periods)
+
+
+def periods_between(anchor, value, interval):
+    """How many whole periods after `anchor` the occurrence `value` is."""
+    if interval in FIXED_STEPS:
+        return round((value - anchor) / FIXED_STEPS[interval])
+    anchor, value = local(anchor), local(value)
+    months = (value.year - anchor.year) * 12 + value.month - anchor.month
+    return months // MONTH_STEPS[interval]
+
+
+def due_occurrences(anchor, next_date, interval, until, limit):
+    """
+    Occurrence dates from `next_date` up to `until` (at most `limit`), plus
+    the next date still in the future once those are materialised.
+    """
+    period = periods_between(anchor, next_date, interval)
+    dates = []
+    while next_date <= until and len(dates) < limit:
+        dates.append(next_date)
+        period += 1
+        next_date = add_interval(anchor, interval, period)
+    return dates, next_date
@@ -0,0 +1,93 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+from expense.filters import DateRange
+from expense.models import (
+    Account, MonthlySpendingRollup, Transaction, TransactionCategory, TransactionStatus, TransactionType
+)
+from expense.services.analytics_service import transaction_summary
+from user.models import UserCustom
+
+BENCH_EMAIL = 'summary-bench@example.com'
+
+
+def seed(user, rows):
+    """bulk_create `rows` random transactions over the last five years, then rebuild the user's rollup once."""
+    account, _created = Account.objects.get_or_create(user=user, name='Benchmark', defaults={'balance': Decimal('0.00')})
+    categories = TransactionCategory.values
+    statuses = [TransactionStatus.COMPLETED] * 8 + [TransactionStatus.PENDING, TransactionStatus.FAILED]
+    now = timezone.now()
+    for offset in range(0, rows, 10000):
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=user,
+                account=account,
+                type=random.choice(TransactionType.values),
+                amount=Decimal(random.randint(100, 100000)) / 100,
+                category=random.choice(categories),
+                date=now - timedelta(minutes=random.randint(0, 5 * 365 * 24 * 60)),
+                status=random.choice(statuses),
+            )
+            for _row in range(min(10000, rows - offset))
+        ], batch_size=10000)
+    MonthlySpendingRollup.rebuild([user.pk])
+
+
+def two_query_summary(user, date_range):
+    """The previous implementation: one aggregate, then a second grouped query over the same rows."""
+    queryset = date_range.filter(Transaction.objects.filter(user=user))
+    stats = queryset.aggregate(
+        total_income=Sum('amount', filter=Q(type=TransactionType.INCOME, status=TransactionStatus.COMPLETED)),
+        total_expense=Sum('amount', filter=Q(type=TransactionType.EXPENSE, status=TransactionStatus.COMPLETED)),
+        completed_count=Count('id', filter=Q(status=TransactionStatus.COMPLETED)),
+        pending_count=Count('id', filter=Q(status=TransactionStatus.PENDING)),
+        failed_count=Count('id', filter=Q(status=TransactionStatus.FAILED)),
+    )
+    breakdown = list(
+        queryset.filter(status=TransactionStatus.COMPLETED)
+        .values('category', 'type').annotate(total=Sum('amount')).order_by('-total')
+    )
+    return stats, breakdown
+
+
+def timed(label, func, repeat):
+    timings = []
+    for _run in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    best, mean = min(timings), sum(timings) / len(timings)
+    print(f"{label:<32} best {best * 1000:9.1f} ms   mean {mean * 1000:9.1f} ms")
+    return best
+
+
+def run(*args):
+    """
+    python manage.py runscript summary_benchmark --script-args 1000000 5
+    Seeds a dedicated user up to N transactions (default 1M; existing rows
+    are reused), then times the transaction summary: the old two-query
+    version against the single grouped pass, over a date range and undated.
+    """
+    rows = int(args[0]) if args else 1000000
+    repeat = int(args[1]) if len(args) > 1 else 5
+    user, _created = UserCustom.objects.get_or_create(email=BENCH_EMAIL, defaults={'username': 'summary-bench'})
+
+    existing = Transaction.objects.filter(user=user).count()
+    if existing < rows:
+        print(f"Seeding {rows - existing} transactions...")
+        started = time.perf_counter()
+        seed(user, rows - existing)
+        print(f"Seeded in {time.perf_counter() - started:.1f}s")
+
+    today = timezone.localdate()
+    date_range = DateRange(today - timedelta(days=5 * 365), today)
+    print('=' * 50)
+    print(f"{Transaction.objects.filter(user=user).count()} transactions, best of {repeat}")
+    before = timed('two queries (range)', lambda: two_query_summary(user, date_range), repeat)
+    after = timed('single pass (range)', lambda: transaction_summary(user, date_range), repeat)
+    timed('single pass (no range)', lambda: transaction_summary(user, DateRange()), repeat)
+    print('=' * 50)
+    print(f"single pass: {before / after:.2f}x faster")
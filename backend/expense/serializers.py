@@ -1,6 +1,5 @@
-import csv
-import io
 from decimal import Decimal
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Sum, Q
 from django.utils import timezone
@@ -9,8 +8,10 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from .models import (
     Account, AccountType, Budget, RecurringInterval, Transaction,
-    TransactionStatus, TransactionType
+    TransactionImportJob, TransactionStatus, TransactionType
 )
+from .recurrence import add_interval
+from .services.import_service import TransactionImporter
 
 class AccountSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
@@ -68,7 +69,7 @@ class AccountSerializer(serializers.ModelSerializer):
         if not user_accounts_count:
             validated_data["is_default"] = True
         elif is_default:
-            Account.objects.filter(user=user, is_default=True).update(is_default=False)
+            Account.objects.filter(user=user, is_default=True).update(is_default=False, updated_at=timezone.now())
         return super().create(validated_data)
 
     @transaction.atomic
@@ -79,7 +80,7 @@ class AccountSerializer(serializers.ModelSerializer):
                 raise ValidationError({"name": _("An account with this name already exists.")})
         is_default = validated_data.get("is_default", False)
         if is_default and not instance.is_default:
-            Account.objects.filter(user=instance.user, is_default=True).update(is_default=False)
+            Account.objects.filter(user=instance.user, is_default=True).update(is_default=False, updated_at=timezone.now())
         elif "is_default" in validated_data and not is_default and instance.is_default:
             if not Account.objects.filter(user=instance.user).exclude(pk=instance.pk).exists():
                 raise ValidationError({"is_default": _("Cannot unset default on the only account.")})
@@ -98,7 +99,7 @@ class SetDefaultAccountSerializer(serializers.Serializer):
     def save(self):
         account = self.context["account"]
         user = account.user
-        Account.objects.filter(user=user, is_default=True).update(is_default=False)
+        Account.objects.filter(user=user, is_default=True).update(is_default=False, updated_at=timezone.now())
         account.is_default = True
         account.save(update_fields=["is_default", "updated_at"])
         return account
@@ -136,15 +137,8 @@ class TransactionSerializer(serializers.ModelSerializer):
         if not is_recurring and recurring_interval:
             raise ValidationError({"recurring_interval": _("Recurring interval should not be set for non-recurring transactions.")})
         if is_recurring and recurring_interval and not attrs.get("next_recurring_date"):
-            current_date = attrs.get("date", timezone.now())
-            interval_mapping = {
-                RecurringInterval.DAILY: timezone.timedelta(days=1),
-                RecurringInterval.WEEKLY: timezone.timedelta(weeks=1),
-                RecurringInterval.MONTHLY: timezone.timedelta(days=30),
-                RecurringInterval.YEARLY: timezone.timedelta(days=365),
-            }
-            if recurring_interval in interval_mapping:
-                attrs["next_recurring_date"] = current_date + interval_mapping[recurring_interval]
+            current_date = attrs.get("date") or getattr(self.instance, "date", None) or timezone.now()
+            attrs["next_recurring_date"] = add_interval(current_date, recurring_interval)
         return attrs
 
 
@@ -193,90 +187,66 @@ class TransactionCreateSerializer(serializers.ModelSerializer):
         if not attrs.get("date"):
             attrs["date"] = timezone.now()
         if is_recurring and recurring_interval:
-            current_date = attrs.get("date", timezone.now())
-            interval_mapping = {
-                RecurringInterval.DAILY: timezone.timedelta(days=1),
-                RecurringInterval.WEEKLY: timezone.timedelta(weeks=1),
-                RecurringInterval.MONTHLY: timezone.timedelta(days=30),
-                RecurringInterval.YEARLY: timezone.timedelta(days=365),
-            }
-            if recurring_interval in interval_mapping:
-                attrs["next_recurring_date"] = current_date + interval_mapping[recurring_interval]
+            attrs["next_recurring_date"] = add_interval(attrs["date"], recurring_interval)
         return attrs
 
 
 class BulkTransactionCreateSerializer(serializers.Serializer):
     csv_file = serializers.FileField()
+    stream = serializers.BooleanField(required=False, default=False)
+    background = serializers.BooleanField(required=False, default=False)
 
     def validate_csv_file(self, value):
         if not hasattr(value, 'name') or not value.name.endswith('.csv'):
             raise ValidationError(_("File must be a CSV file."))
-        if hasattr(value, 'size') and value.size > 5 * 1024 * 1024:
-            raise ValidationError(_("File size cannot exceed 5MB."))
+        max_size = getattr(settings, 'TRANSACTION_IMPORT_MAX_STREAM_SIZE', 200 * 1024 * 1024)
+        if getattr(value, 'size', 0) > max_size:
+            raise ValidationError(_("File size cannot exceed %(size)dMB.") % {'size': max_size // (1024 * 1024)})
         return value
 
-    @transaction.atomic
+    def runs_in_background(self):
+        sync_max_size = getattr(settings, 'TRANSACTION_IMPORT_SYNC_MAX_SIZE', 5 * 1024 * 1024)
+        csv_file = self.validated_data['csv_file']
+        return self.validated_data.get('background') or getattr(csv_file, 'size', 0) > sync_max_size
+
+    def create_job(self):
+        """Store the upload and queue run_transaction_import once the job row is committed."""
+        from .tasks import run_transaction_import
+
+        csv_file = self.validated_data['csv_file']
+        job = TransactionImportJob.objects.create(
+            user=self.context['request'].user,
+            csv_file=csv_file,
+            original_filename=csv_file.name[:255],
+        )
+        transaction.on_commit(lambda: run_transaction_import.delay(str(job.id)))
+        return job
+
     def create(self, validated_data):
-        csv_file = validated_data['csv_file']
-        user = self.context['request'].user
-        try:
-            user_accounts = {str(account.id): account for account in Account.objects.filter(user=user).select_related('user')}
-        except Exception:
-            user_accounts = {}
-        try:
-            content = csv_file.read().decode('utf-8')
-            csv_rows = csv.DictReader(io.StringIO(content))
-        except Exception as error:
-            return {'created_transactions': [], 'success_count': 0, 'errors': [{'error': f'Failed to read CSV: {error}'}], 'total_rows': 0}
-
-        required_fields = ['type', 'amount', 'category', 'date', 'account_id']
-        transactions_to_create, errors = [], []
-        for row_index, row in enumerate(csv_rows, start=1):
-            missing_fields = [field for field in required_fields if not row.get(field)]
-            if missing_fields:
-                errors.append({'row': row_index, 'error': f"Missing: {', '.join(missing_fields)}"})
-                continue
-            account = user_accounts.get(row['account_id'])
-            if not account:
-                errors.append({'row': row_index, 'error': 'Invalid account'})
-                continue
-            try:
-                transaction_type = row['type'].upper()
-                amount = Decimal(str(row['amount']))
-            except Exception as error:
-                errors.append({'row': row_index, 'error': f'Data error: {error}'})
-                continue
-            description = row.get('description', '').strip()[:500] or None
-            is_recurring = row.get('is_recurring', '').lower() == 'true'
-            recurring_interval = row.get('recurring_interval') or None
-            transaction_data = {
-                'user': user, 'account': account, 'type': transaction_type,
-                'amount': amount, 'category': row['category'].strip(),
-                'description': description, 'date': row['date'],
-                'status': TransactionStatus.COMPLETED,
-                'is_recurring': is_recurring, 'recurring_interval': recurring_interval,
-                'receipt_url': row.get('receipt_url') or None,
-            }
-            transactions_to_create.append(Transaction(**transaction_data))
-
-        created_transactions = []
-        if transactions_to_create:
-            try:
-                created_transactions = Transaction.objects.bulk_create(transactions_to_create, batch_size=1000)
-            except Exception:
-                for transaction_obj in transactions_to_create:
-                    try:
-                        transaction_obj.save()
-                        created_transactions.append(transaction_obj)
-                    except Exception as error:
-                        errors.append({'error': f'Save failed: {error}'})
-
-        return {
-            'created_transactions': created_transactions,
-            'success_count': len(created_transactions),
-            'errors': errors,
-            'total_rows': len(created_transactions) + len(errors)
-        }
+        if validated_data.get('stream'):
+            importer = TransactionImporter(self.context['request'].user)
+            return importer.run(validated_data['csv_file'])
+        return self.create_in_memory(validated_data)
+
+    @transaction.atomic
+    def create_in_memory(self, validated_data):
+        # Small uploads stay all-or-nothing: the importer's per-chunk transactions nest in this one.
+        importer = TransactionImporter(self.context['request'].user)
+        return importer.run(validated_data['csv_file'])
+
+
+class TransactionImportJobSerializer(serializers.ModelSerializer):
+    progress_percentage = serializers.FloatField(read_only=True)
+    eta_seconds = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = TransactionImportJob
+        fields = (
+            "id", "original_filename", "status", "total_rows", "rows_processed",
+            "success_count", "duplicate_count", "error_count", "errors", "progress_percentage", "eta_seconds",
+            "started_at", "finished_at", "created_at", "updated_at"
+        )
+        read_only_fields = fields
 
 
 class UpdateTransactionStatusSerializer(serializers.Serializer):
@@ -306,6 +276,10 @@ class BudgetSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id", "created_at", "updated_at", "last_alert_sent")
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.with_current_month_expenses()
+
     def validate_amount(self, value):
         if value is None:
             raise ValidationError(_("Budget amount cannot be empty."))
@@ -352,6 +326,10 @@ class BudgetListSerializer(serializers.ModelSerializer):
         )
         read_only_fields = fields
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.with_current_month_expenses()
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         data['current_month_expenses'] = instance.current_month_expenses
@@ -0,0 +1,161 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.db import models
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from backend.cache import cached_response
+from expense.filters import DateRange
+from expense.models import Transaction, TransactionStatus, TransactionType
+
+
+GRANULARITIES = ('day', 'week', 'month')
+DEFAULT_BUCKETS = {'day': 30, 'week': 12, 'month': 12}
+
+
+def bucket_start(day, granularity):
+    """Start of the day/week/month bucket `day` falls in (weeks start on Monday, as date_trunc does)."""
+    if granularity == 'week':
+        return day - timedelta(days=day.weekday())
+    if granularity == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def next_bucket(start, granularity):
+    if granularity == 'week':
+        return start + timedelta(days=7)
+    if granularity == 'month':
+        return (start + timedelta(days=32)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+def resolve_range(params):
+    """Validated (DateRange, granularity); an open range defaults to the last few buckets up to today."""
+    granularity = params.get('granularity', 'month')
+    if granularity not in GRANULARITIES:
+        raise ValidationError({'granularity': [_("Choose one of: day, week, month.")]})
+    date_range = DateRange.from_params(params)
+    date_to = date_range.date_to or timezone.localdate()
+    date_from = date_range.date_from
+    if date_from is None:
+        date_from = bucket_start(date_to, granularity)
+        for _bucket in range(DEFAULT_BUCKETS[granularity] - 1):
+            date_from = bucket_start(date_from - timedelta(days=1), granularity)
+    if date_from > date_to:
+        raise ValidationError({'date_from': [_("Start date must be on or before the end date.")]})
+
+    buckets, start = 0, bucket_start(date_from, granularity)
+    max_buckets = getattr(settings, 'ANALYTICS_MAX_BUCKETS', 400)
+    while start <= date_to:
+        buckets += 1
+        if buckets > max_buckets:
+            raise ValidationError({'granularity': [_("Range too long for this granularity; use a coarser one.")]})
+        start = next_bucket(start, granularity)
+    return DateRange(date_from, date_to), granularity
+
+
+def spending_timeseries(user, date_range, granularity):
+    """
+    Income, expense and net per bucket plus the per-category totals inside
+    each bucket, from one date_trunc-grouped query over completed
+    transactions. Empty buckets are filled in so charts get a continuous axis.
+    """
+    rows = (
+        date_range.filter(Transaction.objects.filter(user=user, status=TransactionStatus.COMPLETED))
+        .annotate(period=Trunc('date', granularity, output_field=models.DateField(), tzinfo=timezone.get_current_timezone()))
+        .values('period', 'type', 'category')
+        .annotate(total=models.Sum('amount'), count=models.Count('id'))
+        .order_by()
+    )
+
+    series, start = {}, bucket_start(date_range.date_from, granularity)
+    while start <= date_range.date_to:
+        series[start] = {
+            'period': start.isoformat(),
+            'income': Decimal('0.00'),
+            'expense': Decimal('0.00'),
+            'net': Decimal('0.00'),
+            'count': 0,
+            'categories': [],
+        }
+        start = next_bucket(start, granularity)
+
+    totals = {}
+    for row in rows:
+        bucket = series[row['period']]
+        field = 'income' if row['type'] == TransactionType.INCOME else 'expense'
+        bucket[field] += row['total']
+        bucket['count'] += row['count']
+        bucket['categories'].append({'category': row['category'], 'type': row['type'], 'total': row['total'], 'count': row['count']})
+        category_total = totals.setdefault((row['category'], row['type']), {'category': row['category'], 'type': row['type'], 'total': Decimal('0.00'), 'count': 0})
+        category_total['total'] += row['total']
+        category_total['count'] += row['count']
+
+    for bucket in series.values():
+        bucket['net'] = bucket['income'] - bucket['expense']
+        bucket['categories'].sort(key=lambda item: -item['total'])
+
+    return {
+        'granularity': granularity,
+        'period': date_range.as_period(),
+        'series': list(series.values()),
+        'categories': sorted(totals.values(), key=lambda item: -item['total']),
+        'total_income': sum((bucket['income'] for bucket in series.values()), Decimal('0.00')),
+        'total_expense': sum((bucket['expense'] for bucket in series.values()), Decimal('0.00')),
+    }
+
+
+def summary_rows(user, date_range):
+    """(category, type, status, total, count) groups of the user's transactions in `date_range`, from one grouped scan."""
+    return (
+        date_range.filter(Transaction.objects.filter(user=user))
+        .values_list('category', 'type', 'status')
+        .annotate(total=models.Sum('amount'), count=models.Count('id'))
+        .order_by()
+    )
+
+
+def transaction_summary(user, date_range):
+    """
+    Totals, per-status counts and the completed category breakdown folded
+    from a single grouped result in Python, instead of one aggregate plus a
+    second grouped query over the same rows.
+    """
+    totals = {TransactionType.INCOME: Decimal('0.00'), TransactionType.EXPENSE: Decimal('0.00')}
+    counts = dict.fromkeys(TransactionStatus.values, 0)
+    breakdown = {}
+    for category, type_, status, total, count in summary_rows(user, date_range):
+        counts[status] += count
+        if status != TransactionStatus.COMPLETED:
+            continue
+        totals[type_] += total
+        key = (category, type_)
+        breakdown[key] = breakdown.get(key, Decimal('0.00')) + total
+
+    return {
+        'total_income': totals[TransactionType.INCOME],
+        'total_expense': totals[TransactionType.EXPENSE],
+        'net_amount': totals[TransactionType.INCOME] - totals[TransactionType.EXPENSE],
+        'transaction_count': counts[TransactionStatus.COMPLETED],
+        'pending_count': counts[TransactionStatus.PENDING],
+        'failed_count': counts[TransactionStatus.FAILED],
+        'category_breakdown': [
+            {'category': category, 'type': type_, 'total': total}
+            for (category, type_), total in sorted(breakdown.items(), key=lambda item: -item[1])
+        ],
+        'period': date_range.as_period(),
+    }
+
+
+def cached_spending_timeseries(user, date_range, granularity):
+    """spending_timeseries cached per (user, range, granularity) until the user's data changes."""
+    period = date_range.as_period()
+    return cached_response(
+        'spending-timeseries',
+        lambda: spending_timeseries(user, date_range, granularity),
+        user=user,
+        params=(granularity, period['from'], period['to']),
+    )
@@ -0,0 +1,63 @@
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+from backend.cache import bump_data_version
+from expense.models import Account, TransactionStatus, TransactionType
+
+
+INSUFFICIENT_FUNDS = "Insufficient funds in savings account"
+
+
+def signed_amount(transaction_obj):
+    return transaction_obj.amount if transaction_obj.type == TransactionType.INCOME else -transaction_obj.amount
+
+
+def lock_accounts(account_ids):
+    """Lock these accounts until the transaction ends, in pk order so concurrent writers cannot deadlock."""
+    return list(Account.objects.select_for_update().filter(pk__in=account_ids).order_by('pk'))
+
+
+def apply_balance_changes(transactions):
+    """
+    Apply the balance effect of many not-yet-saved transactions at once.
+
+    Every affected Account is locked once (in pk order, so concurrent imports
+    cannot deadlock), COMPLETED transactions are replayed per account in date
+    order against a running balance, and expenses that would overdraw the
+    account are rejected just like Transaction.update_account_balance does.
+    The surviving net delta is written with a single bulk_update.
+
+    Must run inside transaction.atomic(); the caller saves the accepted rows
+    in the same transaction. Returns (accepted, [(transaction, reason)]).
+    """
+    if not transaction.get_connection().in_atomic_block:
+        raise RuntimeError("apply_balance_changes must run inside transaction.atomic()")
+
+    by_account = defaultdict(list)
+    accepted, rejected = [], []
+    for transaction_obj in transactions:
+        if transaction_obj.status == TransactionStatus.COMPLETED:
+            by_account[transaction_obj.account_id].append(transaction_obj)
+        else:
+            accepted.append(transaction_obj)
+    if not by_account:
+        return accepted, rejected
+
+    accounts = lock_accounts(by_account.keys())
+    now = timezone.now()
+    for account in accounts:
+        balance = account.balance
+        for transaction_obj in sorted(by_account[account.pk], key=lambda t: t.date):
+            new_balance = balance + signed_amount(transaction_obj)
+            if new_balance < Decimal('0.00'):
+                rejected.append((transaction_obj, INSUFFICIENT_FUNDS))
+                continue
+            balance = new_balance
+            accepted.append(transaction_obj)
+        account.balance = balance
+        account.updated_at = now
+
+    Account.objects.bulk_update(accounts, ['balance', 'updated_at'])
+    bump_data_version(*{account.user_id for account in accounts})
+    return accepted, rejected
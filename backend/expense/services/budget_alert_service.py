@@ -0,0 +1,60 @@
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from expense.models import Budget
+from user.models import EmailOutbox
+from user.tasks import dispatch_pending_emails
+
+
+def crossed_threshold(before, after, amount, thresholds):
+    """Highest threshold (percent of amount) that spending moved across on this write, or None."""
+    crossed = [threshold for threshold in thresholds if before * 100 < amount * threshold <= after * 100]
+    return max(crossed) if crossed else None
+
+
+def budget_alert_context(budget, now):
+    spent = budget.current_month_expenses
+    return {
+        'percentage': int(round(spent / budget.amount * 100)),
+        'month': timezone.localtime(now).strftime('%B %Y'),
+        'spent': f"{spent:.2f}",
+        'budget': f"{budget.amount:.2f}",
+        'remaining': f"{max(budget.amount - spent, 0):.2f}",
+    }
+
+
+def evaluate_budget_alerts(increments, now=None):
+    """
+    increments maps user_id to the amount a write just added to that user's
+    completed expenses for the current month. Must run inside the same
+    transaction as the rollup update: the post-write totals are read with
+    one query and the pre-write totals derived by subtracting the increment,
+    so only budgets whose utilisation crossed a threshold on this write are
+    considered. Their alerts are queued with one outbox insert.
+    """
+    thresholds = getattr(settings, 'BUDGET_ALERT_THRESHOLDS', (80, 100))
+    now = now or timezone.now()
+    budgets = (
+        Budget.objects.with_current_month_expenses()
+        .filter(user_id__in=list(increments))
+        .select_related('user')
+    )
+
+    entries, alerted = [], []
+    for budget in budgets:
+        spent = budget.current_month_expenses
+        threshold = crossed_threshold(spent - increments[budget.user_id], spent, budget.amount, thresholds)
+        if threshold is None or not budget.should_send_alert(threshold_percentage=threshold):
+            continue
+        entries.append(EmailOutbox(
+            kind=EmailOutbox.Kind.BUDGET_ALERT,
+            to_email=budget.user.email,
+            context=budget_alert_context(budget, now),
+        ))
+        alerted.append(budget.pk)
+
+    if entries:
+        EmailOutbox.objects.bulk_create(entries)
+        Budget.objects.filter(pk__in=alerted).update(last_alert_sent=now, updated_at=now)
+        transaction.on_commit(lambda: dispatch_pending_emails.delay())
+    return len(entries)
@@ -0,0 +1,316 @@
+import codecs
+import csv
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.validators import DecimalValidator
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from expense.fingerprints import base_fingerprint, split_known, transaction_fingerprint
+from expense.services.balance_service import INSUFFICIENT_FUNDS, apply_balance_changes, lock_accounts
+from expense.models import (
+    Account, MonthlySpendingRollup, RecurringInterval, Transaction, TransactionCategory, TransactionStatus, TransactionType
+)
+
+
+TRANSACTION_TYPES = frozenset(TransactionType.values)
+TRANSACTION_CATEGORIES = frozenset(TransactionCategory.values)
+RECURRING_INTERVALS = frozenset(RecurringInterval.values)
+MIN_AMOUNT = Decimal('0.01')
+AMOUNT_FIELD = Transaction._meta.get_field('amount')
+# Rows the database would reject must fail on their own, not abort the whole batch insert.
+AMOUNT_VALIDATOR = DecimalValidator(AMOUNT_FIELD.max_digits, AMOUNT_FIELD.decimal_places)
+RECEIPT_URL_MAX_LENGTH = Transaction._meta.get_field('receipt_url').max_length
+INVALID = object()
+# Upper bound on every per-import table (parse memos, occurrence counts), so memory stays flat however long the file is.
+MEMO_SIZE = 100000
+
+
+class ImportErrorReport:
+    """
+    Errors grouped by code: one entry per code with a total count and the
+    first few row numbers, so a file with 100k bad rows still produces a
+    small report.
+    """
+
+    MESSAGES = {
+        'missing_fields': 'Missing required fields',
+        'invalid_account': 'Invalid account',
+        'invalid_type': 'Invalid type',
+        'invalid_category': 'Invalid category',
+        'invalid_amount': 'Invalid amount',
+        'invalid_date': 'Invalid date',
+        'invalid_receipt_url': f'Receipt URL longer than {RECEIPT_URL_MAX_LENGTH} characters',
+        'invalid_recurring': 'Recurring transactions need a valid recurring_interval (and only they may have one)',
+        'insufficient_funds': INSUFFICIENT_FUNDS,
+        'read_error': 'Failed to read CSV',
+        'import_failed': 'Import failed',
+    }
+
+    def __init__(self, max_rows_per_code):
+        self.max_rows_per_code = max_rows_per_code
+        self.groups = {}
+        self.count = 0
+
+    def add(self, code, row_index, detail=None):
+        self.count += 1
+        group = self.groups.get(code)
+        if group is None:
+            group = self.groups[code] = {'code': code, 'error': self.MESSAGES[code], 'count': 0, 'rows': []}
+            if detail:
+                group['example'] = detail
+        group['count'] += 1
+        if len(group['rows']) < self.max_rows_per_code:
+            group['rows'].append(row_index)
+
+    def as_list(self):
+        return sorted(self.groups.values(), key=lambda group: -group['count'])
+
+
+class TransactionImporter:
+    """
+    Streaming CSV importer: the upload is decoded incrementally and read in
+    batches of TRANSACTION_IMPORT_CHUNK_SIZE rows. Each batch is transposed
+    into columns and every column is parsed in one pass against precomputed
+    sets and per-import memo tables (bank exports repeat the same dates,
+    types and categories on most rows), then flushed with one bulk_create.
+    Peak memory depends on the batch size rather than on the file size.
+    Account balances are updated per batch through apply_balance_changes.
+    """
+
+    REQUIRED_FIELDS = ('type', 'amount', 'category', 'date', 'account_id')
+    OPTIONAL_FIELDS = ('description', 'is_recurring', 'recurring_interval', 'receipt_url')
+
+    def __init__(self, user, chunk_size=None, error_sample_rows=None, on_progress=None):
+        self.user = user
+        self.chunk_size = chunk_size or getattr(settings, 'TRANSACTION_IMPORT_CHUNK_SIZE', 1000)
+        if error_sample_rows is None:
+            error_sample_rows = getattr(settings, 'TRANSACTION_IMPORT_ERROR_SAMPLE_ROWS', 20)
+        self.report = ImportErrorReport(error_sample_rows)
+        self.on_progress = on_progress
+        self.accounts = {str(account.id): account for account in Account.objects.filter(user=user)}
+        self.rows_processed = 0
+        self.created = 0
+        self.duplicates = 0
+        # Occurrences per content hash over the most recently seen MEMO_SIZE hashes (see assign_fingerprints).
+        self._occurrences = OrderedDict()
+        self._dates = {}
+        self._amounts = {}
+        self._build = self.transaction_factory()
+
+    @property
+    def errors(self):
+        return self.report.as_list()
+
+    @property
+    def error_count(self):
+        return self.report.count
+
+    def read_batches(self, csv_file):
+        # iterdecode pulls the upload chunk by chunk; nothing holds the whole file.
+        csv_file.seek(0)
+        reader = csv.reader(codecs.iterdecode(csv_file, 'utf-8-sig'))
+        header = [name.strip() for name in next(reader, [])]
+        missing = [field for field in self.REQUIRED_FIELDS if field not in header]
+        if missing:
+            raise csv.Error(f"Missing columns: {', '.join(missing)}")
+        positions = {name: index for index, name in enumerate(header)}
+        while True:
+            rows = list(islice(reader, self.chunk_size))
+            if not rows:
+                return
+            yield positions, rows
+
+    def column(self, rows, positions, name):
+        index = positions.get(name)
+        if index is None:
+            return [''] * len(rows)
+        return [row[index].strip() if index < len(row) else '' for row in rows]
+
+    def transaction_factory(self):
+        """
+        Return build(**values) -> Transaction using Model.__init__'s positional
+        fast path: a template of every concrete field's default is computed
+        once, so per row only the parsed values are slotted in and no related
+        descriptors or default lookups run.
+        """
+        fields = Transaction._meta.concrete_fields
+        template = [None if field.primary_key else field.get_default() for field in fields]
+        slots = {field.attname: index for index, field in enumerate(fields)}
+        template[slots['user_id']] = self.user.pk
+        template[slots['status']] = TransactionStatus.COMPLETED
+        pk_slot = slots[Transaction._meta.pk.attname]
+
+        def build(**values):
+            row = template.copy()
+            row[pk_slot] = uuid.uuid4()
+            for name, value in values.items():
+                row[slots[name]] = value
+            return Transaction(*row)
+
+        return build
+
+    def parse_date(self, value):
+        parsed = self._dates.get(value)
+        if parsed is None:
+            try:
+                # Both raise ValueError for well-formed but impossible dates such as 2024-02-30.
+                parsed = parse_datetime(value)
+                if parsed is None:
+                    day = parse_date(value)
+                    parsed = datetime(day.year, day.month, day.day) if day else INVALID
+            except ValueError:
+                parsed = INVALID
+            if parsed is not INVALID and timezone.is_naive(parsed):
+                parsed = timezone.make_aware(parsed)
+            if len(self._dates) < MEMO_SIZE:
+                self._dates[value] = parsed
+        return parsed
+
+    def parse_amount(self, value):
+        parsed = self._amounts.get(value)
+        if parsed is None:
+            try:
+                parsed = Decimal(value)
+                if not parsed.is_finite() or parsed < MIN_AMOUNT:
+                    parsed = INVALID
+                else:
+                    AMOUNT_VALIDATOR(parsed)
+            except (InvalidOperation, ValidationError):
+                parsed = INVALID
+            if len(self._amounts) < MEMO_SIZE:
+                self._amounts[value] = parsed
+        return parsed
+
+    def parse_batch(self, positions, rows, first_row):
+        """Parse one batch column by column; returns [(row_index, Transaction)] for the valid rows."""
+        columns = {name: self.column(rows, positions, name) for name in self.REQUIRED_FIELDS + self.OPTIONAL_FIELDS}
+        types = [value.upper() for value in columns['type']]
+        categories = [value.upper() for value in columns['category']]
+        accounts = [self.accounts.get(value) for value in columns['account_id']]
+        amounts = [self.parse_amount(value) if value else INVALID for value in columns['amount']]
+        dates = [self.parse_date(value) if value else INVALID for value in columns['date']]
+        recurring = [value.lower() == 'true' for value in columns['is_recurring']]
+        intervals = [value.upper() or None for value in columns['recurring_interval']]
+
+        add_error, build = self.report.add, self._build
+        parsed = []
+        for offset in range(len(rows)):
+            row_index = first_row + offset
+            missing = [field for field in self.REQUIRED_FIELDS if not columns[field][offset]]
+            if missing:
+                add_error('missing_fields', row_index, ', '.join(missing))
+            elif accounts[offset] is None:
+                add_error('invalid_account', row_index)
+            elif types[offset] not in TRANSACTION_TYPES:
+                add_error('invalid_type', row_index, columns['type'][offset])
+            elif categories[offset] not in TRANSACTION_CATEGORIES:
+                add_error('invalid_category', row_index, columns['category'][offset])
+            elif amounts[offset] is INVALID:
+                add_error('invalid_amount', row_index, columns['amount'][offset])
+            elif dates[offset] is INVALID:
+                add_error('invalid_date', row_index, columns['date'][offset])
+            elif recurring[offset] != bool(intervals[offset]) or (intervals[offset] and intervals[offset] not in RECURRING_INTERVALS):
+                add_error('invalid_recurring', row_index)
+            elif len(columns['receipt_url'][offset]) > RECEIPT_URL_MAX_LENGTH:
+                add_error('invalid_receipt_url', row_index)
+            else:
+                parsed.append((row_index, build(
+                    account_id=accounts[offset].pk,
+                    type=types[offset],
+                    amount=amounts[offset],
+                    category=categories[offset],
+                    description=columns['description'][offset][:500] or None,
+                    date=dates[offset],
+                    is_recurring=recurring[offset],
+                    recurring_interval=intervals[offset],
+                    receipt_url=columns['receipt_url'][offset] or None,
+                )))
+        return parsed
+
+    def assign_fingerprints(self, chunk):
+        """
+        Fingerprint each row with its content hash and how many identical rows
+        came before it, so two equal charges on one day both import once. The
+        counts cover a window of the last MEMO_SIZE distinct hashes; identical
+        rows share a date, and exports are ordered by date, so they fall well
+        inside it.
+        """
+        occurrences = self._occurrences
+        for _row_index, transaction_obj in chunk:
+            base = base_fingerprint(
+                self.user.pk, transaction_obj.account_id, transaction_obj.date,
+                transaction_obj.amount, transaction_obj.type, transaction_obj.description,
+            )
+            key = base[:16]
+            occurrence = occurrences.pop(key, 0)
+            occurrences[key] = occurrence + 1
+            if len(occurrences) > MEMO_SIZE:
+                occurrences.popitem(last=False)
+            transaction_obj.fingerprint = transaction_fingerprint(base, occurrence)
+
+    def drop_duplicates(self, chunk):
+        """Skip rows whose fingerprint is already stored or repeated in the chunk (see split_known)."""
+        new, known = split_known([transaction_obj for _, transaction_obj in chunk])
+        if not known:
+            return chunk
+        self.duplicates += len(known)
+        new = {id(transaction_obj) for transaction_obj in new}
+        return [(row_index, transaction_obj) for row_index, transaction_obj in chunk if id(transaction_obj) in new]
+
+    def save_chunk(self, chunk):
+        """Lock the chunk's accounts once, drop already-imported rows, apply the net balance deltas and insert."""
+        self.assign_fingerprints(chunk)
+        row_numbers = {id(transaction_obj): row_index for row_index, transaction_obj in chunk}
+        with transaction.atomic():
+            # Before the duplicate check, so two imports of the same file cannot both miss each other's rows.
+            lock_accounts({transaction_obj.account_id for _, transaction_obj in chunk})
+            chunk = self.drop_duplicates(chunk)
+            if not chunk:
+                return 0
+            accepted, rejected = apply_balance_changes([transaction_obj for _, transaction_obj in chunk])
+            Transaction.objects.bulk_create(accepted, batch_size=self.chunk_size)
+            MonthlySpendingRollup.add_transactions(accepted)
+        for row_index in sorted(row_numbers[id(t)] for t, _reason in rejected):
+            self.report.add('insufficient_funds', row_index)
+        return len(accepted)
+
+    def run(self, csv_file):
+        started = time.monotonic()
+        chunks = 0
+        try:
+            for positions, rows in self.read_batches(csv_file):
+                chunk = self.parse_batch(positions, rows, self.rows_processed + 1)
+                self.rows_processed += len(rows)
+                if chunk:
+                    self.created += self.save_chunk(chunk)
+                chunks += 1
+                if self.on_progress:
+                    self.on_progress(self.progress(chunks, started))
+        except (UnicodeDecodeError, csv.Error) as error:
+            self.report.add('read_error', self.rows_processed + 1, str(error))
+        return {
+            'success_count': self.created,
+            'duplicate_count': self.duplicates,
+            'total_rows': self.rows_processed,
+            'error_count': self.error_count,
+            'errors': self.errors,
+            'chunks': chunks,
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
+
+    def progress(self, chunks, started):
+        return {
+            'chunk': chunks,
+            'rows_processed': self.rows_processed,
+            'created': self.created,
+            'duplicate_count': self.duplicates,
+            'error_count': self.error_count,
+            'elapsed_seconds': round(time.monotonic() - started, 2),
+        }
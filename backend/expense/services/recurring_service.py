@@ -0,0 +1,109 @@
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from expense.filters import DateRange
+from expense.fingerprints import base_fingerprint, split_known, transaction_fingerprint
+from expense.models import MonthlySpendingRollup, Transaction, TransactionStatus
+from expense.recurrence import due_occurrences
+from expense.services.balance_service import apply_balance_changes, lock_accounts
+
+
+def build_occurrence(template, date, occurrences):
+    """
+    One generated charge. Occurrences are always COMPLETED (or FAILED when
+    they would overdraw the account): the template's own status records how
+    its first charge went, not how later ones will, so a template whose
+    first payment failed still produces its future payments. `occurrences`
+    counts identical charges within the batch, numbered like identical rows
+    of an upload.
+    """
+    occurrence = Transaction(
+        user_id=template.user_id,
+        account_id=template.account_id,
+        type=template.type,
+        amount=template.amount,
+        category=template.category,
+        description=template.description,
+        receipt_url=template.receipt_url,
+        date=date,
+        status=TransactionStatus.COMPLETED,
+    )
+    # Fingerprinted on the local day, as a date-only bank export row for the same charge (same account,
+    # amount, type and description) is on import, so importing that export later does not duplicate it.
+    day = DateRange.start_of_day(timezone.localtime(date).date())
+    base = base_fingerprint(template.user_id, template.account_id, day, template.amount, template.type, template.description)
+    number = occurrences.get(base, 0)
+    occurrences[base] = number + 1
+    occurrence.fingerprint = transaction_fingerprint(base, number)
+    return occurrence
+
+
+def materialize_batch(templates, now, max_catch_up):
+    """
+    Generate every due occurrence for a batch of locked templates, apply the
+    balance effect once per account, insert everything with one bulk_create
+    and advance the templates with one bulk_update. Occurrences that would
+    overdraw the account are stored as FAILED instead of being dropped;
+    ones whose charge is already stored (imported from a bank export) are
+    skipped.
+    """
+    occurrences, numbers = [], {}
+    for template in templates:
+        dates, next_date = due_occurrences(
+            template.date, template.next_recurring_date, template.recurring_interval, now, max_catch_up
+        )
+        occurrences.extend(build_occurrence(template, date, numbers) for date in dates)
+        template.next_recurring_date = next_date
+        template.last_processed = now
+        template.updated_at = now
+
+    lock_accounts({occurrence.account_id for occurrence in occurrences})
+    occurrences, _known = split_known(occurrences)
+    accepted, rejected = apply_balance_changes(occurrences)
+    for occurrence, _reason in rejected:
+        occurrence.status = TransactionStatus.FAILED
+    created = Transaction.objects.bulk_create(accepted + [occurrence for occurrence, _reason in rejected])
+    MonthlySpendingRollup.add_transactions(created)
+    Transaction.objects.bulk_update(templates, ['next_recurring_date', 'last_processed', 'updated_at'])
+    return len(accepted), len(rejected)
+
+
+def materialize_recurring_transactions(now=None):
+    """
+    Walk due recurring templates (is_recurring, next_recurring_date index) in
+    primary-key keyset batches. Each batch is claimed with SKIP LOCKED so
+    overlapping runs never materialise the same period twice, and missed
+    periods are caught up in the same pass (up to RECURRING_MAX_CATCH_UP
+    per template per run).
+    """
+    now = now or timezone.now()
+    batch_size = getattr(settings, 'RECURRING_BATCH_SIZE', 500)
+    max_catch_up = getattr(settings, 'RECURRING_MAX_CATCH_UP', 366)
+    started = time.monotonic()
+    due = Transaction.objects.filter(
+        is_recurring=True,
+        next_recurring_date__lte=now,
+        recurring_interval__isnull=False,
+    ).order_by('pk')
+
+    templates_processed = created = failed = 0
+    last_pk = None
+    while True:
+        with transaction.atomic():
+            page = due.filter(pk__gt=last_pk) if last_pk else due
+            templates = list(page.select_for_update(skip_locked=True)[:batch_size])
+            if not templates:
+                break
+            last_pk = templates[-1].pk
+            batch_created, batch_failed = materialize_batch(templates, now, max_catch_up)
+        templates_processed += len(templates)
+        created += batch_created
+        failed += batch_failed
+
+    return {
+        'templates': templates_processed,
+        'created': created,
+        'failed': failed,
+        'elapsed_seconds': round(time.monotonic() - started, 2),
+    }
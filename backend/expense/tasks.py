@@ -0,0 +1,74 @@
+from celery import shared_task
+from django.utils import timezone
+from .models import ImportJobStatus, TransactionImportJob
+from .services.import_service import TransactionImporter
+from .services.recurring_service import materialize_recurring_transactions
+
+
+def count_data_rows(csv_file):
+    # One cheap streaming pass over the raw bytes so progress can report an ETA.
+    csv_file.seek(0)
+    lines, last_chunk = 0, b''
+    for chunk in csv_file.chunks():
+        lines += chunk.count(b'\n')
+        last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(b'\n'):
+        lines += 1
+    return max(lines - 1, 0)
+
+
+@shared_task()
+def run_transaction_import(job_id):
+    """
+    Run a stored CSV upload through the streaming importer, writing progress
+    to the job row after every chunk so the status endpoint can report rows
+    processed, errors so far and an ETA. The upload is removed once done.
+    """
+    # Claim the job with a conditional update so a redelivered task cannot import the file twice.
+    now = timezone.now()
+    claimed = TransactionImportJob.objects.filter(id=job_id, status=ImportJobStatus.PENDING).update(
+        status=ImportJobStatus.RUNNING, started_at=now, updated_at=now
+    )
+    job = TransactionImportJob.objects.select_related('user').get(id=job_id)
+    if not claimed:
+        return {'job_id': job_id, 'status': job.status}
+
+    def on_progress(report):
+        TransactionImportJob.objects.filter(id=job.id).update(
+            rows_processed=report['rows_processed'],
+            success_count=report['created'],
+            duplicate_count=report['duplicate_count'],
+            error_count=report['error_count'],
+            errors=importer.errors,
+            updated_at=timezone.now(),
+        )
+
+    importer = TransactionImporter(job.user, on_progress=on_progress)
+    try:
+        with job.csv_file.open('rb') as csv_file:
+            job.total_rows = count_data_rows(csv_file)
+            job.save(update_fields=['total_rows', 'updated_at'])
+            result = importer.run(csv_file)
+    except Exception as error:
+        job.status = ImportJobStatus.FAILED
+        importer.report.add('import_failed', importer.rows_processed + 1, str(error))
+        job.errors = importer.errors
+        job.error_count = importer.error_count
+    else:
+        job.status = ImportJobStatus.COMPLETED
+        job.total_rows = result['total_rows']
+        job.errors = result['errors']
+        job.error_count = result['error_count']
+
+    job.rows_processed = importer.rows_processed
+    job.success_count = importer.created
+    job.duplicate_count = importer.duplicates
+    job.finished_at = timezone.now()
+    job.csv_file.delete(save=False)
+    job.save()
+    return {'job_id': job_id, 'status': job.status, 'success_count': job.success_count, 'error_count': job.error_count}
+
+
+@shared_task()
+def process_recurring_transactions():
+    return materialize_recurring_transactions()
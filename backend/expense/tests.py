@@ -1,3 +1,712 @@
-from django.test import TestCase
+import base64
+import json
+import shutil
+import tempfile
+import unittest
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import IntegrityError, connection, transaction
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from backend import cache as response_cache
+from user.models import EmailOutbox, UserCustom
+from .filters import DateRange
+from .models import (
+    Account, Budget, ImportJobStatus, MonthlySpendingRollup, RecurringInterval, Transaction, TransactionImportJob,
+    TransactionStatus, TransactionType,
+)
+from .recurrence import add_interval, due_occurrences
+from .services.budget_alert_service import crossed_threshold
+from .services.analytics_service import resolve_range, spending_timeseries, transaction_summary
+from .services.balance_service import INSUFFICIENT_FUNDS, apply_balance_changes
+from .services.import_service import TransactionImporter
+from .services.recurring_service import materialize_recurring_transactions
+from .tasks import run_transaction_import
 
-# Create your tests here.
+
+class AccountDeleteRollupTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='rollup', email='rollup@example.com')
+        self.kept = Account.objects.create(user=self.user, name='Kept', balance=Decimal('1000.00'))
+        self.deleted = Account.objects.create(user=self.user, name='Deleted', balance=Decimal('1000.00'))
+
+    def spend(self, account, amount):
+        return Transaction.objects.create(
+            user=self.user, account=account, type=TransactionType.EXPENSE, amount=Decimal(amount),
+            category='FOOD', date=timezone.now(), status=TransactionStatus.COMPLETED,
+        )
+
+    def totals(self):
+        return {
+            (row.month, row.category, row.type, row.status): (row.total, row.count)
+            for row in MonthlySpendingRollup.objects.filter(user=self.user)
+        }
+
+    def test_account_delete_removes_cascaded_transactions_from_rollup(self):
+        self.spend(self.kept, '10.00')
+        self.spend(self.deleted, '25.00')
+        self.spend(self.deleted, '5.00')
+
+        self.deleted.delete()
+
+        self.assertFalse(Transaction.objects.filter(account_id=self.deleted.pk).exists())
+        after_delete = self.totals()
+        MonthlySpendingRollup.rebuild([self.user.pk])
+        self.assertEqual(after_delete, self.totals())
+        self.assertEqual([value for value in after_delete.values()], [(Decimal('10.00'), 1)])
+
+
+class BudgetMonthToDateTests(TestCase):
+    NOW = datetime(2026, 10, 15, 12, tzinfo=dt_timezone.utc)
+
+    def setUp(self):
+        patcher = mock.patch('django.utils.timezone.now', return_value=self.NOW)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = UserCustom.objects.create_user(username='budget', email='budget@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        self.budget = Budget.objects.create(user=self.user, amount=Decimal('100.00'))
+
+    def spend(self, amount, date):
+        return Transaction.objects.create(
+            user=self.user, account=self.account, type=TransactionType.EXPENSE, amount=Decimal(amount),
+            category='FOOD', date=date, status=TransactionStatus.COMPLETED,
+        )
+
+    def test_expenses_dated_later_this_month_are_not_counted(self):
+        self.spend('50.00', self.NOW - timedelta(days=2))
+        self.spend('40.00', self.NOW + timedelta(days=5))
+        self.spend('7.00', self.NOW + timedelta(days=20))
+
+        self.assertEqual(Budget.objects.get(pk=self.budget.pk).current_month_expenses, Decimal('50.00'))
+        self.assertEqual(Budget.objects.with_current_month_expenses().get(pk=self.budget.pk).current_month_expenses, Decimal('50.00'))
+        self.assertFalse(EmailOutbox.objects.filter(kind=EmailOutbox.Kind.BUDGET_ALERT).exists())
+
+    def test_due_expense_crossing_a_threshold_alerts(self):
+        self.spend('50.00', self.NOW - timedelta(days=2))
+        self.spend('40.00', self.NOW - timedelta(hours=1))
+        self.assertEqual(EmailOutbox.objects.filter(kind=EmailOutbox.Kind.BUDGET_ALERT).count(), 1)
+
+
+class BalanceChangeTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='balances', email='balances@example.com')
+        self.checking = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        self.savings = Account.objects.create(user=self.user, name='Savings', balance=Decimal('10.00'))
+
+    def pending(self, account, amount, days, type_=TransactionType.EXPENSE, status=TransactionStatus.COMPLETED):
+        return Transaction(
+            user=self.user, account=account, type=type_, amount=Decimal(amount), category='FOOD',
+            date=timezone.now() - timedelta(days=days), status=status,
+        )
+
+    def test_nets_each_account_once(self):
+        overdraft = self.pending(self.savings, '30.00', 2)
+        scheduled = self.pending(self.savings, '500.00', 1, status=TransactionStatus.PENDING)
+        rows = [
+            self.pending(self.checking, '60.00', 3), self.pending(self.checking, '25.00', 1, TransactionType.INCOME),
+            overdraft, self.pending(self.savings, '5.00', 1), scheduled,
+        ]
+        with transaction.atomic(), self.assertNumQueries(2):
+            accepted, rejected = apply_balance_changes(rows)
+
+        self.assertEqual(rejected, [(overdraft, INSUFFICIENT_FUNDS)])
+        self.assertEqual(len(accepted), 4)
+        self.assertIn(scheduled, accepted)
+        balances = dict(Account.objects.filter(user=self.user).values_list('name', 'balance'))
+        self.assertEqual(balances, {'Checking': Decimal('65.00'), 'Savings': Decimal('5.00')})
+
+
+class BudgetAlertTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='alerts', email='alerts@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        self.budget = Budget.objects.create(user=self.user, amount=Decimal('100.00'))
+
+    def spend(self, amount):
+        Transaction.objects.create(
+            user=self.user, account=self.account, type=TransactionType.EXPENSE, amount=Decimal(amount),
+            category='FOOD', date=timezone.now() - timedelta(minutes=1), status=TransactionStatus.COMPLETED,
+        )
+
+    def alerts(self):
+        return list(EmailOutbox.objects.filter(kind=EmailOutbox.Kind.BUDGET_ALERT).order_by('id'))
+
+    def test_crossed_threshold_picks_the_highest_one_passed(self):
+        self.assertEqual(crossed_threshold(Decimal('70'), Decimal('85'), Decimal('100'), (80, 100)), 80)
+        self.assertEqual(crossed_threshold(Decimal('70'), Decimal('120'), Decimal('100'), (80, 100)), 100)
+        self.assertIsNone(crossed_threshold(Decimal('80'), Decimal('90'), Decimal('100'), (80, 100)))
+
+    def test_alerts_only_on_the_write_that_crosses(self):
+        self.spend('70.00')
+        self.assertEqual(self.alerts(), [])
+        with mock.patch('expense.services.budget_alert_service.dispatch_pending_emails.delay') as delay, \
+                self.captureOnCommitCallbacks(execute=True):
+            self.spend('15.00')
+        delay.assert_called_once_with()
+
+        alert, = self.alerts()
+        self.assertEqual((alert.to_email, alert.context['percentage'], alert.context['remaining']), ('alerts@example.com', 85, '15.00'))
+        self.budget.refresh_from_db()
+        self.assertIsNotNone(self.budget.last_alert_sent)
+
+        self.spend('5.00')
+        self.assertEqual(len(self.alerts()), 1)
+
+    def test_next_threshold_waits_for_the_cooldown(self):
+        self.spend('85.00')
+        self.spend('20.00')
+        self.assertEqual(len(self.alerts()), 1)
+
+    def test_next_threshold_alerts_after_the_cooldown(self):
+        self.spend('85.00')
+        Budget.objects.filter(pk=self.budget.pk).update(last_alert_sent=timezone.now() - timedelta(hours=25))
+        self.spend('20.00')
+        self.assertEqual([alert.context['percentage'] for alert in self.alerts()], [85, 105])
+
+    def test_import_crossing_alerts_once(self):
+        rows = ''.join(f'EXPENSE,30.00,FOOD,{timezone.localdate().isoformat()},{self.account.pk},Row {index}\n' for index in range(4))
+        upload = SimpleUploadedFile('transactions.csv', (TransactionImportTests.HEADER + rows).encode())
+        TransactionImporter(self.user).run(upload)
+        alert, = self.alerts()
+        self.assertEqual(alert.context['spent'], '120.00')
+
+
+class BudgetMemoTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='memo', email='memo@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        Budget.objects.create(user=self.user, amount=Decimal('200.00'))
+        self.spend('50.00')
+
+    def spend(self, amount):
+        Transaction.objects.create(
+            user=self.user, account=self.account, type=TransactionType.EXPENSE, amount=Decimal(amount),
+            category='FOOD', date=timezone.now() - timedelta(minutes=1), status=TransactionStatus.COMPLETED,
+        )
+
+    def test_derived_values_are_computed_once(self):
+        budget = Budget.objects.get(user=self.user)
+        with self.assertNumQueries(2):
+            self.assertEqual(budget.current_month_expenses, Decimal('50.00'))
+        with self.assertNumQueries(0):
+            self.assertEqual(budget.budget_utilization_percentage, Decimal('25'))
+            self.assertFalse(budget.should_send_alert())
+
+    def test_annotated_queryset_prefills_the_value(self):
+        budget = Budget.objects.with_current_month_expenses().get(user=self.user)
+        with self.assertNumQueries(0):
+            self.assertEqual(budget.current_month_expenses, Decimal('50.00'))
+
+    def test_reload_and_save_drop_the_memo(self):
+        budget = Budget.objects.get(user=self.user)
+        self.assertEqual(budget.budget_utilization_percentage, Decimal('25'))
+        self.spend('30.00')
+        self.assertEqual(budget.current_month_expenses, Decimal('50.00'))
+        budget.refresh_from_db()
+        self.assertEqual(budget.current_month_expenses, Decimal('80.00'))
+
+        budget.amount = Decimal('100.00')
+        budget.save()
+        self.assertEqual(budget.budget_utilization_percentage, Decimal('80'))
+
+
+class TransactionImportTests(TestCase):
+    HEADER = 'type,amount,category,date,account_id,description\n'
+
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='importer', email='importer@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+
+    def upload(self, *rows):
+        body = self.HEADER + ''.join(f'{row}\n' for row in rows)
+        return SimpleUploadedFile('transactions.csv', body.encode())
+
+    def row(self, amount='10.00', date='2026-09-05', description='Coffee', type_='EXPENSE'):
+        return f'{type_},{amount},FOOD,{date},{self.account.pk},{description}'
+
+    def test_streams_in_chunks_and_reports_progress(self):
+        progress = []
+        rows = [self.row(amount=f'{index}.00') for index in range(1, 8)]
+        rows[4] = self.row(amount='nope')
+        result = TransactionImporter(self.user, chunk_size=3, on_progress=progress.append).run(self.upload(*rows))
+
+        self.assertEqual((result['success_count'], result['total_rows'], result['chunks']), (6, 7, 3))
+        # Row numbers keep counting across chunk boundaries.
+        self.assertEqual(result['errors'][0]['rows'], [5])
+        self.assertEqual([(step['chunk'], step['rows_processed'], step['created']) for step in progress], [(1, 3, 3), (2, 6, 5), (3, 7, 6)])
+
+    def test_missing_column_is_a_read_error(self):
+        upload = SimpleUploadedFile('transactions.csv', b'type,amount,date\nEXPENSE,1.00,2026-09-05\n')
+        result = TransactionImporter(self.user).run(upload)
+        self.assertEqual((result['success_count'], result['errors'][0]['code']), (0, 'read_error'))
+        self.assertIn('category, account_id', result['errors'][0]['example'])
+
+    def test_rejects_bad_rows_individually(self):
+        result = TransactionImporter(self.user).run(self.upload(
+            self.row(date='2026-02-30'), self.row(amount='1e20'), self.row(amount='1.234'), self.row(),
+        ))
+        self.assertEqual(result['success_count'], 1)
+        self.assertEqual({group['code']: group['rows'] for group in result['errors']}, {'invalid_date': [1], 'invalid_amount': [2, 3]})
+
+    def test_balances_replay_in_date_order_and_reject_overdrafts(self):
+        result = TransactionImporter(self.user).run(self.upload(
+            self.row(amount='500.00', date='2026-09-03', type_='INCOME'),
+            self.row(amount='900.00', date='2026-09-01'),
+            self.row(amount='200.00', date='2026-09-02'),
+            self.row(amount='200.00', date='2026-09-04'),
+        ))
+
+        self.assertEqual(result['success_count'], 3)
+        self.assertEqual([(group['code'], group['rows']) for group in result['errors']], [('insufficient_funds', [3])])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('400.00'))
+        rollup = MonthlySpendingRollup.objects.get(user=self.user, type=TransactionType.EXPENSE)
+        self.assertEqual((rollup.total, rollup.count), (Decimal('1100.00'), 2))
+
+    def test_memo_tables_stay_bounded(self):
+        rows = [self.row(amount=f'{day}.00', date=f'2026-09-{day:02d}') for day in range(1, 21)]
+        with mock.patch('expense.services.import_service.MEMO_SIZE', 5):
+            importer = TransactionImporter(self.user, chunk_size=4)
+            result = importer.run(self.upload(*rows))
+        self.assertEqual(result['success_count'], 20)
+        self.assertEqual([len(importer._dates), len(importer._amounts), len(importer._occurrences)], [5, 5, 5])
+
+    def test_reimport_skips_stored_rows(self):
+        rows = (self.row(), self.row(), self.row(description='Lunch'))
+        self.assertEqual(TransactionImporter(self.user).run(self.upload(*rows))['success_count'], 3)
+
+        result = TransactionImporter(self.user).run(self.upload(*rows, self.row(description='Dinner')))
+        self.assertEqual((result['success_count'], result['duplicate_count']), (1, 3))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('960.00'))
+
+    def test_fingerprint_is_unique_per_user(self):
+        TransactionImporter(self.user).run(self.upload(self.row()))
+        stored = Transaction.objects.get(user=self.user)
+        copy = Transaction(
+            user=self.user, account=self.account, type=stored.type, amount=stored.amount,
+            category=stored.category, date=stored.date, fingerprint=stored.fingerprint,
+        )
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Transaction.objects.bulk_create([copy])
+
+    def test_repeat_past_the_window_is_a_duplicate_not_an_error(self):
+        upload = self.upload(self.row(), self.row(description='Lunch'), self.row(description='Tea'), self.row())
+        with mock.patch('expense.services.import_service.MEMO_SIZE', 1):
+            result = TransactionImporter(self.user).run(upload)
+        self.assertEqual((result['success_count'], result['duplicate_count'], result['error_count']), (3, 1, 0))
+
+    def test_identical_rows_within_window_are_kept(self):
+        upload = self.upload(self.row(), self.row(), self.row(description='Lunch'))
+        with mock.patch('expense.services.import_service.MEMO_SIZE', 2):
+            self.assertEqual(TransactionImporter(self.user, chunk_size=1).run(upload)['success_count'], 3)
+
+
+class ImportJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = self.settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = UserCustom.objects.create_user(username='jobs', email='jobs@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def queue(self):
+        body = TransactionImportTests.HEADER + ''.join(
+            f'EXPENSE,{day}.00,FOOD,2026-09-{day:02d},{self.account.pk},\n' for day in range(1, 4)
+        ) + 'EXPENSE,x,FOOD,2026-09-04,' + str(self.account.pk) + ',\n'
+        upload = SimpleUploadedFile('transactions.csv', body.encode())
+        with mock.patch('expense.tasks.run_transaction_import.delay') as delay, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/expense/transactions/bulk/', {'csv_file': upload, 'background': True}, format='multipart')
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['data']['id']
+        delay.assert_called_once_with(job_id)
+        return job_id
+
+    def test_background_import_runs_once(self):
+        job_id = self.queue()
+        self.assertEqual(TransactionImportJob.objects.get(id=job_id).status, ImportJobStatus.PENDING)
+
+        run_transaction_import(job_id)
+        job = TransactionImportJob.objects.get(id=job_id)
+        self.assertEqual((job.status, job.total_rows, job.success_count, job.error_count), (ImportJobStatus.COMPLETED, 4, 3, 1))
+        self.assertFalse(job.csv_file)
+
+        # A redelivered task finds the job already claimed and imports nothing.
+        self.assertEqual(run_transaction_import(job_id), {'job_id': job_id, 'status': ImportJobStatus.COMPLETED})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+
+        data = self.client.get(f'/expense/transactions/bulk/{job_id}/').data['data']
+        self.assertEqual((data['status'], data['progress_percentage']), (ImportJobStatus.COMPLETED, 100))
+
+    def test_running_job_is_not_claimed_again(self):
+        job_id = self.queue()
+        TransactionImportJob.objects.filter(id=job_id).update(status=ImportJobStatus.RUNNING)
+        self.assertEqual(run_transaction_import(job_id)['status'], ImportJobStatus.RUNNING)
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+
+    def test_other_users_job_is_not_found(self):
+        job_id = self.queue()
+        stranger = UserCustom.objects.create_user(username='stranger', email='stranger@example.com')
+        self.client.force_authenticate(stranger)
+        self.assertFalse(self.client.get(f'/expense/transactions/bulk/{job_id}/').data['success'])
+
+
+class RecurrenceTests(TestCase):
+    UTC = dt_timezone.utc
+
+    def at(self, *args):
+        return datetime(*args, tzinfo=self.UTC)
+
+    def test_month_ends_clamp_without_drifting(self):
+        anchor = self.at(2026, 1, 31, 9)
+        steps = [add_interval(anchor, RecurringInterval.MONTHLY, periods).date() for periods in (1, 2, 3)]
+        self.assertEqual([str(step) for step in steps], ['2026-02-28', '2026-03-31', '2026-04-30'])
+        self.assertEqual(add_interval(self.at(2028, 2, 29), RecurringInterval.YEARLY).date().isoformat(), '2029-02-28')
+        self.assertEqual(add_interval(self.at(2027, 1, 31), RecurringInterval.MONTHLY).date().isoformat(), '2027-02-28')
+        self.assertEqual(add_interval(self.at(2028, 1, 31), RecurringInterval.MONTHLY).date().isoformat(), '2028-02-29')
+
+    def test_steps_follow_the_local_calendar(self):
+        with timezone.override(ZoneInfo('America/New_York')):
+            # 00:30 local on the 1st is 05:30 UTC; the monthly step keeps it on the local 1st.
+            anchor = datetime(2026, 1, 1, 0, 30, tzinfo=ZoneInfo('America/New_York'))
+            step = timezone.localtime(add_interval(anchor.astimezone(self.UTC), RecurringInterval.MONTHLY))
+        self.assertEqual((step.month, step.day, step.hour, step.minute), (2, 1, 0, 30))
+
+    def test_due_occurrences_stop_at_the_limit(self):
+        anchor = self.at(2026, 1, 31)
+        dates, next_date = due_occurrences(anchor, self.at(2026, 2, 28), RecurringInterval.MONTHLY, self.at(2026, 12, 1), 3)
+        self.assertEqual([value.date().isoformat() for value in dates], ['2026-02-28', '2026-03-31', '2026-04-30'])
+        self.assertEqual(next_date.date().isoformat(), '2026-05-31')
+
+    def test_materializer_catches_up_once(self):
+        user = UserCustom.objects.create_user(username='recurring', email='recurring@example.com')
+        account = Account.objects.create(user=user, name='Checking', balance=Decimal('250.00'))
+        Transaction.objects.create(
+            user=user, account=account, type=TransactionType.EXPENSE, amount=Decimal('100.00'), category='FOOD',
+            date=self.at(2026, 1, 31, 9), status=TransactionStatus.COMPLETED, is_recurring=True,
+            recurring_interval=RecurringInterval.MONTHLY, next_recurring_date=self.at(2026, 2, 28, 9),
+        )
+
+        result = materialize_recurring_transactions(now=self.at(2026, 4, 15))
+        self.assertEqual((result['templates'], result['created'], result['failed']), (1, 1, 1))
+        generated = Transaction.objects.filter(user=user, is_recurring=False).order_by('date')
+        self.assertEqual([(row.date.date().isoformat(), row.status) for row in generated],
+                         [('2026-02-28', TransactionStatus.COMPLETED), ('2026-03-31', TransactionStatus.FAILED)])
+        account.refresh_from_db()
+        self.assertEqual(account.balance, Decimal('50.00'))
+        template = Transaction.objects.get(user=user, is_recurring=True)
+        self.assertEqual(template.next_recurring_date, self.at(2026, 4, 30, 9))
+
+        self.assertEqual(materialize_recurring_transactions(now=self.at(2026, 4, 15))['templates'], 0)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='pages', email='pages@example.com')
+        account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        same_day = timezone.now() - timedelta(days=1)
+        # Three rows share a date so the later keys have to break the tie.
+        dates = [same_day, same_day, same_day, same_day - timedelta(days=1), same_day + timedelta(hours=1)]
+        self.transactions = [
+            Transaction.objects.create(
+                user=self.user, account=account, type=TransactionType.EXPENSE, amount=Decimal('1.00'),
+                category='FOOD', date=date, status=TransactionStatus.COMPLETED,
+            )
+            for date in dates
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, **params):
+        return self.client.get('/expense/transactions/', params).data['data']
+
+    def test_walks_every_row_once_in_keyset_order(self):
+        data = self.page(page_size=2, count='true')
+        self.assertEqual(data['count'], 5)
+        seen = [row['id'] for row in data['results']]
+        while data['next_cursor'] is not None:
+            data = self.page(page_size=2, cursor=data['next_cursor'])
+            self.assertNotIn('count', data)
+            seen.extend(row['id'] for row in data['results'])
+
+        expected = sorted(self.transactions, key=lambda row: (row.date, row.created_at, row.id), reverse=True)
+        self.assertEqual(seen, [str(row.id) for row in expected])
+
+    def test_without_cursor_or_page_size_returns_the_full_list(self):
+        data = self.page()
+        self.assertEqual((len(data['results']), data['count']), (5, 5))
+        self.assertNotIn('next_cursor', data)
+
+    def test_page_size_is_clamped(self):
+        self.assertEqual(self.page(page_size=0)['page_size'], 1)
+        self.assertEqual(self.page(page_size=10_000)['page_size'], 500)
+
+    def test_invalid_cursor_is_rejected(self):
+        def encode(values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+        for cursor in ('not-base64!', encode(['2026-01-01T00:00:00Z']), encode(['2026-01-01T00:00:00Z', '2026-01-01T00:00:00Z', 'nope'])):
+            response = self.client.get('/expense/transactions/', {'cursor': cursor})
+            self.assertFalse(response.data['success'], cursor)
+            self.assertEqual(response.data['errors'], ['Invalid cursor'])
+
+
+class SpendingTimeseriesTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='series', email='series@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+
+    def record(self, amount, when, type_=TransactionType.EXPENSE, category='FOOD', status=TransactionStatus.COMPLETED):
+        Transaction.objects.create(
+            user=self.user, account=self.account, type=type_, amount=Decimal(amount),
+            category=category, date=when, status=status,
+        )
+
+    def test_open_range_defaults_to_the_last_buckets(self):
+        date_range, granularity = resolve_range({'date_to': '2026-10-15'})
+        self.assertEqual((granularity, date_range.as_period()), ('month', {'from': '2025-11-01', 'to': '2026-10-15'}))
+        date_range, _granularity = resolve_range({'date_to': '2026-10-15', 'granularity': 'week'})
+        self.assertEqual(date_range.date_from.isoformat(), '2026-07-27')
+
+    def test_rejects_bad_granularity_and_overlong_ranges(self):
+        with self.assertRaises(ValidationError):
+            resolve_range({'granularity': 'hour'})
+        with self.settings(ANALYTICS_MAX_BUCKETS=30), self.assertRaises(ValidationError):
+            resolve_range({'date_from': '2026-09-01', 'date_to': '2026-10-15', 'granularity': 'day'})
+        self.assertEqual(resolve_range({'date_from': '2026-09-01', 'date_to': '2026-10-15', 'granularity': 'week'})[1], 'week')
+
+    def test_fills_empty_buckets(self):
+        self.record('500.00', datetime(2026, 9, 2, 9, tzinfo=dt_timezone.utc), TransactionType.INCOME, 'SALARY')
+        self.record('20.00', datetime(2026, 9, 3, 9, tzinfo=dt_timezone.utc))
+        self.record('5.00', datetime(2026, 9, 3, 10, tzinfo=dt_timezone.utc), category='TRANSPORT')
+        self.record('40.00', datetime(2026, 9, 22, 9, tzinfo=dt_timezone.utc))
+        self.record('99.00', datetime(2026, 9, 23, 9, tzinfo=dt_timezone.utc), status=TransactionStatus.PENDING)
+        self.record('77.00', datetime(2026, 10, 1, 9, tzinfo=dt_timezone.utc))
+
+        result = spending_timeseries(self.user, DateRange(date(2026, 9, 1), date(2026, 9, 30)), 'week')
+        self.assertEqual(
+            [(bucket['period'], bucket['income'], bucket['expense'], bucket['count']) for bucket in result['series']],
+            [('2026-08-31', Decimal('500.00'), Decimal('25.00'), 3), ('2026-09-07', 0, 0, 0),
+             ('2026-09-14', 0, 0, 0), ('2026-09-21', 0, Decimal('40.00'), 1), ('2026-09-28', 0, 0, 0)],
+        )
+        self.assertEqual(result['series'][0]['net'], Decimal('475.00'))
+        self.assertEqual([item['category'] for item in result['series'][0]['categories']], ['SALARY', 'FOOD', 'TRANSPORT'])
+        self.assertEqual((result['total_income'], result['total_expense']), (Decimal('500.00'), Decimal('65.00')))
+        self.assertEqual(result['categories'][1], {'category': 'FOOD', 'type': TransactionType.EXPENSE, 'total': Decimal('60.00'), 'count': 2})
+
+    def test_buckets_follow_the_local_day(self):
+        # 02:00 UTC on the 1st is still the 31st in New York.
+        self.record('10.00', datetime(2026, 9, 1, 2, tzinfo=dt_timezone.utc))
+        with timezone.override(ZoneInfo('America/New_York')):
+            result = spending_timeseries(self.user, DateRange(date(2026, 8, 1), date(2026, 9, 30)), 'month')
+        self.assertEqual([bucket['expense'] for bucket in result['series']], [Decimal('10.00'), 0])
+
+
+class TransactionSummaryTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='summary', email='summary@example.com')
+        self.account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('1000.00'))
+        for amount, type_, category, status, day in (
+            ('300.00', TransactionType.INCOME, 'SALARY', TransactionStatus.COMPLETED, 2),
+            ('20.00', TransactionType.EXPENSE, 'FOOD', TransactionStatus.COMPLETED, 3),
+            ('15.00', TransactionType.EXPENSE, 'FOOD', TransactionStatus.COMPLETED, 4),
+            ('50.00', TransactionType.EXPENSE, 'TRANSPORT', TransactionStatus.COMPLETED, 4),
+            ('70.00', TransactionType.EXPENSE, 'FOOD', TransactionStatus.PENDING, 5),
+            ('9.00', TransactionType.EXPENSE, 'FOOD', TransactionStatus.COMPLETED, 20),
+        ):
+            Transaction.objects.create(
+                user=self.user, account=self.account, type=type_, amount=Decimal(amount), category=category,
+                date=datetime(2026, 9, day, 9, tzinfo=dt_timezone.utc), status=status,
+            )
+        Transaction.objects.filter(amount=Decimal('15.00')).update(status=TransactionStatus.FAILED)
+
+    def test_ranged_summary_in_one_query(self):
+        with self.assertNumQueries(1):
+            summary = transaction_summary(self.user, DateRange(date(2026, 9, 1), date(2026, 9, 10)))
+
+        self.assertEqual((summary['total_income'], summary['total_expense'], summary['net_amount']),
+                         (Decimal('300.00'), Decimal('70.00'), Decimal('230.00')))
+        self.assertEqual((summary['transaction_count'], summary['pending_count'], summary['failed_count']), (3, 1, 1))
+        self.assertEqual(summary['category_breakdown'], [
+            {'category': 'SALARY', 'type': TransactionType.INCOME, 'total': Decimal('300.00')},
+            {'category': 'TRANSPORT', 'type': TransactionType.EXPENSE, 'total': Decimal('50.00')},
+            {'category': 'FOOD', 'type': TransactionType.EXPENSE, 'total': Decimal('20.00')},
+        ])
+
+    def test_undated_summary_covers_every_row(self):
+        summary = transaction_summary(self.user, DateRange())
+        self.assertEqual((summary['total_expense'], summary['transaction_count']), (Decimal('79.00'), 4))
+        self.assertEqual(summary['period'], {'from': None, 'to': None})
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'response-tests'}})
+class DataVersionCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        response_cache._local_responses.clear()
+        self.user = UserCustom.objects.create_user(username='cached', email='cached@example.com')
+        self.other = UserCustom.objects.create_user(username='uncached', email='uncached@example.com')
+        self.builds = 0
+
+    def build(self):
+        self.builds += 1
+        return self.builds
+
+    def cached(self, user=None, **kwargs):
+        return response_cache.cached_response('test', self.build, user=user or self.user, **kwargs)
+
+    def test_entry_lives_until_the_users_data_changes(self):
+        self.assertEqual((self.cached(), self.cached(), self.cached(params=('x',))), (1, 1, 2))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response_cache.bump_data_version(self.other.pk)
+        self.assertEqual(self.cached(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response_cache.bump_data_version(self.user.pk)
+        self.assertEqual(self.cached(), 3)
+
+    def test_bump_waits_for_the_commit(self):
+        self.cached()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            response_cache.bump_data_version(self.user.pk)
+            self.assertEqual(self.cached(), 1)
+        self.assertEqual(len(callbacks), 1)
+
+    def test_stock_version_covers_every_user(self):
+        self.assertEqual((self.cached(stocks=True), self.cached(self.other, stocks=True)), (1, 2))
+        with self.captureOnCommitCallbacks(execute=True):
+            response_cache.bump_stocks_version()
+        self.assertEqual((self.cached(stocks=True), self.cached(self.other, stocks=True), self.cached()), (3, 4, 5))
+
+    def test_evicted_counter_never_reuses_an_old_key(self):
+        self.cached()
+        cache.delete(f'data-version:user:{self.user.pk}')
+        self.assertEqual(self.cached(), 2)
+
+    def test_failed_build_is_not_cached(self):
+        def broken():
+            raise RuntimeError('boom')
+
+        with self.assertRaises(RuntimeError):
+            response_cache.cached_response('test', broken, user=self.user)
+        self.assertEqual(self.cached(), 1)
+
+    def test_transaction_write_refreshes_the_analytics(self):
+        account = Account.objects.create(user=self.user, name='Checking', balance=Decimal('100.00'))
+        client = APIClient()
+        client.force_authenticate(self.user)
+        params = {'granularity': 'day', 'date_from': timezone.localdate().isoformat()}
+        self.assertEqual(client.get('/expense/transactions/analytics/', params).data['data']['total_expense'], Decimal('0.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Transaction.objects.create(
+                user=self.user, account=account, type=TransactionType.EXPENSE, amount=Decimal('12.00'),
+                category='FOOD', date=timezone.now(), status=TransactionStatus.COMPLETED,
+            )
+        self.assertEqual(client.get('/expense/transactions/analytics/', params).data['data']['total_expense'], Decimal('12.00'))
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='conditional', email='conditional@example.com')
+        self.first = Account.objects.create(user=self.user, name='First', balance=Decimal('10.00'))
+        self.second = Account.objects.create(user=self.user, name='Second', balance=Decimal('20.00'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_etag_answers_304_until_a_row_goes(self):
+        response = self.client.get('/expense/accounts/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/expense/accounts/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.second.delete()
+        response = self.client.get('/expense/accounts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_ignores_if_modified_since(self):
+        since = 'Fri, 01 Jan 2100 00:00:00 GMT'
+        self.assertEqual(self.client.get('/expense/accounts/', HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_retrieve_honours_if_modified_since(self):
+        url = f'/expense/accounts/{self.first.pk}/'
+        last_modified = self.client.get(url)['Last-Modified']
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        Account.objects.filter(pk=self.first.pk).update(updated_at=timezone.now() + timedelta(seconds=2))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 200)
+
+    def test_plain_get_computes_validators_after_the_body(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/expense/accounts/')
+        aggregates = [index for index, query in enumerate(queries.captured_queries) if 'MAX(' in query['sql']]
+        self.assertEqual(aggregates, [len(queries) - 1])
+        self.assertIn('ETag', response)
+
+    def test_budget_etag_changes_with_the_month(self):
+        Budget.objects.create(user=self.user, amount=Decimal('100.00'))
+        etag = self.client.get('/expense/budget/')['ETag']
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + timedelta(days=40)):
+            self.assertEqual(self.client.get('/expense/budget/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', "query plans are checked on Postgres only")
+class DateRangePlanTests(TestCase):
+    """
+    The date filters must stay sargable: over a realistic table the list and
+    summary range queries use an index condition on date, not a filter on a
+    cast of it (which is what date__date lookups produced).
+    """
+
+    USERS, MONTHS, PER_MONTH = 40, 24, 30
+
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        rows = []
+        for user_index in range(cls.USERS):
+            user = UserCustom.objects.create_user(username=f'plan{user_index}', email=f'plan{user_index}@example.com')
+            account = Account.objects.create(user=user, name='Plan', balance=Decimal('1000.00'))
+            for offset in range(cls.MONTHS * cls.PER_MONTH):
+                rows.append(Transaction(
+                    user=user, account=account, amount=Decimal('1.00'), category='FOOD',
+                    type=TransactionType.EXPENSE if offset % 4 else TransactionType.INCOME,
+                    date=now - timedelta(days=offset * 30 / cls.PER_MONTH, hours=user_index),
+                    status=TransactionStatus.COMPLETED,
+                ))
+        Transaction.objects.bulk_create(rows, batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE main_transactions')
+        cls.user = user
+
+    def setUp(self):
+        today = timezone.localdate()
+        self.date_range = DateRange(today - timedelta(days=30), today)
+
+    def assertDateIndexCond(self, queryset):
+        plan = queryset.explain()
+        self.assertNotIn('Seq Scan on main_transactions', plan)
+        self.assertRegex(plan, r'Index Cond: .*\(date >= ', plan)
+        self.assertNotIn('::date', plan)
+
+    def test_list_range_uses_index(self):
+        queryset = self.date_range.filter(Transaction.objects.filter(user=self.user))
+        self.assertDateIndexCond(queryset.order_by('-date', '-created_at', '-id')[:50])
+
+    def test_summary_range_uses_index(self):
+        self.assertDateIndexCond(self.date_range.filter(Transaction.objects.filter(user=self.user, type=TransactionType.EXPENSE)))
@@ -2,17 +2,25 @@ import calendar
 from decimal import Decimal
 from django.db import transaction
 from django.db.models.functions import Cast
-from django.db.models import Q, Sum, Count, Prefetch, When, FloatField, ExpressionWrapper, F, Case
+from django.db.models import Q, Sum, Count, Max, Prefetch, When, FloatField, ExpressionWrapper, F, Case
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
-from rest_framework import permissions, viewsets, filters
+from rest_framework import permissions, viewsets, filters, status
 from rest_framework.decorators import action, permission_classes, api_view
 from rest_framework.exceptions import ValidationError, NotFound
+from backend.cache import cached_response
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import KeysetPagination
 from backend.utils import create_success_response, create_error_response
-from .models import Account, Transaction, Budget, AccountType, TransactionStatus, TransactionType, RecurringInterval
+from .models import (
+    Account, Transaction, Budget, AccountType, MonthlySpendingRollup, TransactionImportJob,
+    TransactionStatus, TransactionType, RecurringInterval, month_start, not_yet_due_expenses
+)
+from .filters import DateRange
+from .services.analytics_service import cached_spending_timeseries, resolve_range, transaction_summary
 from .serializers import *
 
-class AccountViewSet(viewsets.ModelViewSet):
+class AccountViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = "id"
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
@@ -33,7 +41,10 @@ class AccountViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
+            queryset = self.apply_updated_since(self.filter_queryset(self.get_queryset()))
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
             if not queryset.exists():
                 return create_success_response(
                     _("No accounts found. Create your first account to get started."),
@@ -54,6 +65,11 @@ class AccountViewSet(viewsets.ModelViewSet):
                 _("Accounts retrieved successfully."),
                 data={'results': serializer.data, 'count': len(serializer.data)}
             )
+        except ValidationError as e:
+            return create_error_response(
+                _("Invalid filter parameters."),
+                errors=e.detail
+            )
         except Exception:
             return create_error_response(
                 _("Failed to retrieve accounts."),
@@ -63,6 +79,9 @@ class AccountViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
             serializer = self.get_serializer(instance)
             return create_success_response(
                 _("Account retrieved successfully."),
@@ -244,7 +263,7 @@ class AccountViewSet(viewsets.ModelViewSet):
             )
 
 
-class TransactionViewSet(viewsets.ModelViewSet):
+class TransactionViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = "id"
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
@@ -252,6 +271,9 @@ class TransactionViewSet(viewsets.ModelViewSet):
     ordering_fields = ['date', 'amount', 'created_at', 'category']
     ordering = ['-date', '-created_at']
     search_fields = ['description', 'category']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-date', '-created_at', '-id')
+    conditional_dependencies = ('account__updated_at',)
 
     def get_queryset(self):
         queryset = Transaction.objects.filter(user=self.request.user).order_by('-date', '-created_at')
@@ -269,18 +291,11 @@ class TransactionViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
-            date_from = request.query_params.get('date_from')
-            date_to = request.query_params.get('date_to')
-            if date_from:
-                queryset = queryset.filter(date__date__gte=date_from)
-            if date_to:
-                queryset = queryset.filter(date__date__lte=date_to)
-            if not queryset.exists():
-                return create_success_response(
-                    _("No transactions found."),
-                    data={'results': [], 'count': 0, 'next': None, 'previous': None}
-                )
+            queryset = DateRange.from_params(request.query_params).filter(self.filter_queryset(self.get_queryset()))
+            queryset = self.apply_updated_since(queryset)
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
             page = self.paginate_queryset(queryset)
             if page is not None:
                 serializer = self.get_serializer(page, many=True)
@@ -289,10 +304,20 @@ class TransactionViewSet(viewsets.ModelViewSet):
                     data=self.get_paginated_response(serializer.data).data
                 )
             serializer = self.get_serializer(queryset, many=True)
+            if not serializer.data:
+                return create_success_response(
+                    _("No transactions found."),
+                    data={'results': [], 'count': 0, 'next': None, 'previous': None}
+                )
             return create_success_response(
                 _("Transactions retrieved successfully."),
                 data={'results': serializer.data, 'count': len(serializer.data)}
             )
+        except ValidationError as e:
+            return create_error_response(
+                _("Invalid filter parameters."),
+                errors=e.detail
+            )
         except Exception as error:
             return create_error_response(
                 _("Failed to retrieve transactions."),
@@ -302,6 +327,9 @@ class TransactionViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
             return create_success_response(
                 _("Transaction retrieved successfully."),
                 data=self.get_serializer(instance).data
@@ -406,18 +434,48 @@ class TransactionViewSet(viewsets.ModelViewSet):
                     _("Invalid CSV data provided."),
                     errors=serializer.errors
                 )
+            if serializer.runs_in_background():
+                job = serializer.create_job()
+                return create_success_response(
+                    _("Import queued. Poll the job for progress."),
+                    data=TransactionImportJobSerializer(job).data,
+                    status_code=status.HTTP_202_ACCEPTED
+                )
             result = serializer.save()
             success_count = result.get('success_count', 0)
             total_rows = result.get('total_rows', 0)
             errors = result.get('errors', [])
-            message = _("All transactions imported successfully.") if not errors else _("Transactions imported with some errors.")
+            error_count = result.get('error_count', len(errors))
+            message = _("All transactions imported successfully.") if not error_count else _("Transactions imported with some errors.")
+            data = {
+                'success_count': success_count, 'duplicate_count': result.get('duplicate_count', 0),
+                'total_rows': total_rows, 'error_count': error_count, 'errors': errors
+            }
+            if 'chunks' in result:
+                data['chunks'] = result['chunks']
+            return create_success_response(message, data=data)
+        except Exception as error:
+            return create_error_response(
+                _("Bulk import failed."),
+                errors=[str(error)]
+            )
+
+    @action(detail=False, methods=['get'], url_path=r'bulk/(?P<job_id>[0-9a-f-]+)')
+    def bulk_status(self, request, job_id=None):
+        try:
+            job = TransactionImportJob.objects.filter(user=request.user, id=job_id).first()
+            if job is None:
+                return create_error_response(
+                    _("Import job not found."),
+                    status_code=status.HTTP_404_NOT_FOUND
+                )
             return create_success_response(
-                message,
-                data={'success_count': success_count, 'total_rows': total_rows, 'error_count': len(errors), 'errors': errors}
+                _("Import job retrieved successfully."),
+                data=TransactionImportJobSerializer(job).data
             )
         except Exception as error:
             return create_error_response(
-                _("Bulk import failed."),
+                _("Failed to retrieve import job."),
                 errors=[str(error)]
             )
 
@@ -450,56 +508,58 @@ class TransactionViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='summary')
     def summary(self, request):
         try:
-            queryset = Transaction.objects.filter(user=request.user)
-            date_from = request.query_params.get('date_from')
-            date_to = request.query_params.get('date_to')
-            if date_from:
-                queryset = queryset.filter(date__date__gte=date_from)
-            if date_to:
-                queryset = queryset.filter(date__date__lte=date_to)
-            summary_stats = queryset.aggregate(
-                total_income=Sum('amount', filter=Q(type=TransactionType.INCOME, status=TransactionStatus.COMPLETED)),
-                total_expense=Sum('amount', filter=Q(type=TransactionType.EXPENSE, status=TransactionStatus.COMPLETED)),
-                completed_count=Count('id', filter=Q(status=TransactionStatus.COMPLETED)),
-                pending_count=Count('id', filter=Q(status=TransactionStatus.PENDING)),
-                failed_count=Count('id', filter=Q(status=TransactionStatus.FAILED)),
-            )
-            total_income = summary_stats.get('total_income') or Decimal('0.00')
-            total_expense = summary_stats.get('total_expense') or Decimal('0.00')
-            try:
-                category_breakdown = list(queryset.filter(status=TransactionStatus.COMPLETED)
-                           .values('category','type')
-                           .annotate(total=Sum('amount'))
-                           .order_by('-total'))
-            except Exception:
-                category_breakdown = []
-            summary_data = {
-                'total_income': total_income,
-                'total_expense': total_expense,
-                'net_amount': total_income - total_expense,
-                'transaction_count': summary_stats.get('completed_count',0),
-                'pending_count': summary_stats.get('pending_count',0),
-                'failed_count': summary_stats.get('failed_count',0),
-                'category_breakdown': category_breakdown,
-                'period': {'from': date_from, 'to': date_to}
-            }
+            summary_data = transaction_summary(request.user, DateRange.from_params(request.query_params))
             return create_success_response(
                 _("Transaction summary retrieved successfully."),
                 data=summary_data
             )
+        except ValidationError as e:
+            return create_error_response(
+                _("Invalid date range."),
+                errors=e.detail
+            )
         except Exception as error:
             return create_error_response(
                 _("Failed to retrieve transaction summary."),
                 errors=[str(error)]
             )
 
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def analytics(self, request):
+        try:
+            date_range, granularity = resolve_range(request.query_params)
+            return create_success_response(
+                _("Transaction analytics retrieved successfully."),
+                data=cached_spending_timeseries(request.user, date_range, granularity)
+            )
+        except ValidationError as e:
+            return create_error_response(
+                _("Invalid analytics parameters."),
+                errors=e.detail
+            )
+        except Exception as error:
+            return create_error_response(
+                _("Failed to retrieve transaction analytics."),
+                errors=[str(error)]
+            )
+
 
-class BudgetViewSet(viewsets.ModelViewSet):
+class BudgetViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = "id"
     filter_backends = [filters.OrderingFilter]
     ordering_fields = ['amount', 'created_at', 'updated_at']
     ordering = ['-created_at']
+    conditional_dependencies = ('user__spending_rollups__updated_at',)
+
+    def conditional_fingerprint(self):
+        # current_month_expenses switches to a new month's rollup bucket without any row changing,
+        # and grows when an expense dated later in the month falls due.
+        month = DateRange.for_month(timezone.now())
+        latest_due = month.filter(Transaction.objects.filter(
+            user=self.request.user, type=TransactionType.EXPENSE, status=TransactionStatus.COMPLETED, date__lte=timezone.now()
+        )).aggregate(latest=Max('date'))['latest']
+        return (month.start, latest_due)
 
     def get_queryset(self):
         queryset = Budget.objects.filter(user=self.request.user)
@@ -516,12 +576,16 @@ class BudgetViewSet(viewsets.ModelViewSet):
     def list(self, request, *args, **kwargs):
         try:
             queryset = self.filter_queryset(self.get_queryset())
-            if not queryset.exists():
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
+            budget = queryset.first()
+            if budget is None:
                 return create_success_response(
                     _("No budget found."),
                     data={'results': [], 'count': 0, 'next': None, 'previous': None}
                 )
-            serializer = self.get_serializer(queryset.first())
+            serializer = self.get_serializer(budget)
             return create_success_response(
                 _("Budget retrieved successfully."),
                 data={'results': [serializer.data], 'count': 1}
@@ -535,6 +599,9 @@ class BudgetViewSet(viewsets.ModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         try:
             instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
             return create_success_response(
                 _("Budget retrieved successfully."),
                 data=self.get_serializer(instance).data
@@ -656,7 +723,7 @@ class BudgetViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='current')
     def current(self, request):
         try:
-            budget = Budget.objects.get(user=request.user)
+            budget = Budget.objects.with_current_month_expenses().get(user=request.user)
             serializer = BudgetSerializer(budget, context={'request': request})
             return create_success_response(
                 _("Current budget retrieved successfully."),
@@ -676,87 +743,9 @@ class BudgetViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='summary')
     def summary(self, request):
         try:
-            budget = Budget.objects.select_related('user').get(user=request.user)
-            now = timezone.now()
-            start_of_month = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-
-            transactions_qs = Transaction.objects.filter(
-                user=request.user,
-                type=TransactionType.EXPENSE,
-                status=TransactionStatus.COMPLETED,
-                date__gte=start_of_month,
-                date__lte=now
-            )
-
-            current_expenses = transactions_qs.aggregate(total=Sum('amount'))['total'] or Decimal('0.00')
-            utilization_percentage = (float(current_expenses) / float(budget.amount) * 100 if budget.amount > 0 else 0.0)
-            transaction_count = transactions_qs.count()
-            average_transaction = (current_expenses / transaction_count if transaction_count > 0 else Decimal('0.00'))
-            days_in_month = calendar.monthrange(now.year, now.month)[1]
-            days_elapsed = now.day
-            days_remaining = days_in_month - days_elapsed + 1
-            average_daily_spending = (current_expenses / days_elapsed if days_elapsed > 0 else Decimal('0.00'))
-            projected_spending = average_daily_spending * days_in_month
-        
-            
-            category_breakdown_per = list(
-                transactions_qs.values('category')
-                .annotate(total=Sum('amount'))
-                .annotate(
-                    percentage=Case(
-                        When(total__gt=0, then=Cast(F('total') * 100.0 / current_expenses, FloatField())),
-                        default=0.0,
-                        output_field=FloatField()
-                    ) if current_expenses > 0 else ExpressionWrapper(
-                        F('total') * 0,  # This will always be 0
-                        output_field=FloatField()
-                    )
-                )
-                .values('category', 'total', 'percentage')
-                .order_by('-total')
-            )
-
-            # Round the percentages to 2 decimal places
-            for item in category_breakdown_per:
-                item['percentage'] = round(item['percentage'], 2) if current_expenses > 0 else 0.0
-
-            recommendations = []
-            if utilization_percentage >= 100:
-                recommendations.append({'type': 'critical', 'message': _("Budget exceeded!")})
-            elif utilization_percentage >= 80:
-                recommendations.append({'type': 'warning', 'message': _("Approaching budget limit.")})
-            elif utilization_percentage >= 60:
-                recommendations.append({'type': 'caution', 'message': _("Monitor high-spending categories.")})
-            else:
-                recommendations.append({'type': 'success', 'message': _("Great job staying within budget!")})
-
-            # CHANGED: Updated summary_data structure to include both formats
-            summary_data = {
-                # NEW: Added results array with budget info in the same format as list/retrieve
-                'result': {
-                    'id': str(budget.id),
-                    'amount': str(budget.amount),  # Convert to string to match your expected format
-                    'current_month_expenses': float(current_expenses),
-                    'budget_utilization_percentage': int(round(utilization_percentage)),  # Convert to int to match your format
-                    'last_alert_sent': budget.last_alert_sent,
-                    'created_at': budget.created_at,
-                    'updated_at': budget.updated_at
-                },
-                'utilization': {
-                    'current_month_expenses': current_expenses,
-                    'utilization_percentage': round(utilization_percentage, 2),
-                    'category_breakdown': category_breakdown_per,
-                    'average_daily_spending': average_daily_spending,
-                    'projected_monthly_spending': projected_spending,
-                    'days_remaining_in_month': days_remaining,
-                },
-                'transaction_stats': {
-                    'monthly_transaction_count': transaction_count,
-                    'average_transaction_amount': average_transaction,
-                },
-                'recommendations': recommendations
-            }
-
+            summary_data = cached_response(
+                'budget-summary', lambda: self._summary_data(request.user), user=request.user, params=(timezone.localdate(),)
+            )
             return create_success_response(
                 _("Budget summary retrieved successfully."),
                 data=summary_data
@@ -771,6 +760,89 @@ class BudgetViewSet(viewsets.ModelViewSet):
                 _("Failed to retrieve budget summary."),
                 errors=[str(e)]
             )
+
+    def _summary_data(self, user):
+        budget = Budget.objects.select_related('user').get(user=user)
+        now = timezone.now()
+
+        # One read of this month's pre-aggregated expense buckets replaces the sum/count/group-by scans.
+        category_totals = MonthlySpendingRollup.month_totals(
+            user, month_start(now), type_=TransactionType.EXPENSE
+        )
+        # Like current_month_expenses, count spending to date: take out what is dated later this month.
+        scheduled = (
+            not_yet_due_expenses(now).filter(user=user)
+            .values_list('category').annotate(total=Sum('amount'), count=Count('id')).order_by()
+        )
+        for category, total, count in scheduled:
+            bucket_total, bucket_count = category_totals.pop(category)
+            if bucket_count > count:
+                category_totals[category] = (bucket_total - total, bucket_count - count)
+        current_expenses = sum((total for total, _count in category_totals.values()), Decimal('0.00'))
+        utilization_percentage = (float(current_expenses) / float(budget.amount) * 100 if budget.amount > 0 else 0.0)
+        transaction_count = sum(count for _total, count in category_totals.values())
+        average_transaction = (current_expenses / transaction_count if transaction_count > 0 else Decimal('0.00'))
+        days_in_month = calendar.monthrange(now.year, now.month)[1]
+        days_elapsed = now.day
+        days_remaining = days_in_month - days_elapsed + 1
+        average_daily_spending = (current_expenses / days_elapsed if days_elapsed > 0 else Decimal('0.00'))
+        projected_spending = average_daily_spending * days_in_month
+
+        category_breakdown_per = sorted(
+            (
+                {
+                    'category': category,
+                    'total': total,
+                    'percentage': float(total) * 100.0 / float(current_expenses) if current_expenses > 0 else 0.0,
+                }
+                for category, (total, _count) in category_totals.items()
+            ),
+            key=lambda item: item['total'],
+            reverse=True
+        )
+
+        # Round the percentages to 2 decimal places
+        for item in category_breakdown_per:
+            item['percentage'] = round(item['percentage'], 2) if current_expenses > 0 else 0.0
+
+        recommendations = []
+        if utilization_percentage >= 100:
+            recommendations.append({'type': 'critical', 'message': _("Budget exceeded!")})
+        elif utilization_percentage >= 80:
+            recommendations.append({'type': 'warning', 'message': _("Approaching budget limit.")})
+        elif utilization_percentage >= 60:
+            recommendations.append({'type': 'caution', 'message': _("Monitor high-spending categories.")})
+        else:
+            recommendations.append({'type': 'success', 'message': _("Great job staying within budget!")})
+
+        # CHANGED: Updated summary_data structure to include both formats
+        summary_data = {
+            # NEW: Added results array with budget info in the same format as list/retrieve
+            'result': {
+                'id': str(budget.id),
+                'amount': str(budget.amount),  # Convert to string to match your expected format
+                'current_month_expenses': float(current_expenses),
+                'budget_utilization_percentage': int(round(utilization_percentage)),  # Convert to int to match your format
+                'last_alert_sent': budget.last_alert_sent,
+                'created_at': budget.created_at,
+                'updated_at': budget.updated_at
+            },
+            'utilization': {
+                'current_month_expenses': current_expenses,
+                'utilization_percentage': round(utilization_percentage, 2),
+                'category_breakdown': category_breakdown_per,
+                'average_daily_spending': average_daily_spending,
+                'projected_monthly_spending': projected_spending,
+                'days_remaining_in_month': days_remaining,
+                'period': DateRange.for_month(now).as_period(),
+            },
+            'transaction_stats': {
+                'monthly_transaction_count': transaction_count,
+                'average_transaction_amount': average_transaction,
+            },
+            'recommendations': recommendations
+        }
+        return summary_data
             
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
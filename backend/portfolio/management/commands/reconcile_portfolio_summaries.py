@@ -0,0 +1,88 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from portfolio.models import Portfolio, PortfolioSummary
+
+
+class Command(BaseCommand):
+    help = 'Recompute portfolio summaries from scratch and report drift from the incrementally maintained rows'
+
+    CHUNK_SIZE = 500
+    DECIMAL_FIELDS = ('total_invested', 'current_portfolio_value', 'day_change_value', 'largest_holding_value')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Overwrite drifted summaries with the recomputed values',
+        )
+        parser.add_argument(
+            '--user',
+            help='Only reconcile the user with this email',
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=Decimal,
+            default=Decimal('0.01'),
+            help='Maximum absolute difference ignored for money fields (default 0.01)',
+        )
+
+    def handle(self, *args, **options):
+        tolerance = options['tolerance']
+        user_ids = set(Portfolio.objects.filter(is_active=True).values_list('user_id', flat=True).distinct())
+        user_ids |= set(PortfolioSummary.objects.values_list('user_id', flat=True))
+        if options['user']:
+            user_ids = set(
+                PortfolioSummary.objects.filter(user__email=options['user']).values_list('user_id', flat=True)
+            ) | set(Portfolio.objects.filter(user__email=options['user']).values_list('user_id', flat=True).distinct())
+
+        user_ids = sorted(user_ids)
+        checked = drifted = fixed = 0
+
+        for start in range(0, len(user_ids), self.CHUNK_SIZE):
+            chunk = user_ids[start:start + self.CHUNK_SIZE]
+            summaries = PortfolioSummary.objects.in_bulk(chunk, field_name='user_id')
+            drifted_ids = []
+            for user_id, expected in PortfolioSummary.compute_for_users(chunk).items():
+                checked += 1
+                summary = summaries.get(user_id)
+                if summary is None:
+                    differences = ['summary row missing']
+                else:
+                    differences = self._differences(summary, expected, tolerance)
+                if not differences:
+                    continue
+
+                drifted += 1
+                drifted_ids.append(user_id)
+                self.stdout.write(self.style.WARNING(f'⚠ Drift for user {user_id}: {"; ".join(differences)}'))
+
+            if options['fix'] and drifted_ids:
+                fixed += PortfolioSummary.refresh_for_users(drifted_ids)
+
+        self.stdout.write('\n' + '='*50)
+        self.stdout.write(self.style.SUCCESS(f'Checked {checked} portfolio summaries'))
+        if drifted:
+            self.stdout.write(self.style.WARNING(f'{drifted} summaries drifted, {fixed} fixed'))
+        self.stdout.write('='*50)
+
+    def _differences(self, summary, expected, tolerance):
+        differences = []
+        for field in self.DECIMAL_FIELDS:
+            stored, computed = getattr(summary, field), expected[field]
+            if abs(stored - computed) > tolerance:
+                differences.append(f'{field} stored={stored} computed={computed:.2f}')
+
+        if summary.number_of_holdings != expected['number_of_holdings']:
+            differences.append(
+                f"number_of_holdings stored={summary.number_of_holdings} computed={expected['number_of_holdings']}"
+            )
+
+        sectors = set(summary.sector_values) | set(expected['sector_values'])
+        for sector in sorted(sectors):
+            stored = Decimal(summary.sector_values.get(sector, '0'))
+            computed = Decimal(expected['sector_values'].get(sector, '0'))
+            if abs(stored - computed) > tolerance:
+                differences.append(f'sector {sector} stored={stored:.2f} computed={computed:.2f}')
+        return differences
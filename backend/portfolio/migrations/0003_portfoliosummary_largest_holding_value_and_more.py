@@ -0,0 +1,40 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:06
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def backfill_summary_values(apps, schema_editor):
+    PortfolioSummary = apps.get_model('portfolio', 'PortfolioSummary')
+    Portfolio = apps.get_model('portfolio', 'Portfolio')
+    for summary in PortfolioSummary.objects.all().iterator():
+        sector_values, largest = {}, Decimal('0.00')
+        holdings = Portfolio.objects.filter(user_id=summary.user_id, is_active=True).select_related('stock')
+        for holding in holdings:
+            value = holding.shares_owned * holding.stock.current_price
+            sector_values[holding.stock.sector] = sector_values.get(holding.stock.sector, Decimal('0.00')) + value
+            largest = max(largest, value)
+        summary.sector_values = {sector: str(value) for sector, value in sector_values.items()}
+        summary.largest_holding_value = largest
+        summary.save(update_fields=['sector_values', 'largest_holding_value'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0002_remove_stock_currency_remove_stock_logo_url'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfoliosummary',
+            name='largest_holding_value',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='portfoliosummary',
+            name='sector_values',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.RunPython(backfill_summary_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0003_portfoliosummary_largest_holding_value_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(fields=['updated_at'], name='portfolio_w_updated_daeee6_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0004_wishlist_updated_at_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricealert',
+            name='email_attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='pricealert',
+            name='next_email_attempt_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
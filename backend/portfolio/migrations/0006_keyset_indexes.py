@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_pricealert_email_retry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['user', '-purchase_date', '-created_at', '-id'], name='portfolio_h_user_id_7b7560_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['-created_at', '-id'], name='portfolio_p_created_805094_idx'),
+        ),
+    ]
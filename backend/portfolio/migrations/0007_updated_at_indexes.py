@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0006_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='portfolio',
+            index=models.Index(fields=['user', 'updated_at'], name='portfolio_h_user_id_78ca72_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pricealert',
+            index=models.Index(fields=['wishlist_item', 'updated_at'], name='portfolio_p_wishlis_d3975f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wishlist',
+            index=models.Index(fields=['user', 'updated_at'], name='portfolio_w_user_id_077c43_idx'),
+        ),
+    ]
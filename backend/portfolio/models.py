@@ -1,11 +1,21 @@
 from django.db import models, transaction
+from django.db.models import Case, Count, ExpressionWrapper, F, Max, Sum, Value, When
+from django.utils import timezone
+from django.utils.functional import cached_property
 from decimal import Decimal
 import uuid
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth import get_user_model
+from backend.cache import bump_data_version
+from user.models import SyncTombstone
+from .utils.alert_index import get_loaded_alert_index
 
 User = get_user_model()
 
+def clear_cached_properties(instance):
+    for name in instance.CACHED_PROPERTIES:
+        instance.__dict__.pop(name, None)
+
 class SectorChoices(models.TextChoices):
     TECHNOLOGY = 'TECH', 'Technology'
     FINANCIALS = 'FIN', 'Financials'
@@ -67,6 +77,13 @@ class Stock(TimeStampedModel):
             return (self.day_change / self.previous_close) * 100
         return Decimal('0.00')
 
+    def pricing_snapshot(self):
+        return {
+            'current_price': self.current_price,
+            'previous_close': self.previous_close,
+            'sector': self.sector,
+        }
+
 class Portfolio(TimeStampedModel):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='portfolio_holdings', db_index=True)
     stock = models.ForeignKey(Stock, on_delete=models.CASCADE, related_name='portfolio_holders', db_index=True)
@@ -90,30 +107,95 @@ class Portfolio(TimeStampedModel):
             models.Index(fields=['stock', 'purchase_date']),
             models.Index(fields=['user', 'is_active']),
             models.Index(fields=['is_active', 'updated_at']),
+            models.Index(fields=['user', '-purchase_date', '-created_at', '-id']),
+            models.Index(fields=['user', 'updated_at']),
         ]
     
+    SUMMARY_TRACKED_FIELDS = ('is_active', 'shares_owned', 'total_invested', 'stock_id')
+    # Memoised per instance; cleared whenever the row is saved or reloaded.
+    CACHED_PROPERTIES = ('current_value', 'unrealized_gain_loss', 'unrealized_gain_loss_percentage', 'day_change_value')
+
     def __str__(self):
         return f"{self.user.username} - {self.stock.symbol}"
     
     def save(self, *args, **kwargs):
         self.total_invested = self.shares_owned * self.purchase_price
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            adding = self._state.adding
+            PortfolioSummary.lock_for_user(self.user_id)
+            previous = self._previous_summary_contribution()
+            super().save(*args, **kwargs)
+            PortfolioSummary.apply_holding_change(self.user_id, previous, self.summary_contribution())
+            # previous is None exactly when the holding is new or was inactive before this save.
+            if previous is not None and not self.is_active:
+                SyncTombstone.record(self.user_id, SyncTombstone.Entity.PORTFOLIO, [self.pk])
+            elif previous is None and not adding and self.is_active:
+                SyncTombstone.forget(SyncTombstone.Entity.PORTFOLIO, self.pk)
+        clear_cached_properties(self)
+        bump_data_version(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        bump_data_version(self.user_id)
+        with transaction.atomic():
+            PortfolioSummary.lock_for_user(self.user_id)
+            previous = self._previous_summary_contribution()
+            if previous is not None:
+                SyncTombstone.record(self.user_id, SyncTombstone.Entity.PORTFOLIO, [self.pk])
+            result = super().delete(*args, **kwargs)
+            PortfolioSummary.apply_holding_change(self.user_id, previous, None)
+        return result
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        clear_cached_properties(self)
+
+    def summary_contribution(self, stock=None):
+        """Amounts this holding adds to its owner's PortfolioSummary (None when inactive)."""
+        if not self.is_active:
+            return None
+        stock = stock or self.stock
+        return {
+            'invested': self.total_invested,
+            'value': self.shares_owned * stock.current_price,
+            'day_change': self.shares_owned * stock.day_change,
+            'sector': stock.sector,
+        }
+
+    def _previous_summary_contribution(self):
+        """
+        What the stored row currently contributes. Read from the database, not
+        from this instance, and only once the owner's summary is locked (see
+        PortfolioSummary.lock_for_user), so a stale instance or a concurrent
+        save of the same holding never subtracts the wrong amounts.
+        """
+        if self._state.adding:
+            return None
+        state = Portfolio.objects.filter(pk=self.pk).values(*self.SUMMARY_TRACKED_FIELDS).first()
+        if not state or not state['is_active']:
+            return None
+        stock = self.stock if state['stock_id'] == self.stock_id else Stock.objects.get(pk=state['stock_id'])
+        return {
+            'invested': state['total_invested'],
+            'value': state['shares_owned'] * stock.current_price,
+            'day_change': state['shares_owned'] * stock.day_change,
+            'sector': stock.sector,
+        }
     
-    @property
+    @cached_property
     def current_value(self):
         return self.shares_owned * self.stock.current_price
     
-    @property
+    @cached_property
     def unrealized_gain_loss(self):
         return self.current_value - self.total_invested
     
-    @property
+    @cached_property
     def unrealized_gain_loss_percentage(self):
         if self.total_invested > 0:
             return (self.unrealized_gain_loss / self.total_invested) * 100
         return Decimal('0.00')
     
-    @property
+    @cached_property
     def day_change_value(self):
         return self.shares_owned * self.stock.day_change
     
@@ -143,33 +225,70 @@ class Wishlist(TimeStampedModel):
             models.Index(fields=['user', 'priority']),
             models.Index(fields=['email_alerts_enabled', 'target_buy_price']),
             models.Index(fields=['user', 'is_active']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['user', 'updated_at']),
         ]
+
+    CACHED_PROPERTIES = (
+        'price_change_since_added', 'price_change_percentage_since_added',
+        'distance_to_target', 'distance_to_target_percentage',
+    )
     
     def __str__(self):
         return f"{self.user.username} watching {self.stock.symbol}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_active = instance.__dict__.get('is_active')
+        return instance
     
     def save(self, *args, **kwargs):
         if self.price_when_added is None:
             self.price_when_added = self.stock.current_price
-        super().save(*args, **kwargs)
+        was_active = None if self._state.adding else getattr(self, '_loaded_is_active', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if was_active and not self.is_active:
+                SyncTombstone.record(self.user_id, SyncTombstone.Entity.WISHLIST, [self.pk])
+            elif was_active is False and self.is_active:
+                SyncTombstone.forget(SyncTombstone.Entity.WISHLIST, self.pk)
+        self._loaded_is_active = self.is_active
+        clear_cached_properties(self)
+        bump_data_version(self.user_id)
+        # Keep this process's alert index (if it has one) in step; others catch up via sync_from_db.
+        index = get_loaded_alert_index()
+        if index is not None:
+            transaction.on_commit(lambda: index.apply(self))
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        clear_cached_properties(self)
+
+    def delete(self, *args, **kwargs):
+        bump_data_version(self.user_id)
+        with transaction.atomic():
+            if self.is_active:
+                SyncTombstone.record(self.user_id, SyncTombstone.Entity.WISHLIST, [self.pk])
+            return super().delete(*args, **kwargs)
     
-    @property
+    @cached_property
     def price_change_since_added(self):
         if self.price_when_added:
             return self.stock.current_price - self.price_when_added
         return Decimal('0.00')
     
-    @property
+    @cached_property
     def price_change_percentage_since_added(self):
         if self.price_when_added and self.price_when_added > 0:
             return (self.price_change_since_added / self.price_when_added) * 100
         return Decimal('0.00')
     
-    @property
+    @cached_property
     def distance_to_target(self):
         return self.target_buy_price - self.stock.current_price
     
-    @property
+    @cached_property
     def distance_to_target_percentage(self):
         if self.stock.current_price > 0:
             return (self.distance_to_target / self.stock.current_price) * 100
@@ -188,6 +307,8 @@ class PriceAlert(TimeStampedModel):
     status = models.CharField(max_length=10, choices=AlertStatus.choices, default=AlertStatus.TRIGGERED)
     email_sent = models.BooleanField(default=False)
     email_sent_at = models.DateTimeField(blank=True, null=True)
+    email_attempts = models.IntegerField(default=0)
+    next_email_attempt_at = models.DateTimeField(blank=True, null=True)
     
     class Meta:
         db_table = 'portfolio_price_alerts'
@@ -195,6 +316,8 @@ class PriceAlert(TimeStampedModel):
             models.Index(fields=['wishlist_item', 'created_at']),
             models.Index(fields=['status', 'email_sent']),
             models.Index(fields=['created_at', 'status']),
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['wishlist_item', 'updated_at']),
         ]
     
     def __str__(self):
@@ -211,8 +334,16 @@ class PortfolioSummary(TimeStampedModel):
     number_of_holdings = models.IntegerField(default=0)
     largest_holding_percentage = models.DecimalField(max_digits=5, decimal_places=2, default=Decimal('0.00'))
     sector_allocation = models.JSONField(default=dict)
+    sector_values = models.JSONField(default=dict)
+    largest_holding_value = models.DecimalField(max_digits=20, decimal_places=2, default=Decimal('0.00'))
     last_calculated = models.DateTimeField(auto_now=True)
     
+    STORED_FIELDS = (
+        'total_invested', 'current_portfolio_value', 'total_gain_loss', 'total_gain_loss_percentage',
+        'day_change_value', 'day_change_percentage', 'number_of_holdings', 'largest_holding_value',
+        'largest_holding_percentage', 'sector_values', 'sector_allocation',
+    )
+    
     class Meta:
         db_table = 'portfolio_summary'
         indexes = [
@@ -222,54 +353,170 @@ class PortfolioSummary(TimeStampedModel):
     def __str__(self):
         return f"{self.user.username} Portfolio Summary - ${self.current_portfolio_value}"
     
+    @classmethod
+    def compute_for_users(cls, user_ids):
+        """
+        Recompute every stored field for many users in one grouped query.
+        The database sums value, cost and day change per (user, sector) and
+        tracks the largest holding with a conditional aggregate; Python only
+        folds the handful of sector rows per user.
+        """
+        user_pk = Portfolio._meta.get_field('user').target_field
+        user_ids = [user_pk.to_python(getattr(user, 'pk', user)) for user in user_ids]
+        money = models.DecimalField(max_digits=30, decimal_places=8)
+        holding_value = ExpressionWrapper(F('shares_owned') * F('stock__current_price'), output_field=money)
+        holding_day_change = Case(
+            When(stock__previous_close__gt=0,
+                 then=F('shares_owned') * (F('stock__current_price') - F('stock__previous_close'))),
+            default=Value(Decimal('0.00')),
+            output_field=money,
+        )
+        rows = (Portfolio.objects.filter(user_id__in=user_ids, is_active=True)
+                .values('user_id', 'stock__sector')
+                .annotate(
+                    invested=Sum('total_invested'),
+                    value=Sum(holding_value),
+                    day_change=Sum(holding_day_change),
+                    holdings=Count('id'),
+                    largest=Max(holding_value),
+                )
+                .order_by())
+        
+        totals = {user_id: cls() for user_id in user_ids}
+        for row in rows:
+            summary = totals[row['user_id']]
+            summary.total_invested += row['invested'] or Decimal('0.00')
+            summary.current_portfolio_value += row['value'] or Decimal('0.00')
+            summary.day_change_value += row['day_change'] or Decimal('0.00')
+            summary.number_of_holdings += row['holdings']
+            summary.largest_holding_value = max(summary.largest_holding_value, row['largest'] or Decimal('0.00'))
+            summary.sector_values[row['stock__sector']] = str((row['value'] or Decimal('0.00')).quantize(Decimal('0.01')))
+        
+        computed = {}
+        for user_id, summary in totals.items():
+            summary.recalculate_derived_fields()
+            computed[user_id] = {field: getattr(summary, field) for field in cls.STORED_FIELDS}
+        return computed
+    
+    @classmethod
+    def compute_for_user(cls, user):
+        """Recompute every stored field from the user's active holdings."""
+        user_id = getattr(user, 'pk', user)
+        return cls.compute_for_users([user_id])[user_id]
+    
     @classmethod
     @transaction.atomic
     def refresh_for_user(cls, user):
-        holdings = Portfolio.objects.filter(user=user, is_active=True).select_related('stock')
+        user_id = getattr(user, 'pk', user)
+        # Lock before computing, so a holding change committing in between is not overwritten.
+        cls.objects.select_for_update().filter(user_id=user_id).first()
+        summary, created = cls.objects.update_or_create(user_id=user_id, defaults=cls.compute_for_user(user_id))
+        return summary
+    
+    @classmethod
+    @transaction.atomic
+    def refresh_for_users(cls, user_ids):
+        """Batch variant of refresh_for_user: one aggregate query plus one bulk write each way."""
+        user_ids = [getattr(user, 'pk', user) for user in user_ids]
+        # Lock (in a fixed order) before computing, as in refresh_for_user.
+        existing = {
+            summary.user_id: summary
+            for summary in cls.objects.select_for_update().filter(user_id__in=user_ids).order_by('user_id')
+        }
+        computed = cls.compute_for_users(user_ids)
+        now = timezone.now()
         
-        if not holdings.exists():
-            summary, created = cls.objects.get_or_create(user=user)
-            return summary
+        to_update, to_create = [], []
+        for user_id, values in computed.items():
+            summary = existing.get(user_id) or cls(user_id=user_id)
+            for field, value in values.items():
+                setattr(summary, field, value)
+            summary.last_calculated = now
+            summary.updated_at = now
+            (to_update if user_id in existing else to_create).append(summary)
         
-        total_invested = sum(h.total_invested for h in holdings)
-        current_value = sum(h.current_value for h in holdings)
-        day_change = sum(h.day_change_value for h in holdings)
+        if to_update:
+            cls.objects.bulk_update(to_update, [*cls.STORED_FIELDS, 'last_calculated', 'updated_at'])
+        if to_create:
+            cls.objects.bulk_create(to_create)
+        return len(computed)
+    
+    @classmethod
+    def lock_for_user(cls, user_id):
+        """
+        Lock the user's summary row for the rest of the transaction, building
+        it first if it does not exist yet. Every holding write takes this lock
+        before reading the holding's old state, so changes to one user's
+        holdings are applied to the summary one at a time.
+        """
+        summary = cls.objects.select_for_update().filter(user_id=user_id).first()
+        return summary if summary is not None else cls.refresh_for_user(user_id)
+    
+    @classmethod
+    def get_for_user(cls, user):
+        """Single-row read; the first read for a user builds the row from scratch."""
+        summary = cls.objects.filter(user=user).first()
+        return summary if summary is not None else cls.refresh_for_user(user)
+    
+    def recalculate_derived_fields(self):
+        current_value = self.current_portfolio_value
         
-        total_gain_loss = current_value - total_invested
-        total_gain_loss_percentage = (total_gain_loss / total_invested * 100) if total_invested > 0 else Decimal('0.0000')
+        self.total_gain_loss = current_value - self.total_invested
+        self.total_gain_loss_percentage = (self.total_gain_loss / self.total_invested * 100) if self.total_invested > 0 else Decimal('0.0000')
         
-        previous_value = current_value - day_change
-        day_change_percentage = (day_change / previous_value * 100) if previous_value > 0 else Decimal('0.0000')
+        previous_value = current_value - self.day_change_value
+        self.day_change_percentage = (self.day_change_value / previous_value * 100) if previous_value > 0 else Decimal('0.0000')
         
-        sector_allocation = {}
-        for holding in holdings:
-            sector = holding.stock.sector
-            sector_value = float(holding.current_value)
-            sector_allocation[sector] = sector_allocation.get(sector, 0) + sector_value
+        self.sector_allocation = {
+            sector: round(float(value) / float(current_value) * 100, 2) if current_value > 0 else 0
+            for sector, value in self.sector_values.items()
+        }
+        self.largest_holding_percentage = (self.largest_holding_value / current_value * 100) if current_value > 0 else Decimal('0.00')
+    
+    @classmethod
+    def _largest_holding_value(cls, user_id):
+        return Portfolio.objects.filter(user_id=user_id, is_active=True).aggregate(
+            largest=Max(F('shares_owned') * F('stock__current_price'), output_field=models.DecimalField())
+        )['largest'] or Decimal('0.00')
+    
+    def _apply_sector_deltas(self, deltas):
+        sector_values = {sector: Decimal(value) for sector, value in self.sector_values.items()}
+        for sector, delta in deltas.items():
+            sector_values[sector] = sector_values.get(sector, Decimal('0.00')) + delta
+        self.sector_values = {sector: str(value.quantize(Decimal('0.01'))) for sector, value in sector_values.items() if value > 0}
+    
+    @classmethod
+    @transaction.atomic
+    def apply_holding_change(cls, user_id, previous, current):
+        """
+        Apply the difference between a holding's old and new contribution
+        (see Portfolio.summary_contribution) instead of recomputing everything.
+        """
+        if previous is None and current is None:
+            return None
         
-        for sector in sector_allocation:
-            if current_value > 0:
-                sector_allocation[sector] = round((sector_allocation[sector] / float(current_value)) * 100, 2)
-            else:
-                sector_allocation[sector] = 0
+        summary = cls.objects.select_for_update().filter(user_id=user_id).first()
+        if summary is None:
+            return cls.refresh_for_user(user_id)
         
-        largest_holding = Decimal('0.00')
-        if current_value > 0 and holdings:
-            largest_holding = max(holding.current_value / current_value * 100 for holding in holdings)
+        sector_deltas = {}
+        for contribution, sign in ((previous, -1), (current, 1)):
+            if contribution is None:
+                continue
+            summary.total_invested += sign * contribution['invested']
+            summary.current_portfolio_value += sign * contribution['value']
+            summary.day_change_value += sign * contribution['day_change']
+            summary.number_of_holdings += sign
+            sector = contribution['sector']
+            sector_deltas[sector] = sector_deltas.get(sector, Decimal('0.00')) + sign * contribution['value']
+        summary._apply_sector_deltas(sector_deltas)
         
-        summary, created = cls.objects.update_or_create(
-            user=user,
-            defaults={
-                'total_invested': total_invested,
-                'current_portfolio_value': current_value,
-                'total_gain_loss': total_gain_loss,
-                'total_gain_loss_percentage': total_gain_loss_percentage,
-                'day_change_value': day_change,
-                'day_change_percentage': day_change_percentage,
-                'number_of_holdings': holdings.count(),
-                'largest_holding_percentage': largest_holding,
-                'sector_allocation': sector_allocation,
-            }
-        )
+        if current is not None and current['value'] >= summary.largest_holding_value:
+            summary.largest_holding_value = current['value']
+        elif previous is not None and previous['value'] >= summary.largest_holding_value:
+            # The largest holding shrank or left; only then is a lookup needed.
+            summary.largest_holding_value = cls._largest_holding_value(user_id)
         
+        summary.recalculate_derived_fields()
+        summary.save()
         return summary
@@ -0,0 +1,61 @@
+# portfolio/services/alert_service.py
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+from portfolio.models import Wishlist, PriceAlert, AlertType, AlertStatus
+
+def triggered_wishlist_items(stock_ids=None, wishlist_ids=None):
+    """
+    Set-based equivalent of Wishlist.should_trigger_alert() over every active,
+    alert-enabled item, minus items that already alerted inside the cooldown.
+    """
+    cooldown_start = timezone.now() - timedelta(hours=getattr(settings, "PRICE_ALERT_COOLDOWN_HOURS", 24))
+    recent_alerts = PriceAlert.objects.filter(wishlist_item=OuterRef("pk"), created_at__gte=cooldown_start)
+
+    queryset = Wishlist.objects.filter(
+        email_alerts_enabled=True,
+        is_active=True,
+        stock__is_active=True,
+        stock__current_price__gt=0,
+        target_buy_price__gte=F("stock__current_price"),
+    ).exclude(Exists(recent_alerts))
+
+    if stock_ids is not None:
+        queryset = queryset.filter(stock_id__in=stock_ids)
+    if wishlist_ids is not None:
+        queryset = queryset.filter(pk__in=wishlist_ids)
+    return queryset
+
+def evaluate_price_alerts(stock_ids=None, wishlist_ids=None) -> dict:
+    """
+    Create PriceAlert rows for every wishlist item whose target was reached.
+    Candidates are read in primary-key keyset pages of PRICE_ALERT_BATCH_SIZE
+    rows (only the three columns needed) and written with one bulk_create per
+    page, so memory stays bounded no matter how large the wishlist table is.
+    """
+    batch_size = getattr(settings, "PRICE_ALERT_BATCH_SIZE", 5000)
+    candidates = triggered_wishlist_items(stock_ids, wishlist_ids).order_by("pk")
+
+    created, last_pk = 0, None
+    while True:
+        page = candidates.filter(pk__gt=last_pk) if last_pk else candidates
+        rows = list(page.values_list("pk", "target_buy_price", "stock__current_price")[:batch_size])
+        if not rows:
+            break
+        last_pk = rows[-1][0]
+
+        alerts = [
+            PriceAlert(
+                wishlist_item_id=wishlist_id,
+                alert_type=AlertType.PRICE_BELOW,
+                target_price=target_price,
+                actual_price=current_price,
+                status=AlertStatus.TRIGGERED,
+            )
+            for wishlist_id, target_price, current_price in rows
+        ]
+        PriceAlert.objects.bulk_create(alerts, batch_size=1000)
+        created += len(alerts)
+
+    return {"created": created}
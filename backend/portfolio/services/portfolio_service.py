@@ -4,8 +4,10 @@ from datetime import datetime
 from django.db import transaction
 from django.db.models import F
 from rest_framework.exceptions import ValidationError
+from backend.cache import bump_stocks_version
 from portfolio.models import Stock, Portfolio, PortfolioSummary
 from portfolio.serializers import StockSerializer, PortfolioSerializer, PortfolioSummarySerializer
+from portfolio.tasks import propagate_price_changes
 from portfolio.utils.finnhub import fetch_stock_from_finnhub
 
 @transaction.atomic
@@ -15,7 +17,8 @@ def add_stock_to_portfolio_by_symbol(user, data: dict) -> dict:
     2) Groq for description/thesis
     3) Upsert Stock
     4) Upsert/merge Portfolio (if exists, DCA average)
-    5) Refresh summary
+    5) Read summary (kept current incrementally by the holding writes;
+       a moved price is recomputed for every holder, as after a bulk refresh)
     """
     symbol = (data.get("symbol") or "").strip().upper()
     if not symbol:
@@ -43,6 +46,8 @@ def add_stock_to_portfolio_by_symbol(user, data: dict) -> dict:
     # print("Groq payload:", groq_payload)
 
     # 3) Upsert Stock
+    existing_stock = Stock.objects.filter(symbol=symbol).first()
+    previous_pricing = existing_stock.pricing_snapshot() if existing_stock else None
     stock, _ = Stock.objects.update_or_create(
         symbol=symbol,
         defaults={
@@ -57,6 +62,12 @@ def add_stock_to_portfolio_by_symbol(user, data: dict) -> dict:
             "is_active": True,
         },
     )
+    if previous_pricing != stock.pricing_snapshot():
+        # New stock or moved price: sector/exchange counts and price-based views change for everyone.
+        bump_stocks_version()
+    price_moved = previous_pricing is not None and previous_pricing != stock.pricing_snapshot()
+    if price_moved:
+        transaction.on_commit(lambda: propagate_price_changes.delay([str(stock.id)]))
 
     # 4) Upsert/merge Portfolio
     holding = Portfolio.objects.filter(user=user, stock=stock, is_active=True).first()
@@ -88,7 +99,8 @@ def add_stock_to_portfolio_by_symbol(user, data: dict) -> dict:
         )
 
     
-    summary = PortfolioSummary.refresh_for_user(user)
+    # The fan-out runs after commit; recompute this user's row now so the response is current.
+    summary = PortfolioSummary.refresh_for_user(user) if price_moved else PortfolioSummary.get_for_user(user)
 
     return {
         "stock": StockSerializer(stock).data,
@@ -0,0 +1,218 @@
+import time
+from datetime import timedelta
+from celery import group, shared_task
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from backend.cache import bump_stocks_version
+from portfolio.models import Stock, Portfolio, PortfolioSummary, PriceAlert, AlertStatus
+from portfolio.services.alert_service import evaluate_price_alerts
+from portfolio.utils.alert_index import refresh_alert_index
+from user.emails import build_price_alert_message, deliver, retry_delay
+from portfolio.utils.finnhub import get_quotes
+
+@shared_task()
+def refresh_stock_prices():
+    """
+    Refresh current_price / previous_close for every active Stock.
+    Symbols are walked in keyset order, each batch is fetched concurrently
+    and written back with a single bulk_update; the stocks whose price moved
+    are then fanned out to propagate_price_changes, and the wishlist items
+    whose thresholds the moves crossed (per the in-memory alert index) to
+    evaluate_wishlist_alerts.
+    """
+    batch_size = getattr(settings, "STOCK_PRICE_REFRESH_BATCH_SIZE", 200)
+    started = time.monotonic()
+    last_symbol = ""
+    refreshed, changed_ids = 0, []
+    alert_index, touched_ids = refresh_alert_index()
+    crossed_ids = set(touched_ids or ())
+
+    while True:
+        batch = list(
+            Stock.objects.filter(is_active=True, symbol__gt=last_symbol)
+            .order_by("symbol")
+            .only("id", "symbol", "sector", "current_price", "previous_close")[:batch_size]
+        )
+        if not batch:
+            break
+        last_symbol = batch[-1].symbol
+
+        quotes = get_quotes([stock.symbol for stock in batch])
+        now = timezone.now()
+        to_update = []
+        for stock in batch:
+            quote = quotes.get(stock.symbol)
+            # Finnhub answers unknown/delisted symbols with c=0; keep the last known price.
+            if not quote or not quote["current_price"]:
+                continue
+            previous = stock.pricing_snapshot()
+            stock.current_price = quote["current_price"]
+            stock.previous_close = quote["previous_close"]
+            if previous != stock.pricing_snapshot():
+                changed_ids.append(str(stock.id))
+                crossed_ids.update(
+                    alert_index.crossed(stock.symbol, previous["current_price"], stock.current_price)
+                )
+            stock.price_last_updated = now
+            stock.updated_at = now
+            to_update.append(stock)
+
+        if to_update:
+            Stock.objects.bulk_update(
+                to_update, ["current_price", "previous_close", "price_last_updated", "updated_at"]
+            )
+            refreshed += len(to_update)
+
+    if changed_ids:
+        bump_stocks_version()
+        propagate_price_changes.delay(changed_ids)
+    if touched_ids is None and changed_ids:
+        # The index was just rebuilt, so there is no delta to trust: check the moved stocks in full.
+        evaluate_wishlist_alerts.delay(stock_ids=changed_ids)
+    elif crossed_ids:
+        evaluate_wishlist_alerts.delay(wishlist_ids=sorted(crossed_ids))
+
+    return {
+        "refreshed": refreshed,
+        "changed": len(changed_ids),
+        "elapsed_seconds": round(time.monotonic() - started, 2),
+    }
+
+@shared_task()
+def refresh_all_portfolio_summaries():
+    """
+    Nightly full recompute: walks users with holdings or a summary in pk
+    keyset chunks and refreshes each chunk with one aggregate query.
+    """
+    chunk_size = getattr(settings, "PORTFOLIO_SUMMARY_REFRESH_CHUNK_SIZE", 1000)
+    started = time.monotonic()
+    users = get_user_model().objects.filter(
+        Q(Exists(Portfolio.objects.filter(user=OuterRef("pk"), is_active=True)))
+        | Q(Exists(PortfolioSummary.objects.filter(user=OuterRef("pk"))))
+    ).order_by("pk")
+
+    refreshed, last_pk = 0, None
+    while True:
+        chunk = users.filter(pk__gt=last_pk) if last_pk else users
+        user_ids = list(chunk.values_list("pk", flat=True)[:chunk_size])
+        if not user_ids:
+            break
+        last_pk = user_ids[-1]
+        refreshed += PortfolioSummary.refresh_for_users(user_ids)
+
+    return {"refreshed": refreshed, "elapsed_seconds": round(time.monotonic() - started, 2)}
+
+@shared_task()
+def propagate_price_changes(stock_ids):
+    """
+    Collect the users holding any of the changed stocks (via the
+    portfolio_holders reverse relation and its stock index) and refresh
+    only their summaries, in batched chunks. A grouped recompute rather than
+    a per-stock price delta: a delta is only exact if applied in the same
+    transaction as the price write, with every holder's summary locked, and
+    on a market tick nearly every held stock moves, so it would read the
+    same holdings the recompute does.
+    """
+    chunk_size = getattr(settings, "PORTFOLIO_SUMMARY_FANOUT_CHUNK_SIZE", 500)
+    holder_ids = (
+        Stock.objects.filter(id__in=stock_ids, portfolio_holders__is_active=True)
+        .values_list("portfolio_holders__user_id", flat=True)
+        .distinct()
+    )
+
+    chunks, chunk = [], []
+    for user_id in holder_ids.iterator(chunk_size=chunk_size):
+        chunk.append(str(user_id))
+        if len(chunk) >= chunk_size:
+            chunks.append(chunk)
+            chunk = []
+    if chunk:
+        chunks.append(chunk)
+
+    if chunks:
+        group(refresh_portfolio_summaries.s(user_ids) for user_ids in chunks).apply_async()
+    return {"users": sum(len(c) for c in chunks), "chunks": len(chunks)}
+
+@shared_task()
+def refresh_portfolio_summaries(user_ids):
+    return PortfolioSummary.refresh_for_users(user_ids)
+
+@shared_task()
+def evaluate_wishlist_alerts(stock_ids=None, wishlist_ids=None):
+    result = evaluate_price_alerts(stock_ids=stock_ids, wishlist_ids=wishlist_ids)
+    if result["created"]:
+        dispatch_price_alert_emails.delay()
+    return result
+
+def _price_alert_message(alert, connection):
+    item = alert.wishlist_item
+    context = {
+        "symbol": item.stock.symbol,
+        "name": item.stock.name,
+        "target_price": f"{alert.target_price:.2f}",
+        "actual_price": f"{alert.actual_price:.2f}",
+    }
+    return build_price_alert_message(item.user.email, context, connection)
+
+def _claim_price_alert_emails(batch_size, max_attempts, lease):
+    """Lease due alerts in a short transaction (see user.tasks._claim_pending_emails)."""
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            PriceAlert.objects.select_for_update(skip_locked=True, of=("self",))
+            .filter(status=AlertStatus.TRIGGERED, email_sent=False, email_attempts__lt=max_attempts)
+            .filter(Q(next_email_attempt_at__isnull=True) | Q(next_email_attempt_at__lte=now))
+            .select_related("wishlist_item__stock", "wishlist_item__user")
+            .order_by("created_at")[:batch_size]
+        )
+        for alert in batch:
+            alert.email_attempts += 1
+            alert.next_email_attempt_at = now + lease
+        PriceAlert.objects.bulk_update(batch, ["email_attempts", "next_email_attempt_at"])
+    return batch
+
+@shared_task()
+def dispatch_price_alert_emails():
+    """
+    Mail triggered alerts that have not been emailed yet, batch by batch over
+    a single SMTP connection. Alerts are leased in one short transaction and
+    mailed with none open; sent alerts are flagged with one UPDATE per batch
+    and failed ones are pushed back with exponential backoff until
+    EMAIL_MAX_ATTEMPTS.
+    """
+    batch_size = getattr(settings, "EMAIL_DISPATCH_BATCH_SIZE", 200)
+    max_attempts = getattr(settings, "EMAIL_MAX_ATTEMPTS", 5)
+    lease = timedelta(seconds=getattr(settings, "EMAIL_CLAIM_LEASE_SECONDS", 600))
+    totals = {"sent": 0, "failed": 0, "elapsed_seconds": 0.0}
+
+    while True:
+        batch = _claim_price_alert_emails(batch_size, max_attempts, lease)
+        if not batch:
+            break
+
+        sent, failed, stats = deliver(batch, _price_alert_message)
+        now = timezone.now()
+        if sent:
+            PriceAlert.objects.filter(pk__in=[alert.pk for alert in sent]).update(
+                email_sent=True, email_sent_at=now, updated_at=now
+            )
+        for alert, _error in failed:
+            alert.next_email_attempt_at = now + retry_delay(alert.email_attempts)
+        if failed:
+            PriceAlert.objects.bulk_update(
+                [alert for alert, _error in failed], ["next_email_attempt_at"]
+            )
+
+        totals["sent"] += stats["sent"]
+        totals["failed"] += stats["failed"]
+        totals["elapsed_seconds"] += stats["elapsed_seconds"]
+        if len(batch) < batch_size:
+            break
+
+    elapsed = totals["elapsed_seconds"]
+    totals["elapsed_seconds"] = round(elapsed, 2)
+    totals["mails_per_second"] = round(totals["sent"] / elapsed, 2) if elapsed > 0 else 0.0
+    return totals
@@ -1,3 +1,380 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from backend.celery import app as celery_app
+from user.models import UserCustom
+from .models import Portfolio, PortfolioSummary, PriceAlert, SectorChoices, Stock, Wishlist
+from .services.alert_service import evaluate_price_alerts
+from .tasks import propagate_price_changes, refresh_stock_prices
+from .utils import finnhub
+from .utils.alert_index import PRICE_ABOVE, AlertIndex
 
-# Create your tests here.
+
+class PortfolioSummaryTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='holder', email='holder@example.com')
+        self.stock = Stock.objects.create(
+            symbol='ACME', name='Acme', exchange='NYSE', sector=SectorChoices.TECHNOLOGY,
+            current_price=Decimal('10.0000'), previous_close=Decimal('9.0000'),
+        )
+        self.other = Stock.objects.create(
+            symbol='BOLT', name='Bolt', exchange='NYSE', sector=SectorChoices.ENERGY,
+            current_price=Decimal('4.0000'), previous_close=Decimal('4.0000'),
+        )
+
+    def hold(self, stock, shares):
+        return Portfolio.objects.create(
+            user=self.user, stock=stock, shares_owned=Decimal(shares),
+            purchase_price=Decimal('8.0000'), purchase_date=date(2026, 1, 2),
+        )
+
+    def assertSummaryMatchesHoldings(self):
+        stored = PortfolioSummary.objects.get(user=self.user)
+        expected = PortfolioSummary.compute_for_user(self.user)
+        for field in ('total_invested', 'current_portfolio_value', 'day_change_value', 'number_of_holdings', 'largest_holding_value'):
+            self.assertEqual(Decimal(getattr(stored, field)), Decimal(expected[field]).quantize(Decimal('0.01')), field)
+        self.assertEqual(stored.sector_values, expected['sector_values'])
+        return stored
+
+    def test_create_and_update(self):
+        holding = self.hold(self.stock, '5')
+        self.hold(self.other, '2')
+        self.assertEqual(self.assertSummaryMatchesHoldings().current_portfolio_value, Decimal('58.00'))
+
+        holding.shares_owned = Decimal('7')
+        holding.save()
+        self.assertEqual(self.assertSummaryMatchesHoldings().current_portfolio_value, Decimal('78.00'))
+
+    def test_deactivate_and_reactivate(self):
+        holding = self.hold(self.stock, '5')
+        holding.is_active = False
+        holding.save()
+        self.assertEqual(self.assertSummaryMatchesHoldings().number_of_holdings, 0)
+
+        holding.is_active = True
+        holding.save()
+        self.assertEqual(self.assertSummaryMatchesHoldings().number_of_holdings, 1)
+
+    def test_delete(self):
+        self.hold(self.stock, '5').delete()
+        summary = self.assertSummaryMatchesHoldings()
+        self.assertEqual((summary.current_portfolio_value, summary.number_of_holdings), (Decimal('0.00'), 0))
+
+    def test_delete_inactive_holding_leaves_summary(self):
+        holding = self.hold(self.stock, '5')
+        self.hold(self.other, '2')
+        holding.is_active = False
+        holding.save()
+        holding.delete()
+        self.assertEqual(self.assertSummaryMatchesHoldings().number_of_holdings, 1)
+
+    def test_stale_instance_subtracts_stored_state(self):
+        holding = self.hold(self.stock, '5')
+        stale = Portfolio.objects.get(pk=holding.pk)
+        holding.shares_owned = Decimal('7')
+        holding.save()
+
+        stale.shares_owned = Decimal('3')
+        stale.save()
+        self.assertEqual(self.assertSummaryMatchesHoldings().current_portfolio_value, Decimal('30.00'))
+
+    def test_stale_instance_delete(self):
+        holding = self.hold(self.stock, '5')
+        stale = Portfolio.objects.get(pk=holding.pk)
+        holding.is_active = False
+        holding.save()
+        stale.delete()
+        self.assertEqual(self.assertSummaryMatchesHoldings().number_of_holdings, 0)
+
+
+class DerivedValueMemoTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='memo', email='memo@example.com')
+        self.stock = Stock.objects.create(symbol='MEMO', name='Memo', exchange='NYSE', current_price=Decimal('10.0000'), previous_close=Decimal('8.0000'))
+
+    def test_holding_values_are_computed_once_and_dropped_on_save(self):
+        holding = Portfolio.objects.create(user=self.user, stock=self.stock, shares_owned=Decimal('4'),
+                                           purchase_price=Decimal('5.0000'), purchase_date=date(2026, 1, 2))
+        holding = Portfolio.objects.select_related('stock').get(pk=holding.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(holding.unrealized_gain_loss_percentage, Decimal('100'))
+            self.assertEqual((holding.current_value, holding.day_change_value), (Decimal('40'), Decimal('8')))
+
+        holding.shares_owned = Decimal('6')
+        holding.save()
+        self.assertEqual(holding.current_value, Decimal('60'))
+
+    def test_wishlist_values_follow_a_reload(self):
+        item = Wishlist.objects.create(user=self.user, stock=self.stock, target_buy_price=Decimal('8.0000'))
+        self.assertEqual(item.distance_to_target, Decimal('-2'))
+        Stock.objects.filter(pk=self.stock.pk).update(current_price=Decimal('9.0000'))
+        item.refresh_from_db()
+        self.assertEqual(item.distance_to_target, Decimal('-1'))
+
+
+class SummaryAggregateTests(TestCase):
+    def setUp(self):
+        self.tech = Stock.objects.create(symbol='TCH', name='Tech', exchange='NYSE', sector=SectorChoices.TECHNOLOGY,
+                                         current_price=Decimal('20.0000'), previous_close=Decimal('18.0000'))
+        self.energy = Stock.objects.create(symbol='NRG', name='Energy', exchange='NYSE', sector=SectorChoices.ENERGY,
+                                           current_price=Decimal('5.0000'), previous_close=Decimal('0.0000'))
+        self.alice = UserCustom.objects.create_user(username='alice', email='alice@example.com')
+        self.bob = UserCustom.objects.create_user(username='bob', email='bob@example.com')
+        self.empty = UserCustom.objects.create_user(username='empty', email='empty@example.com')
+        for user, stock, shares in ((self.alice, self.tech, '2'), (self.alice, self.energy, '10'), (self.bob, self.tech, '1')):
+            Portfolio.objects.create(user=user, stock=stock, shares_owned=Decimal(shares),
+                                     purchase_price=Decimal('4.0000'), purchase_date=date(2026, 1, 2))
+
+    def test_one_grouped_query_for_many_users(self):
+        with self.assertNumQueries(1):
+            computed = PortfolioSummary.compute_for_users([self.alice.pk, self.bob, self.empty.pk])
+
+        alice = computed[self.alice.pk]
+        self.assertEqual((alice['current_portfolio_value'], alice['total_invested'], alice['number_of_holdings']),
+                         (Decimal('90.0000'), Decimal('48.00'), 2))
+        # previous_close 0 means no day change for that stock.
+        self.assertEqual(alice['day_change_value'], Decimal('4.0000'))
+        self.assertEqual(alice['largest_holding_value'], Decimal('50.0000'))
+        self.assertEqual(alice['sector_values'], {'TECH': '40.00', 'EN': '50.00'})
+        self.assertEqual(computed[self.bob.pk]['current_portfolio_value'], Decimal('20.0000'))
+        self.assertEqual(computed[self.empty.pk]['number_of_holdings'], 0)
+
+    def test_refresh_for_users_creates_and_updates(self):
+        PortfolioSummary.objects.filter(user=self.bob).delete()
+        PortfolioSummary.objects.filter(user=self.alice).update(current_portfolio_value=Decimal('1.00'))
+        self.assertEqual(PortfolioSummary.refresh_for_users([self.alice.pk, self.bob.pk]), 2)
+        self.assertEqual(PortfolioSummary.objects.get(user=self.alice).current_portfolio_value, Decimal('90.00'))
+        self.assertEqual(PortfolioSummary.objects.get(user=self.bob).current_portfolio_value, Decimal('20.00'))
+
+
+class PriceFanOutTests(TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, celery_app.conf, 'task_always_eager', celery_app.conf.task_always_eager)
+        celery_app.conf.task_always_eager = True
+        self.moving = Stock.objects.create(symbol='MOVE', name='Move', exchange='NYSE', current_price=Decimal('10.0000'), previous_close=Decimal('10.0000'))
+        self.still = Stock.objects.create(symbol='STAY', name='Stay', exchange='NYSE', current_price=Decimal('5.0000'), previous_close=Decimal('5.0000'))
+        self.holder = self.user_holding('holder', self.moving)
+        self.bystander = self.user_holding('bystander', self.still)
+        self.former = self.user_holding('former', self.moving, is_active=False)
+
+    def user_holding(self, name, stock, is_active=True):
+        user = UserCustom.objects.create_user(username=name, email=f'{name}@example.com')
+        Portfolio.objects.create(
+            user=user, stock=stock, shares_owned=Decimal('3'), purchase_price=Decimal('1.0000'),
+            purchase_date=date(2026, 1, 2), is_active=is_active,
+        )
+        return user
+
+    def quote(self, price, previous_close):
+        return {'current_price': Decimal(price), 'previous_close': Decimal(previous_close)}
+
+    def test_fan_out_targets_active_holders_of_moved_stocks(self):
+        result = propagate_price_changes([str(self.moving.pk)])
+        self.assertEqual((result['users'], result['chunks']), (1, 1))
+
+    def test_fan_out_chunks(self):
+        for index in range(4):
+            self.user_holding(f'extra{index}', self.moving)
+        with self.settings(PORTFOLIO_SUMMARY_FANOUT_CHUNK_SIZE=2):
+            result = propagate_price_changes([str(self.moving.pk)])
+        self.assertEqual((result['users'], result['chunks']), (5, 3))
+
+    def test_price_refresh_updates_only_affected_summaries(self):
+        bystander_calculated = PortfolioSummary.objects.get(user=self.bystander).last_calculated
+        quotes = {'MOVE': self.quote('12.0000', '10.0000'), 'STAY': self.quote('5.0000', '5.0000')}
+        with mock.patch('portfolio.tasks.get_quotes', return_value=quotes):
+            result = refresh_stock_prices()
+
+        self.assertEqual(result['changed'], 1)
+        summary = PortfolioSummary.objects.get(user=self.holder)
+        self.assertEqual((summary.current_portfolio_value, summary.day_change_value), (Decimal('36.00'), Decimal('6.00')))
+        self.assertEqual(PortfolioSummary.objects.get(user=self.bystander).last_calculated, bystander_calculated)
+        self.assertEqual(PortfolioSummary.objects.get(user=self.former).current_portfolio_value, Decimal('0.00'))
+
+
+class StockPriceRefreshTests(TestCase):
+    def setUp(self):
+        for symbol in ('AAA', 'BBB', 'CCC'):
+            Stock.objects.create(symbol=symbol, name=symbol, exchange='NYSE', current_price=Decimal('10.0000'), previous_close=Decimal('9.0000'))
+
+    def test_batches_in_symbol_order_and_keeps_price_on_empty_quote(self):
+        quotes = {
+            'AAA': {'current_price': Decimal('11.0000'), 'previous_close': Decimal('9.0000')},
+            'BBB': {'current_price': Decimal('0'), 'previous_close': Decimal('0')},
+            'CCC': {'current_price': Decimal('10.0000'), 'previous_close': Decimal('9.0000')},
+        }
+        fetched = []
+
+        def get_quotes(symbols):
+            fetched.append(symbols)
+            return {symbol: quotes[symbol] for symbol in symbols}
+
+        with self.settings(STOCK_PRICE_REFRESH_BATCH_SIZE=2), mock.patch('portfolio.tasks.get_quotes', side_effect=get_quotes), \
+                mock.patch('portfolio.tasks.propagate_price_changes') as propagate, mock.patch('portfolio.tasks.evaluate_wishlist_alerts'):
+            result = refresh_stock_prices()
+
+        self.assertEqual(fetched, [['AAA', 'BBB'], ['CCC']])
+        self.assertEqual((result['refreshed'], result['changed']), (2, 1))
+        self.assertEqual(Stock.objects.get(symbol='BBB').current_price, Decimal('10.0000'))
+        self.assertEqual(Stock.objects.get(symbol='AAA').current_price, Decimal('11.0000'))
+        propagate.delay.assert_called_once_with([str(Stock.objects.get(symbol='AAA').pk)])
+
+    def test_get_quotes_leaves_out_failed_symbols(self):
+        def get_quote(symbol):
+            if symbol == 'BAD':
+                raise finnhub.FinnhubError('unknown symbol')
+            return {'c': 12.5, 'pc': 12}
+
+        with mock.patch.object(finnhub, 'get_quote', side_effect=get_quote), mock.patch.object(finnhub, '_store'):
+            quotes = finnhub.get_quotes([' good ', 'BAD'])
+        self.assertEqual(quotes, {'GOOD': {'current_price': Decimal('12.5'), 'previous_close': Decimal('12')}})
+
+
+@override_settings(
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'finnhub-tests'}},
+    FINNHUB_QUOTE_CACHE_TTL=30, FINNHUB_QUOTE_STALE_TTL=300,
+)
+class FinnhubCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        finnhub._local_cache.clear()
+        self.now = 1_000_000.0
+        for patcher in (
+            mock.patch.object(finnhub.time, 'time', side_effect=lambda: self.now),
+            mock.patch.object(finnhub, 'get_quote', side_effect=lambda symbol: {'c': self.now}),
+            mock.patch.object(finnhub, '_schedule_refresh'),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def quote(self):
+        return finnhub.get_cached_quote('acme')['c']
+
+    def test_fresh_entry_is_served_from_the_local_tier(self):
+        self.assertEqual(self.quote(), 1_000_000.0)
+        self.now += 10
+        self.assertEqual(self.quote(), 1_000_000.0)
+        self.assertEqual(finnhub.get_quote.call_count, 1)
+
+    def test_stale_entry_is_served_while_one_refresh_is_scheduled(self):
+        self.quote()
+        self.now += 60
+        self.assertEqual(self.quote(), 1_000_000.0)
+        finnhub._schedule_refresh.assert_called_once_with('quote', 'ACME', finnhub.get_quote)
+        self.assertEqual(finnhub.get_quote.call_count, 1)
+
+    def test_expired_local_entry_prefers_a_newer_shared_copy(self):
+        self.quote()
+        self.now += 60
+        # Another worker refreshed the shared tier in the meantime.
+        cache.set(finnhub._cache_key('quote', 'ACME'), {'value': {'c': 'shared'}, 'fetched_at': self.now - 5})
+        self.assertEqual(self.quote(), 'shared')
+        finnhub._schedule_refresh.assert_not_called()
+
+    def test_entry_past_the_stale_window_is_fetched_inline(self):
+        self.quote()
+        self.now += 400
+        self.assertEqual(self.quote(), 1_000_400.0)
+        self.assertEqual(finnhub.get_quote.call_count, 2)
+
+
+class PriceAlertEvaluationTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='watcher', email='watcher@example.com')
+        self.cheap = Stock.objects.create(symbol='LOW', name='Low', exchange='NYSE', current_price=Decimal('9.0000'), previous_close=Decimal('9.0000'))
+        self.dear = Stock.objects.create(symbol='HIGH', name='High', exchange='NYSE', current_price=Decimal('50.0000'), previous_close=Decimal('50.0000'))
+
+    def watch(self, stock, target, **fields):
+        user = fields.pop('user', self.user)
+        return Wishlist.objects.create(user=user, stock=stock, target_buy_price=Decimal(target), **fields)
+
+    def test_alerts_items_at_or_below_target(self):
+        reached = self.watch(self.cheap, '10.0000')
+        self.watch(self.dear, '40.0000')
+        other = UserCustom.objects.create_user(username='other', email='other@example.com')
+        exact = self.watch(self.cheap, '9.0000', user=other)
+        self.watch(self.dear, '60.0000', user=other, email_alerts_enabled=False)
+
+        self.assertEqual(evaluate_price_alerts(), {'created': 2})
+        alerts = {alert.wishlist_item_id: alert for alert in PriceAlert.objects.all()}
+        self.assertEqual(set(alerts), {reached.pk, exact.pk})
+        self.assertEqual((alerts[reached.pk].target_price, alerts[reached.pk].actual_price), (Decimal('10.0000'), Decimal('9.0000')))
+
+    def test_cooldown_suppresses_repeat_alerts(self):
+        item = self.watch(self.cheap, '10.0000')
+        self.assertEqual(evaluate_price_alerts(), {'created': 1})
+        self.assertEqual(evaluate_price_alerts(), {'created': 0})
+
+        PriceAlert.objects.filter(wishlist_item=item).update(created_at=timezone.now() - timedelta(hours=25))
+        self.assertEqual(evaluate_price_alerts(), {'created': 1})
+
+    def test_pages_and_filters(self):
+        for index in range(5):
+            user = UserCustom.objects.create_user(username=f'page{index}', email=f'page{index}@example.com')
+            self.watch(self.cheap, '10.0000', user=user)
+        dear = self.watch(self.dear, '60.0000')
+
+        self.assertEqual(evaluate_price_alerts(stock_ids=[self.dear.pk]), {'created': 1})
+        self.assertEqual(evaluate_price_alerts(wishlist_ids=[dear.pk]), {'created': 0})
+        with self.settings(PRICE_ALERT_BATCH_SIZE=2):
+            self.assertEqual(evaluate_price_alerts(), {'created': 5})
+
+
+class AlertIndexTests(TestCase):
+    def setUp(self):
+        self.stock = Stock.objects.create(symbol='IDX', name='Index', exchange='NYSE', current_price=Decimal('20.0000'), previous_close=Decimal('20.0000'))
+
+    def watch(self, target, **fields):
+        user = UserCustom.objects.create_user(username=f'idx{target}', email=f'idx{target}@example.com')
+        return Wishlist.objects.create(user=user, stock=self.stock, target_buy_price=Decimal(target), **fields)
+
+    def test_crossed_returns_thresholds_inside_the_move(self):
+        index = AlertIndex()
+        for item_id, threshold in (('a', 10), ('b', 15), ('c', 15), ('d', 18), ('e', 20)):
+            index.upsert(item_id, 'IDX', Decimal(threshold))
+        index.upsert('up', 'IDX', Decimal('25'), PRICE_ABOVE)
+
+        self.assertEqual(index.crossed('IDX', Decimal('20'), Decimal('15')), ['b', 'c', 'd'])
+        # The lower bound is inclusive, the starting price is not.
+        self.assertEqual(index.crossed('IDX', Decimal('15'), Decimal('10')), ['a'])
+        self.assertEqual(index.crossed('IDX', Decimal('20'), Decimal('30')), ['up'])
+        self.assertEqual(index.crossed('IDX', Decimal('20'), Decimal('20')), [])
+        self.assertEqual(index.crossed('IDX', None, Decimal('1')), [])
+        self.assertEqual(index.crossed('NONE', Decimal('20'), Decimal('1')), [])
+
+    def test_upsert_moves_and_discard_removes(self):
+        index = AlertIndex()
+        index.upsert('a', 'IDX', Decimal('10'))
+        index.upsert('a', 'IDX', Decimal('18'))
+        self.assertEqual(index.crossed('IDX', Decimal('20'), Decimal('12')), ['a'])
+        index.discard('a')
+        self.assertEqual((len(index), index.crossed('IDX', Decimal('20'), Decimal('1'))), (0, []))
+
+    def test_rebuild_and_sync_follow_the_table(self):
+        kept = self.watch('15.0000')
+        self.watch('12.0000', email_alerts_enabled=False)
+        index = AlertIndex()
+        self.assertEqual(index.rebuild(), 1)
+        self.assertEqual(index.crossed('IDX', Decimal('20'), Decimal('10')), [str(kept.pk)])
+
+        added = self.watch('11.0000')
+        kept.is_active = False
+        kept.save()
+        self.assertEqual(index.sync_from_db(), [str(added.pk)])
+        self.assertEqual(index.crossed('IDX', Decimal('20'), Decimal('10')), [str(added.pk)])
+
+    def test_price_refresh_evaluates_only_crossed_items(self):
+        crossed = self.watch('15.0000')
+        self.watch('5.0000')
+        index = AlertIndex()
+        index.rebuild()
+        quotes = {'IDX': {'current_price': Decimal('14.0000'), 'previous_close': Decimal('20.0000')}}
+        with mock.patch('portfolio.tasks.refresh_alert_index', return_value=(index, [])), \
+                mock.patch('portfolio.tasks.get_quotes', return_value=quotes), \
+                mock.patch('portfolio.tasks.propagate_price_changes'), \
+                mock.patch('portfolio.tasks.evaluate_wishlist_alerts') as evaluate:
+            refresh_stock_prices()
+        evaluate.delay.assert_called_once_with(wishlist_ids=[str(crossed.pk)])
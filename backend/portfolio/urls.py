@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import StockViewSet, PortfolioViewSet, WishlistViewSet
+from .views import StockViewSet, PortfolioViewSet, WishlistViewSet, PriceAlertViewSet
 
 app_name = 'portfolio'
 
@@ -8,6 +8,7 @@ router = DefaultRouter()
 router.register(r'stocks', StockViewSet, basename='stocks')
 router.register(r'portfolio', PortfolioViewSet, basename='portfolio')
 router.register(r'wishlist', WishlistViewSet, basename="wishlist")
+router.register(r'price-alerts', PriceAlertViewSet, basename='price-alerts')
 
 urlpatterns = [
     path('', include(router.urls)),
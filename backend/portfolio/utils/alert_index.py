@@ -0,0 +1,185 @@
+# portfolio/utils/alert_index.py
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+PRICE_ABOVE = "PRICE_ABOVE"
+PRICE_BELOW = "PRICE_BELOW"
+
+class _Thresholds:
+    """Thresholds for one symbol and direction, kept sorted ascending."""
+
+    __slots__ = ("prices", "ids")
+
+    def __init__(self):
+        self.prices = []
+        self.ids = []
+
+    def insert(self, price, item_id):
+        pos = bisect_right(self.prices, price)
+        self.prices.insert(pos, price)
+        self.ids.insert(pos, item_id)
+
+    def remove(self, price, item_id):
+        pos = bisect_left(self.prices, price)
+        while pos < len(self.prices) and self.prices[pos] == price:
+            if self.ids[pos] == item_id:
+                del self.prices[pos]
+                del self.ids[pos]
+                return
+            pos += 1
+
+    def between(self, low, high, include_low, include_high):
+        start = bisect_left(self.prices, low) if include_low else bisect_right(self.prices, low)
+        end = bisect_right(self.prices, high) if include_high else bisect_left(self.prices, high)
+        return self.ids[start:end]
+
+class AlertIndex:
+    """
+    Per-symbol sorted alert thresholds.
+
+    A price move from last to new triggers PRICE_BELOW thresholds t with
+    new <= t < last and PRICE_ABOVE thresholds t with last < t <= new; both
+    ranges are found with two binary searches, so the cost of a tick depends
+    on the number of alerts crossed rather than on the size of the wishlist.
+    """
+
+    def __init__(self):
+        self._tables = {PRICE_BELOW: {}, PRICE_ABOVE: {}}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.watermark = None
+        self.built_at = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def upsert(self, item_id, symbol, threshold, alert_type=PRICE_BELOW):
+        item_id = str(item_id)
+        with self._lock:
+            self._remove(item_id)
+            self._tables[alert_type].setdefault(symbol, _Thresholds()).insert(threshold, item_id)
+            self._entries[item_id] = (alert_type, symbol, threshold)
+
+    def discard(self, item_id):
+        with self._lock:
+            self._remove(str(item_id))
+
+    def _remove(self, item_id):
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        alert_type, symbol, threshold = entry
+        thresholds = self._tables[alert_type].get(symbol)
+        if thresholds is not None:
+            thresholds.remove(threshold, item_id)
+            if not thresholds.prices:
+                del self._tables[alert_type][symbol]
+
+    def crossed(self, symbol, last_price, new_price):
+        """Return the ids of the alerts crossed by a move from last_price to new_price."""
+        if last_price is None or last_price == new_price:
+            return []
+        with self._lock:
+            if new_price < last_price:
+                thresholds = self._tables[PRICE_BELOW].get(symbol)
+                return thresholds.between(new_price, last_price, True, False) if thresholds else []
+            thresholds = self._tables[PRICE_ABOVE].get(symbol)
+            return thresholds.between(last_price, new_price, False, True) if thresholds else []
+
+    def apply(self, item):
+        """Mirror the current state of a saved Wishlist row."""
+        if item.is_active and item.email_alerts_enabled:
+            self.upsert(item.pk, item.stock.symbol, item.target_buy_price, PRICE_BELOW)
+        else:
+            self.discard(item.pk)
+
+    def rebuild(self):
+        from portfolio.models import Wishlist
+
+        started = timezone.now()
+        rows = Wishlist.objects.filter(
+            is_active=True, email_alerts_enabled=True, stock__is_active=True
+        ).values_list("pk", "stock__symbol", "target_buy_price")
+
+        tables, entries = {}, {}
+        for item_id, symbol, threshold in rows.iterator(chunk_size=5000):
+            item_id = str(item_id)
+            tables.setdefault(symbol, []).append((threshold, item_id))
+            entries[item_id] = (PRICE_BELOW, symbol, threshold)
+
+        below = {}
+        for symbol, pairs in tables.items():
+            pairs.sort()
+            thresholds = _Thresholds()
+            thresholds.prices = [price for price, _ in pairs]
+            thresholds.ids = [item_id for _, item_id in pairs]
+            below[symbol] = thresholds
+
+        with self._lock:
+            self._tables = {PRICE_BELOW: below, PRICE_ABOVE: {}}
+            self._entries = entries
+            self.watermark = started
+            self.built_at = time.monotonic()
+        return len(entries)
+
+    def sync_from_db(self):
+        """
+        Apply wishlist rows changed since the last sync (created, toggled or
+        deactivated rows all bump updated_at). Returns the ids that are now
+        indexed so callers can check them against the current price once.
+        """
+        from portfolio.models import Wishlist
+
+        if self.watermark is None:
+            self.rebuild()
+            return []
+
+        started = timezone.now()
+        # Overlap the window slightly so rows committed with an older timestamp are not missed.
+        since = self.watermark - timedelta(seconds=getattr(settings, "ALERT_INDEX_SYNC_OVERLAP", 5))
+        rows = Wishlist.objects.filter(updated_at__gte=since).values_list(
+            "pk", "stock__symbol", "target_buy_price", "is_active", "email_alerts_enabled", "stock__is_active"
+        )
+
+        touched = []
+        for item_id, symbol, threshold, is_active, alerts_enabled, stock_active in rows.iterator(chunk_size=2000):
+            if is_active and alerts_enabled and stock_active:
+                self.upsert(item_id, symbol, threshold, PRICE_BELOW)
+                touched.append(str(item_id))
+            else:
+                self.discard(item_id)
+        self.watermark = started
+        return touched
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_alert_index() -> AlertIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = AlertIndex()
+    return _index
+
+def get_loaded_alert_index():
+    """The process index if it was already built, else None (web workers never build it)."""
+    if _index is not None and _index.watermark is not None:
+        return _index
+    return None
+
+def refresh_alert_index():
+    """
+    Sync the process index with the database, rebuilding from scratch every
+    ALERT_INDEX_REBUILD_SECONDS to drop rows removed by cascading deletes.
+    """
+    index = get_alert_index()
+    max_age = getattr(settings, "ALERT_INDEX_REBUILD_SECONDS", 60 * 60)
+    if index.built_at is None or time.monotonic() - index.built_at > max_age:
+        index.rebuild()
+        return index, None
+    return index, index.sync_from_db()
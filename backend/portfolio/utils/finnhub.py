@@ -1,7 +1,13 @@
 # portfolio/utils/finnhub.py
-import requests
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
+import requests
+from requests.adapters import HTTPAdapter
 from django.conf import settings
+from django.core.cache import cache
+from backend.cache import LocalLRUCache
 from .sector_map import map_sector
 
 BASE = "https://finnhub.io/api/v1"
@@ -9,12 +15,60 @@ BASE = "https://finnhub.io/api/v1"
 class FinnhubError(Exception):
     pass
 
+class RateLimiter:
+    """
+    Thread-safe pacing limiter: hands out one slot every 1/rate seconds so the
+    whole process stays under the Finnhub requests-per-second budget.
+    """
+
+    def __init__(self, rate_per_second: float):
+        self.interval = 1.0 / rate_per_second if rate_per_second > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+_session = None
+_session_lock = threading.Lock()
+_rate_limiter = None
+
+def _get_session() -> requests.Session:
+    # One pooled session per process; keep-alive avoids a TLS handshake per symbol.
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = getattr(settings, "FINNHUB_MAX_WORKERS", 8)
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
+
+def _get_rate_limiter() -> RateLimiter:
+    global _rate_limiter
+    if _rate_limiter is None:
+        with _session_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter(getattr(settings, "FINNHUB_REQUESTS_PER_SECOND", 25))
+    return _rate_limiter
+
 def _get(path: str, params: dict):
     token = settings.FINNHUB_API_KEY
     if not token:
         raise FinnhubError("FINNHUB_API_KEY not configured")
     params = {**params, "token": token}
-    r = requests.get(f"{BASE}{path}", params=params, timeout=getattr(settings, "HTTP_TIMEOUT", 8))
+    _get_rate_limiter().acquire()
+    r = _get_session().get(f"{BASE}{path}", params=params, timeout=getattr(settings, "HTTP_TIMEOUT", 8))
     if r.status_code != 200:
         raise FinnhubError(f"Finnhub {path} failed: {r.status_code} {r.text[:200]}")
     data = r.json()
@@ -30,13 +84,172 @@ def get_quote(symbol: str) -> dict:
     # https://finnhub.io/docs/api/quote
     return _get("/quote", {"symbol": symbol})
 
+def normalize_quote(quote: dict) -> dict:
+    # Finnhub quote fields: c=current, pc=previous close
+    return {
+        "current_price": Decimal(str(quote.get("c") or "0")),
+        "previous_close": Decimal(str(quote.get("pc") or "0")),
+    }
+
+class CacheStats:
+    COUNTERS = ("local_hits", "shared_hits", "stale_hits", "misses", "fetches", "fetch_errors", "background_refreshes")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict.fromkeys(self.COUNTERS, 0)
+            self._fetch_seconds = 0.0
+
+    def incr(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def record_fetch(self, seconds: float):
+        with self._lock:
+            self._counters["fetches"] += 1
+            self._fetch_seconds += seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            data = dict(self._counters)
+            fetch_seconds = self._fetch_seconds
+        lookups = data["local_hits"] + data["shared_hits"] + data["stale_hits"] + data["misses"]
+        data["lookups"] = lookups
+        data["hit_ratio"] = round((lookups - data["misses"]) / lookups, 4) if lookups else 0.0
+        data["avg_fetch_ms"] = round(fetch_seconds / data["fetches"] * 1000, 2) if data["fetches"] else 0.0
+        return data
+
+_local_cache = LocalLRUCache(getattr(settings, "FINNHUB_LOCAL_CACHE_SIZE", 2048))
+_stats = CacheStats()
+_refresh_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="finnhub-refresh")
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+def _cache_policy(kind: str):
+    # (fresh ttl, extra window during which a stale value is served while refreshing)
+    if kind == "profile":
+        return settings.FINNHUB_PROFILE_CACHE_TTL, settings.FINNHUB_PROFILE_STALE_TTL
+    return settings.FINNHUB_QUOTE_CACHE_TTL, settings.FINNHUB_QUOTE_STALE_TTL
+
+def _cache_key(kind: str, symbol: str) -> str:
+    return f"finnhub:{kind}:{symbol}"
+
+def _store(kind: str, symbol: str, value):
+    ttl, stale_ttl = _cache_policy(kind)
+    key = _cache_key(kind, symbol)
+    entry = {"value": value, "fetched_at": time.time()}
+    _local_cache.set(key, entry)
+    try:
+        cache.set(key, entry, timeout=ttl + stale_ttl)
+    except Exception:
+        # Shared tier is best effort; the local tier still serves this process.
+        pass
+
+def _fetch_and_store(kind: str, symbol: str, fetcher):
+    started = time.monotonic()
+    try:
+        value = fetcher(symbol)
+    except Exception:
+        _stats.incr("fetch_errors")
+        raise
+    _stats.record_fetch(time.monotonic() - started)
+    _store(kind, symbol, value)
+    return value
+
+def _background_refresh(kind: str, symbol: str, fetcher):
+    key = _cache_key(kind, symbol)
+    try:
+        _fetch_and_store(kind, symbol, fetcher)
+        _stats.incr("background_refreshes")
+    except Exception:
+        pass
+    finally:
+        with _refreshing_lock:
+            _refreshing.discard(key)
+
+def _schedule_refresh(kind: str, symbol: str, fetcher):
+    key = _cache_key(kind, symbol)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+    _refresh_pool.submit(_background_refresh, kind, symbol, fetcher)
+
+def _cached(kind: str, symbol: str, fetcher):
+    """
+    Read-through lookup: in-process LRU, then Redis (also when the local copy
+    has expired), then Finnhub.
+    Entries past their TTL but inside the stale window are returned as-is
+    while a single background refresh per key brings them up to date.
+    """
+    key = _cache_key(kind, symbol)
+    ttl, stale_ttl = _cache_policy(kind)
+    entry, tier = _local_cache.get(key), "local_hits"
+    if entry is None or time.time() - entry["fetched_at"] >= ttl:
+        # A stale local copy may already have been refreshed by another worker.
+        try:
+            shared = cache.get(key)
+        except Exception:
+            shared = None
+        if shared is not None and (entry is None or shared["fetched_at"] > entry["fetched_at"]):
+            entry, tier = shared, "shared_hits"
+            _local_cache.set(key, entry)
+
+    if entry is not None:
+        age = time.time() - entry["fetched_at"]
+        if age < ttl:
+            _stats.incr(tier)
+            return entry["value"]
+        if age < ttl + stale_ttl:
+            _stats.incr("stale_hits")
+            _schedule_refresh(kind, symbol, fetcher)
+            return entry["value"]
+
+    _stats.incr("misses")
+    return _fetch_and_store(kind, symbol, fetcher)
+
+def get_cached_profile(symbol: str) -> dict:
+    return _cached("profile", symbol.strip().upper(), get_profile)
+
+def get_cached_quote(symbol: str) -> dict:
+    return _cached("quote", symbol.strip().upper(), get_quote)
+
+def get_cache_stats() -> dict:
+    return _stats.snapshot()
+
+def get_quotes(symbols) -> dict:
+    """
+    Fetch quotes for many symbols concurrently over the shared session.
+    Returns {symbol: normalized quote}; symbols that fail are left out so one
+    bad ticker does not abort a whole refresh batch.
+    """
+    symbols = [s.strip().upper() for s in symbols if s and s.strip()]
+    if not symbols:
+        return {}
+
+    def fetch(symbol):
+        try:
+            # Always hit the network here, but warm the cache for add-by-symbol reads.
+            return symbol, normalize_quote(_fetch_and_store("quote", symbol, get_quote))
+        except (FinnhubError, requests.RequestException, ValueError):
+            return symbol, None
+
+    max_workers = min(getattr(settings, "FINNHUB_MAX_WORKERS", 8), len(symbols))
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        results = pool.map(fetch, symbols)
+    return {symbol: quote for symbol, quote in results if quote is not None}
+
 def fetch_stock_from_finnhub(symbol: str) -> dict:
     """
     Return a normalized dict for your Stock model (except description).
+    Profile and quote are served from the two-tier cache when available.
     """
     symbol = symbol.strip().upper()
-    profile = get_profile(symbol)
-    quote = get_quote(symbol)
+    profile = get_cached_profile(symbol)
+    quote = normalize_quote(get_cached_quote(symbol))
 
     # Guard basics
     name = profile.get("name") or ""
@@ -44,10 +257,6 @@ def fetch_stock_from_finnhub(symbol: str) -> dict:
     finnhub_sector = profile.get("finnhubIndustry") or ""
     sector_code = map_sector(finnhub_sector)
 
-    # Finnhub quote fields: c=current, pc=previous close
-    current_price = Decimal(str(quote.get("c") or "0"))
-    previous_close = Decimal(str(quote.get("pc") or "0"))
-
     # Finnhub marketCapitalization is typically in USD (often billions). Keep raw number; adjust if you prefer.
     market_cap_raw = profile.get("marketCapitalization")
     market_cap = int(market_cap_raw) if isinstance(market_cap_raw, (int, float)) else None
@@ -57,8 +266,8 @@ def fetch_stock_from_finnhub(symbol: str) -> dict:
         "name": name,
         "exchange": exchange,
         "sector": sector_code,
-        "current_price": current_price,
-        "previous_close": previous_close,
+        "current_price": quote["current_price"],
+        "previous_close": quote["previous_close"],
         "market_cap": market_cap,
         "website_url": profile.get("weburl") or None,
         # description handled by Groq
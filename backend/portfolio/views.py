@@ -3,7 +3,10 @@ from django.db.models import Q, Count, Sum, Avg, F, Case, When, DecimalField
 from django.utils.translation import gettext_lazy as _
 from rest_framework import permissions, viewsets, filters, status
 from rest_framework.decorators import action
-from rest_framework.exceptions import NotFound, PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
+from backend.cache import cached_response
+from backend.conditional import ConditionalGetMixin
+from backend.pagination import KeysetPagination
 from backend.utils import create_success_response, create_error_response
 from .models import Stock, Portfolio, PortfolioSummary, Wishlist, PriceAlert
 from .serializers import (
@@ -14,9 +17,10 @@ from .serializers import (
     PriceAlertListSerializer, UpdatePriceAlertStatusSerializer , AddToPortfolioBySymbolSerializer
 )
 from portfolio.services.portfolio_service import add_stock_to_portfolio_by_symbol
+from portfolio.utils.finnhub import get_cache_stats
 
 
-class StockViewSet(viewsets.ReadOnlyModelViewSet):
+class StockViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     serializer_class = StockSerializer
     permission_classes = [permissions.IsAuthenticated]
     lookup_field = "symbol"
@@ -49,7 +53,10 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
                 if value:
                     queryset = queryset.filter(**{field: value})
             
-            queryset = self._apply_price_filters(queryset, request)
+            queryset = self.apply_updated_since(self._apply_price_filters(queryset, request))
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
             
             if not queryset.exists():
                 return create_success_response(
@@ -66,12 +73,18 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
             
             return create_success_response(_("Stocks retrieved successfully."),
                                          data={'results': serializer.data, 'count': len(serializer.data)})
+        except ValidationError as e:
+            return create_error_response(_("Invalid filter parameters."), errors=e.detail)
         except Exception as error:
             return create_error_response(_("Failed to retrieve stocks."), errors=[str(error)])
 
     def retrieve(self, request, *args, **kwargs):
         try:
-            serializer = self.get_serializer(self.get_object())
+            instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
+            serializer = self.get_serializer(instance)
             return create_success_response(_("Stock retrieved successfully."), data=serializer.data)
         except NotFound:
             return create_error_response(_("Stock not found."), errors=[_("Stock does not exist")])
@@ -106,14 +119,7 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'], url_path='sectors')
     def sectors(self, request):
         try:
-            # Optimized single query with database aggregation
-            sector_stats = (Stock.objects.filter(is_active=True)
-                          .exclude(sector__isnull=True, sector__exact='')
-                          .values('sector')
-                          .annotate(stock_count=Count('id'))
-                          .order_by('sector'))
-            
-            sectors_data = list(sector_stats)
+            sectors_data = cached_response('stock-sectors', lambda: self._stock_counts('sector'), stocks=True)
             
             if not sectors_data:
                 return create_success_response(_("No sectors found."), data={'results': [], 'count': 0})
@@ -126,14 +132,7 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'], url_path='exchanges')
     def exchanges(self, request):
         try:
-            # Optimized single query with database aggregation
-            exchange_stats = (Stock.objects.filter(is_active=True)
-                            .exclude(exchange__isnull=True, exchange__exact='')
-                            .values('exchange')
-                            .annotate(stock_count=Count('id'))
-                            .order_by('exchange'))
-            
-            exchanges_data = list(exchange_stats)
+            exchanges_data = cached_response('stock-exchanges', lambda: self._stock_counts('exchange'), stocks=True)
             
             if not exchanges_data:
                 return create_success_response(_("No exchanges found."), data={'results': [], 'count': 0})
@@ -143,8 +142,21 @@ class StockViewSet(viewsets.ReadOnlyModelViewSet):
         except Exception as error:
             return create_error_response(_("Failed to retrieve exchanges."), errors=[str(error)])
 
+    def _stock_counts(self, field):
+        # Optimized single query with database aggregation
+        return list(Stock.objects.filter(is_active=True)
+                    .exclude(**{f'{field}__isnull': True, f'{field}__exact': ''})
+                    .values(field)
+                    .annotate(stock_count=Count('id'))
+                    .order_by(field))
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        # Counters are per process; they describe the worker that served this request.
+        return create_success_response(_("Finnhub cache statistics retrieved."), data=get_cache_stats())
 
-class PortfolioViewSet(viewsets.ModelViewSet):
+
+class PortfolioViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     serializer_class = PortfolioSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
@@ -152,6 +164,9 @@ class PortfolioViewSet(viewsets.ModelViewSet):
     ordering_fields = ['purchase_date', 'shares_owned', 'purchase_price', 'total_invested', 'created_at']
     ordering = ['-purchase_date']
     search_fields = ['stock__name', 'stock__symbol', 'notes', 'investment_thesis']
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-purchase_date', '-created_at', '-id')
+    conditional_dependencies = ('stock__updated_at',)
 
     def get_queryset(self):
         return Portfolio.objects.filter(
@@ -220,29 +235,38 @@ class PortfolioViewSet(viewsets.ModelViewSet):
                 }
                 queryset = queryset.filter(**{filter_map[gain_loss]: F('total_invested')})
             
-            queryset = self._apply_value_filters(queryset, request)
-            
-            if not queryset.exists():
-                return create_success_response(
-                    _("No portfolio holdings found matching your criteria."),
-                    data={'results': [], 'count': 0, 'next': None, 'previous': None}
-                )
+            queryset = self.apply_updated_since(self._apply_value_filters(queryset, request))
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
             
             page = self.paginate_queryset(queryset)
-            serializer = self.get_serializer(page or queryset, many=True)
+            serializer = self.get_serializer(page if page is not None else queryset, many=True)
             
             if page is not None:
                 return create_success_response(_("Portfolio holdings retrieved successfully."),
                                              data=self.get_paginated_response(serializer.data).data)
             
+            if not serializer.data:
+                return create_success_response(
+                    _("No portfolio holdings found matching your criteria."),
+                    data={'results': [], 'count': 0, 'next': None, 'previous': None}
+                )
+            
             return create_success_response(_("Portfolio holdings retrieved successfully."),
                                          data={'results': serializer.data, 'count': len(serializer.data)})
+        except ValidationError as e:
+            return create_error_response(_("Invalid filter parameters."), errors=e.detail)
         except Exception as error:
             return create_error_response(_("Failed to retrieve portfolio holdings."), errors=[str(error)])
 
     def retrieve(self, request, *args, **kwargs):
         try:
-            serializer = self.get_serializer(self.get_object())
+            instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
+            serializer = self.get_serializer(instance)
             return create_success_response(_("Portfolio holding retrieved successfully."), data=serializer.data)
         except NotFound:
             return create_error_response(_("Portfolio holding not found."), 
@@ -306,7 +330,7 @@ class PortfolioViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='summary')
     def summary(self, request):
         try:
-            summary = PortfolioSummary.refresh_for_user(request.user)
+            summary = PortfolioSummary.get_for_user(request.user)
             return create_success_response(_("Portfolio summary retrieved successfully."), 
                                          data=PortfolioSummarySerializer(summary).data)
         except Exception as error:
@@ -315,78 +339,86 @@ class PortfolioViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='performance')
     def performance(self, request):
         try:
-            # Database-level calculations for better performance
-            performance_data = self.get_queryset().aggregate(
-                total_invested=Sum('total_invested'),
-                current_value=Sum(F('shares_owned') * F('stock__current_price'), output_field=DecimalField()),
-                number_of_holdings=Count('id')
-            )
-            
-            if not performance_data['total_invested']:
-                return create_success_response(_("No holdings found for performance calculation."),
-                                             data={'total_invested': '0.00', 'current_value': '0.00', 'total_gain_loss': '0.00'})
-            
-            total_invested = performance_data['total_invested'] or Decimal('0.00')
-            current_value = performance_data['current_value'] or Decimal('0.00')
-            total_gain_loss = current_value - total_invested
-            gain_loss_percentage = (total_gain_loss / total_invested * 100) if total_invested > 0 else Decimal('0.00')
-            
-            # Calculate day change at database level - check if stock model has day_change or price_change field
-            try:
-                day_change = self.get_queryset().aggregate(
-                    day_change=Sum(F('shares_owned') * F('stock__day_change'), output_field=DecimalField())
-                )['day_change'] or Decimal('0.00')
-            except Exception:
-                # Fallback if day_change field doesn't exist
-                day_change = Decimal('0.00')
-            
-            return create_success_response(_("Portfolio performance retrieved successfully."), data={
-                'total_invested': str(total_invested),
-                'current_value': str(current_value),
-                'total_gain_loss': str(total_gain_loss),
-                'gain_loss_percentage': str(gain_loss_percentage),
-                'day_change': str(day_change),
-                'number_of_holdings': performance_data['number_of_holdings']
-            })
+            message, data = cached_response('portfolio-performance', self._performance, user=request.user, stocks=True)
+            return create_success_response(message, data=data)
         except Exception as error:
             return create_error_response(_("Failed to retrieve portfolio performance."), errors=[str(error)])
 
+    def _performance(self):
+        # Database-level calculations for better performance
+        performance_data = self.get_queryset().aggregate(
+            total_invested=Sum('total_invested'),
+            current_value=Sum(F('shares_owned') * F('stock__current_price'), output_field=DecimalField()),
+            number_of_holdings=Count('id')
+        )
+        
+        if not performance_data['total_invested']:
+            return (_("No holdings found for performance calculation."),
+                    {'total_invested': '0.00', 'current_value': '0.00', 'total_gain_loss': '0.00'})
+        
+        total_invested = performance_data['total_invested'] or Decimal('0.00')
+        current_value = performance_data['current_value'] or Decimal('0.00')
+        total_gain_loss = current_value - total_invested
+        gain_loss_percentage = (total_gain_loss / total_invested * 100) if total_invested > 0 else Decimal('0.00')
+        
+        # Calculate day change at database level - check if stock model has day_change or price_change field
+        try:
+            day_change = self.get_queryset().aggregate(
+                day_change=Sum(F('shares_owned') * F('stock__day_change'), output_field=DecimalField())
+            )['day_change'] or Decimal('0.00')
+        except Exception:
+            # Fallback if day_change field doesn't exist
+            day_change = Decimal('0.00')
+        
+        return _("Portfolio performance retrieved successfully."), {
+            'total_invested': str(total_invested),
+            'current_value': str(current_value),
+            'total_gain_loss': str(total_gain_loss),
+            'gain_loss_percentage': str(gain_loss_percentage),
+            'day_change': str(day_change),
+            'number_of_holdings': performance_data['number_of_holdings']
+        }
+
     @action(detail=False, methods=['get'], url_path='by-sector')
     def by_sector(self, request):
         try:
-            # Single optimized query with database-level calculations
-            sector_data = (self.get_queryset()
-                         .values('stock__sector')
-                         .annotate(
-                             holdings_count=Count('id'),
-                             total_invested=Sum('total_invested'),
-                             current_value=Sum(F('shares_owned') * F('stock__current_price'), output_field=DecimalField()),
-                             avg_purchase_price=Avg('purchase_price')
-                         )
-                         .order_by('stock__sector'))
-            
-            if not sector_data:
-                return create_success_response(_("No sector data found."), data={'results': [], 'count': 0})
+            results = cached_response('portfolio-by-sector', self._by_sector, user=request.user, stocks=True)
             
-            results = []
-            for item in sector_data:
-                current_value = item['current_value'] or Decimal('0.00')
-                total_invested = item['total_invested'] or Decimal('0.00')
-                
-                results.append({
-                    'sector': item['stock__sector'],
-                    'holdings_count': item['holdings_count'],
-                    'total_invested': str(total_invested),
-                    'current_value': str(current_value),
-                    'gain_loss': str(current_value - total_invested),
-                    'avg_purchase_price': str(item['avg_purchase_price'] or Decimal('0.00'))
-                })
+            if not results:
+                return create_success_response(_("No sector data found."), data={'results': [], 'count': 0})
             
             return create_success_response(_("Portfolio holdings by sector retrieved successfully."),
                                          data={'results': results, 'count': len(results)})
         except Exception as error:
             return create_error_response(_("Failed to retrieve portfolio holdings by sector."), errors=[str(error)])
 
+    def _by_sector(self):
+        # Single optimized query with database-level calculations
+        sector_data = (self.get_queryset()
+                     .values('stock__sector')
+                     .annotate(
+                         holdings_count=Count('id'),
+                         total_invested=Sum('total_invested'),
+                         current_value=Sum(F('shares_owned') * F('stock__current_price'), output_field=DecimalField()),
+                         avg_purchase_price=Avg('purchase_price')
+                     )
+                     .order_by('stock__sector'))
+        
+        results = []
+        for item in sector_data:
+            current_value = item['current_value'] or Decimal('0.00')
+            total_invested = item['total_invested'] or Decimal('0.00')
+            
+            results.append({
+                'sector': item['stock__sector'],
+                'holdings_count': item['holdings_count'],
+                'total_invested': str(total_invested),
+                'current_value': str(current_value),
+                'gain_loss': str(current_value - total_invested),
+                'avg_purchase_price': str(item['avg_purchase_price'] or Decimal('0.00'))
+            })
+        return results
+
     @action(detail=False, methods=['post'], url_path='bulk-add')
     def bulk_add(self, request):
         try:
@@ -434,30 +466,34 @@ class PortfolioViewSet(viewsets.ModelViewSet):
         """Get sorted holdings by performance - optimized with database sorting"""
         try:
             limit = min(int(request.query_params.get('limit', 10)), 50)
-            
-            # Calculate performance at database level for sorting
-            holdings = (self.get_queryset()
-                       .annotate(
-                           current_value=F('shares_owned') * F('stock__current_price'),
-                           gain_loss_pct=Case(
-                               When(total_invested__gt=0, 
-                                   then=(F('shares_owned') * F('stock__current_price') - F('total_invested')) / F('total_invested') * 100),
-                               default=Decimal('0.00'),
-                               output_field=DecimalField()
-                           )
-                       )
-                       .order_by('-gain_loss_pct' if reverse else 'gain_loss_pct')[:limit])
-            
-            if not holdings:
-                return create_success_response(_("No holdings found."), data={'results': [], 'count': 0})
-            
-            serializer = PortfolioListSerializer(holdings, many=True)
-            message = (_("Top performing holdings retrieved successfully.") if reverse 
-                      else _("Worst performing holdings retrieved successfully."))
-            
-            return create_success_response(message, data={'results': serializer.data, 'count': len(serializer.data)})
         except ValueError:
             return create_error_response(_("Invalid limit parameter."), errors=[_("Limit must be a valid number")])
+        
+        name = 'portfolio-top-performers' if reverse else 'portfolio-worst-performers'
+        results = cached_response(name, lambda: self._sorted_holdings(limit, reverse), user=request.user, params=(limit,), stocks=True)
+        
+        if not results:
+            return create_success_response(_("No holdings found."), data={'results': [], 'count': 0})
+        
+        message = (_("Top performing holdings retrieved successfully.") if reverse 
+                  else _("Worst performing holdings retrieved successfully."))
+        
+        return create_success_response(message, data={'results': results, 'count': len(results)})
+
+    def _sorted_holdings(self, limit, reverse):
+        # Calculate performance at database level for sorting
+        holdings = (self.get_queryset()
+                   .annotate(
+                       current_value=F('shares_owned') * F('stock__current_price'),
+                       gain_loss_pct=Case(
+                           When(total_invested__gt=0, 
+                               then=(F('shares_owned') * F('stock__current_price') - F('total_invested')) / F('total_invested') * 100),
+                           default=Decimal('0.00'),
+                           output_field=DecimalField()
+                       )
+                   )
+                   .order_by('-gain_loss_pct' if reverse else 'gain_loss_pct')[:limit])
+        return PortfolioListSerializer(holdings, many=True).data
 
     @action(detail=False, methods=['get'], url_path='top-performers')
     def top_performers(self, request):
@@ -493,7 +529,7 @@ class PortfolioViewSet(viewsets.ModelViewSet):
             return create_error_response(_("Failed to add stock to portfolio."), errors=[str(e)])
 
 
-class WishlistViewSet(viewsets.ModelViewSet):
+class WishlistViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     filterset_fields = ['priority', 'is_active', 'email_alerts_enabled']
@@ -501,6 +537,7 @@ class WishlistViewSet(viewsets.ModelViewSet):
     ordering_fields = ['priority', 'created_at', 'updated_at', 'target_buy_price']
     ordering = ['priority', '-created_at']
     search_fields = ['stock__name', 'stock__symbol', 'notes', 'watch_reason']
+    conditional_dependencies = ('stock__updated_at',)
 
     def get_queryset(self):
         return Wishlist.objects.filter(
@@ -517,7 +554,10 @@ class WishlistViewSet(viewsets.ModelViewSet):
 
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
+            queryset = self.apply_updated_since(self.filter_queryset(self.get_queryset()))
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
             page = self.paginate_queryset(queryset)
             serializer = self.get_serializer(page if page is not None else queryset, many=True)
             count = queryset.count() if page is None else len(page)
@@ -526,13 +566,19 @@ class WishlistViewSet(viewsets.ModelViewSet):
                    else {'results': serializer.data, 'count': count})
             
             return create_success_response(_("Wishlist items retrieved successfully."), data=data)
+        except ValidationError as e:
+            return create_error_response(_("Invalid filter parameters."), errors=e.detail)
         except Exception as error:
             return create_error_response(_("Failed to retrieve wishlist."), errors=[str(error)])
 
     def retrieve(self, request, *args, **kwargs):
         try:
+            instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
             return create_success_response(_("Wishlist item retrieved successfully."), 
-                                         data=WishlistSerializer(self.get_object()).data)
+                                         data=WishlistSerializer(instance).data)
         except NotFound:
             return create_error_response(_("Wishlist item not found."), 
                                        errors=[_("Wishlist item does not exist")])
@@ -631,7 +677,7 @@ class WishlistViewSet(viewsets.ModelViewSet):
             return create_error_response(_("Failed to fetch priority-sorted wishlist."), errors=[str(error)])
 
 
-class PriceAlertViewSet(viewsets.GenericViewSet):
+class PriceAlertViewSet(ConditionalGetMixin, viewsets.GenericViewSet):
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.OrderingFilter, filters.SearchFilter]
     filterset_fields = ['alert_type', 'status', 'email_sent']
@@ -639,6 +685,8 @@ class PriceAlertViewSet(viewsets.GenericViewSet):
     ordering = ['-created_at']
     search_fields = ['wishlist_item__stock__name', 'wishlist_item__stock__symbol']
     queryset = PriceAlert.objects.none()
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
         return PriceAlert.objects.filter(
@@ -654,7 +702,10 @@ class PriceAlertViewSet(viewsets.GenericViewSet):
 
     def list(self, request, *args, **kwargs):
         try:
-            queryset = self.filter_queryset(self.get_queryset())
+            queryset = self.apply_updated_since(self.filter_queryset(self.get_queryset()))
+            not_modified = self.not_modified(queryset)
+            if not_modified is not None:
+                return not_modified
             page = self.paginate_queryset(queryset)
             serializer = PriceAlertListSerializer(page if page is not None else queryset, many=True)
             
@@ -662,13 +713,19 @@ class PriceAlertViewSet(viewsets.GenericViewSet):
                    else {'results': serializer.data, 'count': len(serializer.data)})
             
             return create_success_response(_("Price alerts retrieved successfully."), data=data)
+        except ValidationError as e:
+            return create_error_response(_("Invalid filter parameters."), errors=e.detail)
         except Exception as error:
             return create_error_response(_("Failed to retrieve price alerts."), errors=[str(error)])
 
     def retrieve(self, request, *args, **kwargs):
         try:
+            instance = self.get_object()
+            not_modified = self.object_not_modified(instance)
+            if not_modified is not None:
+                return not_modified
             return create_success_response(_("Price alert details retrieved."), 
-                                         data=PriceAlertSerializer(self.get_object()).data)
+                                         data=PriceAlertSerializer(instance).data)
         except NotFound:
             return create_error_response(_("Price alert not found."), errors=[_("Alert does not exist")])
         except Exception as error:
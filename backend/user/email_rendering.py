@@ -0,0 +1,41 @@
+# user/email_rendering.py
+import re
+from functools import lru_cache
+from django.template.loader import get_template
+from django.utils.html import escape
+
+PLACEHOLDER = re.compile(r"{{\s*(\w+)\s*}}")
+
+class CompiledTemplate:
+    """
+    A template split once into its static chunks and placeholder names.
+    Rendering joins the cached chunks with the substituted fields, so the
+    large static HTML/CSS is never re-parsed or rebuilt per mail.
+    """
+
+    def __init__(self, source: str, autoescape: bool):
+        parts = PLACEHOLDER.split(source)
+        self.chunks = parts[0::2]
+        self.fields = parts[1::2]
+        self.autoescape = autoescape
+
+    def render(self, context: dict) -> str:
+        out = [self.chunks[0]]
+        for field, chunk in zip(self.fields, self.chunks[1:]):
+            value = str(context[field])
+            out.append(escape(value) if self.autoescape else value)
+            out.append(chunk)
+        return "".join(out)
+
+@lru_cache(maxsize=None)
+def get_compiled_template(name: str) -> CompiledTemplate:
+    # The Django loader only locates the file (app template dirs); compiling happens once per process.
+    source = get_template(name).template.source
+    return CompiledTemplate(source, autoescape=name.endswith(".html"))
+
+def render_email(kind: str, context: dict):
+    """Return (text, html) for emails/<kind>.txt and emails/<kind>.html."""
+    return (
+        get_compiled_template(f"emails/{kind}.txt").render(context),
+        get_compiled_template(f"emails/{kind}.html").render(context),
+    )
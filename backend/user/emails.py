@@ -0,0 +1,90 @@
+# user/emails.py
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from .email_rendering import render_email
+
+VERIFICATION_SUBJECT = 'Email Verification Code - US'
+
+PRICE_ALERT_SUBJECT = 'Price alert: {symbol} reached your target'
+
+BUDGET_ALERT_SUBJECT = 'Budget alert: {percentage}% of your monthly budget used'
+
+def _message(subject, kind, context, to_email, connection=None):
+    text, html = render_email(kind, context)
+    message = EmailMultiAlternatives(
+        subject=subject,
+        body=text,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[to_email],
+        connection=connection,
+    )
+    message.attach_alternative(html, 'text/html')
+    return message
+
+def build_verification_message(to_email, context, connection=None):
+    return _message(VERIFICATION_SUBJECT, 'verification', context, to_email, connection)
+
+def build_price_alert_message(to_email, context, connection=None):
+    return _message(PRICE_ALERT_SUBJECT.format(**context), 'price_alert', context, to_email, connection)
+
+def build_budget_alert_message(to_email, context, connection=None):
+    return _message(BUDGET_ALERT_SUBJECT.format(**context), 'budget_alert', context, to_email, connection)
+
+def retry_delay(attempts: int) -> timedelta:
+    """Exponential backoff: base, 2*base, 4*base ... capped at EMAIL_RETRY_MAX_SECONDS."""
+    base = getattr(settings, 'EMAIL_RETRY_BASE_SECONDS', 60)
+    cap = getattr(settings, 'EMAIL_RETRY_MAX_SECONDS', 60 * 60)
+    return timedelta(seconds=min(base * 2 ** max(attempts - 1, 0), cap))
+
+def deliver(items, build):
+    """
+    Send one message per item over a single SMTP connection.
+    build(item, connection) returns the message; every message is sent on
+    its own so one rejected recipient only fails that item. If the
+    connection cannot be opened at all, every item fails with that error.
+    Returns (sent_items, [(item, error)], stats).
+    """
+    sent, failed = [], []
+    started = time.monotonic()
+    if items:
+        connection = get_connection(fail_silently=False)
+        try:
+            connection.open()
+        except Exception as exc:
+            failed = [(item, str(exc)[:500]) for item in items]
+        else:
+            try:
+                for item in items:
+                    try:
+                        build(item, connection).send()
+                        sent.append(item)
+                    except Exception as exc:
+                        failed.append((item, str(exc)[:500]))
+            finally:
+                connection.close()
+
+    elapsed = time.monotonic() - started
+    stats = {
+        'sent': len(sent),
+        'failed': len(failed),
+        'elapsed_seconds': round(elapsed, 2),
+        'mails_per_second': round(len(sent) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    return sent, failed, stats
+
+def queue_email(kind, to_email, context):
+    """Store a mail in the outbox and wake the dispatcher once the row is committed."""
+    from .models import EmailOutbox
+    from .tasks import dispatch_pending_emails
+
+    entry = EmailOutbox.objects.create(kind=kind, to_email=to_email, context=context)
+    transaction.on_commit(lambda: dispatch_pending_emails.delay())
+    return entry
+
+def queue_verification_email(otp_code, to_email):
+    from .models import EmailOutbox
+
+    return queue_email(EmailOutbox.Kind.VERIFICATION, to_email, {'otp_code': otp_code})
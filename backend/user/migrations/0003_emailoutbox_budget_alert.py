@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0002_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='kind',
+            field=models.CharField(choices=[('VERIFICATION', 'Email Verification'), ('BUDGET_ALERT', 'Budget Alert')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 06:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_emailoutbox_budget_alert'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('ACCOUNT', 'Account'), ('TRANSACTION', 'Transaction'), ('BUDGET', 'Budget'), ('PORTFOLIO', 'Portfolio Holding'), ('WISHLIST', 'Wishlist Item')], max_length=20)),
+                ('object_id', models.UUIDField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'sync_tombstones',
+                'indexes': [models.Index(fields=['user', 'entity', 'deleted_at', 'id'], name='sync_tombst_user_id_14cae0_idx'), models.Index(fields=['entity', 'object_id'], name='sync_tombst_entity_a04658_idx'), models.Index(fields=['deleted_at'], name='sync_tombst_deleted_f39b14_idx')],
+            },
+        ),
+    ]
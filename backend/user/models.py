@@ -93,3 +93,75 @@ class PendingUser(models.Model):
         db_table = 'pending_user'
 
 
+
+class EmailOutbox(models.Model):
+    class Kind(models.TextChoices):
+        VERIFICATION = 'VERIFICATION', 'Email Verification'
+        BUDGET_ALERT = 'BUDGET_ALERT', 'Budget Alert'
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        SENDING = 'SENDING', 'Sending'
+        SENT = 'SENT', 'Sent'
+        FAILED = 'FAILED', 'Failed'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    to_email = models.EmailField()
+    context = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.PENDING)
+    attempts = models.IntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'email_outbox'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} to {self.to_email} ({self.status})"
+
+
+class SyncTombstone(models.Model):
+    """
+    A row that left a user's synced data set: deleted, or deactivated for
+    the models that soft-delete with is_active. The sync endpoint streams
+    these alongside changed rows so clients can drop their local copies.
+    """
+    class Entity(models.TextChoices):
+        ACCOUNT = 'ACCOUNT', 'Account'
+        TRANSACTION = 'TRANSACTION', 'Transaction'
+        BUDGET = 'BUDGET', 'Budget'
+        PORTFOLIO = 'PORTFOLIO', 'Portfolio Holding'
+        WISHLIST = 'WISHLIST', 'Wishlist Item'
+
+    user = models.ForeignKey(UserCustom, on_delete=models.CASCADE, related_name='sync_tombstones')
+    entity = models.CharField(max_length=20, choices=Entity.choices)
+    object_id = models.UUIDField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = 'sync_tombstones'
+        indexes = [
+            models.Index(fields=['user', 'entity', 'deleted_at', 'id']),
+            models.Index(fields=['entity', 'object_id']),
+            models.Index(fields=['deleted_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id} removed at {self.deleted_at}"
+
+    @classmethod
+    def record(cls, user_id, entity, object_ids):
+        now = timezone.now()
+        cls.objects.bulk_create([
+            cls(user_id=user_id, entity=entity, object_id=object_id, deleted_at=now) for object_id in object_ids
+        ])
+
+    @classmethod
+    def forget(cls, entity, object_id):
+        """Drop the tombstones of a row that came back (reactivated), so clients never see it removed after re-adding it."""
+        cls.objects.filter(entity=entity, object_id=object_id).delete()
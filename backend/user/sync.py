@@ -0,0 +1,167 @@
+# user/sync.py
+import base64
+import json
+import uuid
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, models
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from expense.filters import DateRange
+from expense.models import Account, Budget, MonthlySpendingRollup, Transaction, TransactionStatus, TransactionType
+from expense.serializers import AccountListSerializer, BudgetListSerializer, TransactionListSerializer
+from portfolio.models import Portfolio, Wishlist
+from portfolio.serializers import PortfolioListSerializer, WishlistListSerializer
+from .models import SyncTombstone
+
+def _updated_at():
+    return models.F('updated_at')
+
+def _with_stock_price():
+    # Holdings and wishlist rows serialise the stock's live price, so a price refresh changes them too.
+    return Greatest('updated_at', 'stock__updated_at')
+
+def _budget_version():
+    # Spending moves current_month_expenses without touching the budget row, and so do a new month
+    # starting and an expense dated later in the month falling due.
+    now = timezone.now()
+    month = DateRange.for_month(now)
+    spending = MonthlySpendingRollup.objects.filter(
+        user_id=models.OuterRef('user_id'), month=month.date_from,
+        type=TransactionType.EXPENSE, status=TransactionStatus.COMPLETED,
+    ).values('user_id').annotate(latest=models.Max('updated_at')).values('latest')
+    due = month.filter(Transaction.objects.filter(
+        user_id=models.OuterRef('user_id'), type=TransactionType.EXPENSE,
+        status=TransactionStatus.COMPLETED, date__lte=now,
+    )).values('user_id').annotate(latest=models.Max('date')).values('latest')
+    return Greatest(
+        'updated_at', Coalesce(models.Subquery(spending), 'updated_at'),
+        Coalesce(models.Subquery(due), 'updated_at'), models.Value(month.start),
+    )
+
+# name -> (tombstone entity, live rows, list serializer, version expression)
+ENTITIES = {
+    'accounts': (SyncTombstone.Entity.ACCOUNT, Account.objects.all, AccountListSerializer, _updated_at),
+    'transactions': (SyncTombstone.Entity.TRANSACTION, Transaction.objects.all, TransactionListSerializer, _updated_at),
+    'budget': (SyncTombstone.Entity.BUDGET, Budget.objects.all, BudgetListSerializer, _budget_version),
+    'holdings': (SyncTombstone.Entity.PORTFOLIO, lambda: Portfolio.objects.filter(is_active=True), PortfolioListSerializer, _with_stock_price),
+    'wishlist': (SyncTombstone.Entity.WISHLIST, lambda: Wishlist.objects.filter(is_active=True), WishlistListSerializer, _with_stock_price),
+}
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+def decode_cursor(name, cursor):
+    """[row version, row id, tombstone time, tombstone id]; ValidationError keyed by the entity on garbage."""
+    try:
+        version, row_id, deleted_at, tombstone_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        row_id = str(uuid.UUID(row_id)) if row_id is not None else None
+        position = [parse_datetime(version) if version else None, row_id, parse_datetime(deleted_at), int(tombstone_id)]
+        if position[2] is None or (version and position[0] is None):
+            raise ValueError(cursor)
+        return position
+    except (ValueError, TypeError, AttributeError):
+        raise ValidationError({name: [_("Invalid sync cursor; start a full sync without one.")]})
+
+def commit_horizon(now):
+    """
+    Newest version a sync may hand out. Versions are stamped when a row is
+    written, not when its transaction commits, so a long transaction (a
+    whole-file import, a recurring batch) can commit rows older than ones a
+    client already synced past. On Postgres the horizon therefore stays
+    behind the start of the oldest transaction still open; a stuck session
+    delays syncs, it never drops a change. SYNC_COMMIT_LAG_SECONDS covers the
+    moment between stamping a row and its transaction starting, and is the
+    whole margin elsewhere.
+    """
+    horizon = now
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT min(xact_start) FROM pg_stat_activity"
+                " WHERE datname = current_database() AND backend_type = 'client backend' AND pid <> pg_backend_pid()"
+            )
+            oldest = cursor.fetchone()[0]
+        if oldest is not None:
+            horizon = min(horizon, oldest)
+    return horizon - timedelta(seconds=getattr(settings, 'SYNC_COMMIT_LAG_SECONDS', 2))
+
+def _after(field, value, pk):
+    return models.Q(**{f'{field}__gt': value}) | models.Q(**{field: value, 'pk__gt': pk})
+
+def sync_entity(user, name, cursor, limit, horizon, context=None):
+    """
+    One page of changes for `name` since `cursor` (None for a full sync):
+    live rows whose version moved past the cursor, oldest first, and the
+    ids of rows that left the set. Changes newer than `horizon` wait for the
+    next sync (see commit_horizon), so rows committed after a newer-stamped
+    one are not skipped. A cursor older than the tombstone retention window cannot be
+    trusted for deletes, so it restarts as a full sync with reset=True.
+    """
+    tombstone_entity, rows, serializer_class, version = ENTITIES[name]
+    retention = timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+    position = decode_cursor(name, cursor) if cursor else None
+    reset = position is not None and position[2] < timezone.now() - retention
+    if position is None or reset:
+        position = [None, None, horizon, 0]
+
+    queryset = rows().filter(user=user)
+    if hasattr(serializer_class, 'setup_eager_loading'):
+        queryset = serializer_class.setup_eager_loading(queryset)
+    queryset = queryset.annotate(sync_version=version()).filter(sync_version__lte=horizon)
+    if position[0] is not None:
+        queryset = queryset.filter(_after('sync_version', position[0], position[1]))
+    changed = list(queryset.order_by('sync_version', 'pk')[:limit + 1])
+
+    tombstones = list(
+        SyncTombstone.objects.filter(user=user, entity=tombstone_entity, deleted_at__lte=horizon)
+        .filter(_after('deleted_at', position[2], position[3]))
+        .order_by('deleted_at', 'pk')
+        .values_list('pk', 'object_id', 'deleted_at')[:limit + 1]
+    )
+
+    has_more = len(changed) > limit or len(tombstones) > limit
+    changed, tombstones = changed[:limit], tombstones[:limit]
+    if changed:
+        position[0:2] = [changed[-1].sync_version, str(changed[-1].pk)]
+    if tombstones:
+        position[2:4] = [tombstones[-1][2], tombstones[-1][0]]
+
+    return {
+        'changed': serializer_class(changed, many=True, context=context).data,
+        'deleted': [str(object_id) for _pk, object_id, _deleted_at in tombstones],
+        'cursor': encode_cursor([position[0].isoformat() if position[0] else None, position[1], position[2].isoformat(), position[3]]),
+        'has_more': has_more,
+        'reset': reset,
+    }
+
+def sync_changes(user, params, context=None):
+    """
+    Delta sync for the mobile client: ?<entity>=<cursor> per entity (omit it
+    for a full sync), optional ?entities=accounts,holdings to restrict the
+    set and ?limit=N rows per entity. Clients apply `deleted` before
+    `changed` and call again with the returned cursors while has_more.
+    """
+    names = [name.strip() for name in params.get('entities', '').split(',') if name.strip()] or list(ENTITIES)
+    unknown = [name for name in names if name not in ENTITIES]
+    if unknown:
+        raise ValidationError({'entities': [_("Unknown entities: %(names)s.") % {'names': ', '.join(unknown)}]})
+
+    default_limit = getattr(settings, 'SYNC_PAGE_SIZE', 500)
+    try:
+        limit = int(params.get('limit', default_limit))
+    except ValueError:
+        limit = default_limit
+    limit = min(max(limit, 1), getattr(settings, 'SYNC_MAX_PAGE_SIZE', 2000))
+
+    now = timezone.now()
+    horizon = commit_horizon(now)
+    entities = {name: sync_entity(user, name, params.get(name), limit, horizon, context) for name in names}
+    return {
+        'server_time': now.isoformat(),
+        'has_more': any(entity['has_more'] for entity in entities.values()),
+        'entities': entities,
+    }
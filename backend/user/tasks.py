@@ -1,180 +1,103 @@
+from datetime import timedelta
 from celery import shared_task
 from django.conf import settings
-from django.core.mail import send_mail
+from django.db import transaction
+from django.utils import timezone
+from .emails import (
+    build_budget_alert_message, build_verification_message, deliver, queue_verification_email, retry_delay
+)
+from .models import EmailOutbox, SyncTombstone
+
+BUILDERS = {
+    EmailOutbox.Kind.VERIFICATION: build_verification_message,
+    EmailOutbox.Kind.BUDGET_ALERT: build_budget_alert_message,
+}
 
 @shared_task()
 def send_verification_email(otp_code, user_email):
-    html_message = f"""
-        <!DOCTYPE html>
-        <html lang="en">
-        <head>
-            <meta charset="UTF-8">
-            <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <title>Email Verification</title>
-            <style>
-                body {{
-                    margin: 0;
-                    padding: 0;
-                    font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif;
-                    line-height: 1.5;
-                    color: #0f172a;
-                    background-color: #f8fafc;
-                }}
-                .container {{
-                    max-width: 500px;
-                    margin: 40px auto;
-                    background-color: #ffffff;
-                    border-radius: 12px;
-                    border: 1px solid #e2e8f0;
-                    box-shadow: 0 1px 3px rgba(0, 0, 0, 0.1);
-                    overflow: hidden;
-                }}
-                .header {{
-                    background-color: #ffffff;
-                    padding: 32px 24px 0;
-                    text-align: center;
-                    border-bottom: 1px solid #f1f5f9;
-                }}
-                .header h1 {{
-                    margin: 0 0 8px 0;
-                    font-size: 24px;
-                    font-weight: 600;
-                    color: #0f172a;
-                }}
-                .header p {{
-                    margin: 0 0 24px 0;
-                    font-size: 14px;
-                    color: #64748b;
-                }}
-                .content {{
-                    padding: 32px 24px;
-                    text-align: center;
-                }}
-                .otp-container {{
-                    background-color: #f8fafc;
-                    border: 2px dashed #cbd5e1;
-                    border-radius: 8px;
-                    padding: 24px;
-                    margin: 24px 0;
-                }}
-                .otp-label {{
-                    font-size: 14px;
-                    font-weight: 500;
-                    color: #475569;
-                    margin-bottom: 8px;
-                }}
-                .otp-code {{
-                    font-size: 32px;
-                    font-weight: 700;
-                    color: #0f172a;
-                    letter-spacing: 4px;
-                    font-family: 'Courier New', monospace;
-                }}
-                .content p {{
-                    color: #475569;
-                    font-size: 14px;
-                    margin: 16px 0;
-                    line-height: 1.6;
-                }}
-                .warning {{
-                    background-color: #fef3c7;
-                    border: 1px solid #f59e0b;
-                    border-radius: 6px;
-                    padding: 12px;
-                    margin: 20px 0;
-                    font-size: 13px;
-                    color: #92400e;
-                }}
-                .footer {{
-                    background-color: #f8fafc;
-                    padding: 24px;
-                    text-align: center;
-                    border-top: 1px solid #f1f5f9;
-                }}
-                .footer p {{
-                    color: #64748b;
-                    font-size: 12px;
-                    margin: 4px 0;
-                }}
-                @media only screen and (max-width: 600px) {{
-                    .container {{
-                        margin: 20px;
-                    }}
-                    .content {{
-                        padding: 24px 16px;
-                    }}
-                    .header {{
-                        padding: 24px 16px 0;
-                    }}
-                    .otp-code {{
-                        font-size: 28px;
-                    }}
-                }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <div class="header">
-                    <h1>Email Verification</h1>
-                    <p>Complete your account setup</p>
-                </div>
-                
-                <div class="content">
-                    <p>Hi there,</p>
-                    <p>Thank you for registering with us! Please use the verification code below to complete your account setup.</p>
-                    
-                    <div class="otp-container">
-                        <div class="otp-label">Your verification code:</div>
-                        <div class="otp-code">{otp_code}</div>
-                    </div>
-                    
-                    <p>Enter this code in the verification form to activate your account.</p>
-                    
-                    <div class="warning">
-                        <strong>⏰ Important:</strong> This code will expire in 10 minutes for security reasons.
-                    </div>
-                    
-                    <p>If you didn't create an account with us, you can safely ignore this email.</p>
-                </div>
-                
-                <div class="footer">
-                    <p><strong>Thanks,</strong></p>
-                    <p><strong>The US Team</strong></p>
-                    <p style="margin-top: 12px;">Need help? Contact us at support@yourcompany.com</p>
-                </div>
-            </div>
-        </body>
-        </html>
-        """
-        
-    plain_message = f"""
-        Email Verification
-        
-        Hi there,
-        
-        Thank you for registering with us! Please use the verification code below to complete your account setup.
-        
-        Your verification code: {otp_code}
-        
-        Enter this code in the verification form to activate your account.
-        
-        IMPORTANT: This code will expire in 10 minutes for security reasons.
-        
-        If you didn't create an account with us, you can safely ignore this email.
-        
-        Thanks,
-        The US Team
-        
-        Need help? Contact us at support@yourcompany.com
-        """
-        
-    send_mail(
-        subject='Email Verification Code - US',
-        message=plain_message,
-        html_message=html_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user_email],
-        fail_silently=False,
-    )
-        
-        
\ No newline at end of file
+    """Kept for messages queued under the old task name; the mail now goes through the outbox."""
+    return queue_verification_email(otp_code, user_email).pk
+
+def _claim_pending_emails(batch_size, lease):
+    """
+    Lease up to batch_size due rows in a short transaction: SKIP LOCKED keeps
+    concurrent dispatchers apart, and the claimed rows move to SENDING until
+    the lease runs out, so a worker that dies mid-batch only delays them.
+    The attempt is counted at claim time, so a mail that crashes the worker
+    still runs out of attempts.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        batch = list(
+            EmailOutbox.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[EmailOutbox.Status.PENDING, EmailOutbox.Status.SENDING], next_attempt_at__lte=now)
+            .order_by('next_attempt_at')[:batch_size]
+        )
+        for entry in batch:
+            entry.status = EmailOutbox.Status.SENDING
+            entry.next_attempt_at = now + lease
+            entry.attempts += 1
+        EmailOutbox.objects.bulk_update(batch, ['status', 'next_attempt_at', 'attempts'])
+    return batch
+
+@shared_task()
+def dispatch_pending_emails():
+    """
+    Send due outbox mails in batches over one SMTP connection per batch.
+    Rows are claimed in one short transaction, sent with no transaction
+    open, and the outcome is written in another; failures (including a
+    connection that cannot be opened) are retried with exponential backoff
+    until EMAIL_MAX_ATTEMPTS, after which the row is marked FAILED.
+    """
+    batch_size = getattr(settings, 'EMAIL_DISPATCH_BATCH_SIZE', 200)
+    max_attempts = getattr(settings, 'EMAIL_MAX_ATTEMPTS', 5)
+    lease = timedelta(seconds=getattr(settings, 'EMAIL_CLAIM_LEASE_SECONDS', 600))
+    totals = {'sent': 0, 'failed': 0, 'elapsed_seconds': 0.0}
+
+    while True:
+        batch = _claim_pending_emails(batch_size, lease)
+        if not batch:
+            break
+
+        sent, failed, stats = deliver(
+            batch, lambda entry, connection: BUILDERS[entry.kind](entry.to_email, entry.context, connection)
+        )
+        now = timezone.now()
+        for entry in sent:
+            entry.status = EmailOutbox.Status.SENT
+            entry.sent_at = now
+        for entry, error in failed:
+            entry.last_error = error
+            if entry.attempts >= max_attempts:
+                entry.status = EmailOutbox.Status.FAILED
+            else:
+                entry.status = EmailOutbox.Status.PENDING
+                entry.next_attempt_at = now + retry_delay(entry.attempts)
+        EmailOutbox.objects.bulk_update(batch, ['status', 'sent_at', 'last_error', 'next_attempt_at'])
+
+        totals['sent'] += stats['sent']
+        totals['failed'] += stats['failed']
+        totals['elapsed_seconds'] += stats['elapsed_seconds']
+        if len(batch) < batch_size:
+            break
+
+    elapsed = totals['elapsed_seconds']
+    totals['elapsed_seconds'] = round(elapsed, 2)
+    totals['mails_per_second'] = round(totals['sent'] / elapsed, 2) if elapsed > 0 else 0.0
+    return totals
+
+@shared_task()
+def prune_email_outbox():
+    """Delete delivered and given-up mails (their context holds OTP codes) after EMAIL_OUTBOX_RETENTION_DAYS."""
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'EMAIL_OUTBOX_RETENTION_DAYS', 3))
+    deleted, _per_model = EmailOutbox.objects.filter(
+        status__in=[EmailOutbox.Status.SENT, EmailOutbox.Status.FAILED], created_at__lt=cutoff
+    ).delete()
+    return {'deleted': deleted}
+
+@shared_task()
+def prune_sync_tombstones():
+    """Drop tombstones past SYNC_TOMBSTONE_RETENTION_DAYS; older sync cursors are answered with a full reset instead."""
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 90))
+    deleted, _per_model = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+    return {'deleted': deleted}
@@ -1,3 +1,176 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from django.core import mail
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from expense.models import Account
+from portfolio.models import Stock, Wishlist
+from .email_rendering import CompiledTemplate, get_compiled_template, render_email
+from .emails import build_price_alert_message, queue_verification_email
+from .models import EmailOutbox, SyncTombstone, UserCustom
+from .sync import encode_cursor, sync_changes
+from .tasks import _claim_pending_emails, dispatch_pending_emails, prune_email_outbox
 
-# Create your tests here.
+
+class EmailOutboxTests(TestCase):
+    LEASE = timedelta(minutes=10)
+
+    def queue(self, count=1):
+        return [queue_verification_email(f'{index:06d}', f'user{index}@example.com') for index in range(count)]
+
+    def test_dispatch_sends_due_mail_in_batches(self):
+        self.queue(3)
+        with self.settings(EMAIL_DISPATCH_BATCH_SIZE=2):
+            result = dispatch_pending_emails()
+
+        self.assertEqual((result['sent'], result['failed']), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn('000001', mail.outbox[1].body)
+        self.assertEqual(set(EmailOutbox.objects.values_list('status', 'attempts')), {(EmailOutbox.Status.SENT, 1)})
+
+    def test_claim_leases_rows_until_the_lease_runs_out(self):
+        entry, = self.queue()
+        claimed = _claim_pending_emails(10, self.LEASE)
+        self.assertEqual([row.pk for row in claimed], [entry.pk])
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), (EmailOutbox.Status.SENDING, 1))
+        self.assertEqual(_claim_pending_emails(10, self.LEASE), [])
+
+        # The worker that held the lease died: the row is claimed again once it expires.
+        EmailOutbox.objects.filter(pk=entry.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual([row.attempts for row in _claim_pending_emails(10, self.LEASE)], [2])
+
+    def test_connection_failure_backs_off_then_gives_up(self):
+        entry, = self.queue()
+        connection = mock.Mock()
+        connection.open.side_effect = OSError('connection refused')
+        with self.settings(EMAIL_MAX_ATTEMPTS=2), mock.patch('user.emails.get_connection', return_value=connection):
+            self.assertEqual(dispatch_pending_emails()['failed'], 1)
+            entry.refresh_from_db()
+            self.assertEqual((entry.status, entry.last_error), (EmailOutbox.Status.PENDING, 'connection refused'))
+            self.assertGreater(entry.next_attempt_at, timezone.now())
+
+            EmailOutbox.objects.filter(pk=entry.pk).update(next_attempt_at=timezone.now())
+            dispatch_pending_emails()
+        entry.refresh_from_db()
+        self.assertEqual((entry.status, entry.attempts), (EmailOutbox.Status.FAILED, 2))
+        self.assertEqual(mail.outbox, [])
+
+    def test_prune_keeps_open_and_recent_mail(self):
+        old_sent, old_pending, recent_sent = self.queue(3)
+        EmailOutbox.objects.filter(pk__in=[old_sent.pk, recent_sent.pk]).update(status=EmailOutbox.Status.SENT)
+        EmailOutbox.objects.filter(pk__in=[old_sent.pk, old_pending.pk]).update(created_at=timezone.now() - timedelta(days=4))
+
+        self.assertEqual(prune_email_outbox(), {'deleted': 1})
+        self.assertFalse(EmailOutbox.objects.filter(pk=old_sent.pk).exists())
+
+
+class EmailRenderingTests(TestCase):
+    CONTEXT = {'symbol': 'A&B', 'name': '<Acme>', 'target_price': '10.00', 'actual_price': '9.50'}
+
+    def test_matches_the_django_template_output(self):
+        text, html = render_email('price_alert', self.CONTEXT)
+        self.assertEqual(html, render_to_string('emails/price_alert.html', self.CONTEXT))
+        self.assertIn('&lt;Acme&gt;', html)
+        self.assertIn('<Acme>', text)
+
+    def test_templates_are_compiled_once(self):
+        self.assertIs(get_compiled_template('emails/verification.txt'), get_compiled_template('emails/verification.txt'))
+
+    def test_placeholders_allow_spacing_and_repeats(self):
+        template = CompiledTemplate('{{a}}-{{ b }}-{{  a }}', autoescape=True)
+        self.assertEqual(template.render({'a': '<', 'b': 2}), '&lt;-2-&lt;')
+
+    def test_missing_field_fails_loudly(self):
+        with self.assertRaises(KeyError):
+            render_email('verification', {})
+
+    def test_message_carries_both_parts(self):
+        message = build_price_alert_message('watcher@example.com', self.CONTEXT)
+        self.assertEqual(message.subject, 'Price alert: A&B reached your target')
+        self.assertEqual(message.alternatives[0][1], 'text/html')
+
+
+@override_settings(SYNC_COMMIT_LAG_SECONDS=0)
+class SyncTests(TestCase):
+    def setUp(self):
+        self.user = UserCustom.objects.create_user(username='syncer', email='syncer@example.com')
+        self.accounts = [
+            Account.objects.create(user=self.user, name=f'Account {index}', balance=Decimal('10.00')) for index in range(3)
+        ]
+        other = UserCustom.objects.create_user(username='bystander', email='bystander@example.com')
+        Account.objects.create(user=other, name='Not mine', balance=Decimal('10.00'))
+
+    def sync(self, **params):
+        return sync_changes(self.user, {'entities': 'accounts', **params})['entities']['accounts']
+
+    def ids(self, page):
+        return [row['id'] for row in page['changed']]
+
+    def test_pages_then_returns_only_changes_and_deletes(self):
+        seen, page = [], self.sync(limit=2)
+        seen += self.ids(page)
+        self.assertTrue(page['has_more'])
+        page = self.sync(limit=2, accounts=page['cursor'])
+        seen += self.ids(page)
+        self.assertFalse(page['has_more'])
+        self.assertEqual(sorted(seen), sorted(str(account.pk) for account in self.accounts))
+        cursor = page['cursor']
+
+        self.assertEqual(self.ids(self.sync(accounts=cursor)), [])
+        renamed, removed = self.accounts[0], self.accounts[1]
+        removed_id = str(removed.pk)
+        renamed.name = 'Renamed'
+        renamed.save()
+        removed.delete()
+
+        page = self.sync(accounts=cursor)
+        self.assertEqual((self.ids(page), page['deleted'], page['reset']), ([str(renamed.pk)], [removed_id], False))
+        page = self.sync(accounts=page['cursor'])
+        self.assertEqual((page['changed'], page['deleted']), ([], []))
+
+    def test_rows_inside_the_commit_lag_wait_for_the_next_sync(self):
+        cursor = self.sync()['cursor']
+        late = Account.objects.create(user=self.user, name='Late', balance=Decimal('1.00'))
+        with self.settings(SYNC_COMMIT_LAG_SECONDS=60):
+            page = self.sync(accounts=cursor)
+        self.assertEqual(self.ids(page), [])
+        self.assertEqual(self.ids(self.sync(accounts=page['cursor'])), [str(late.pk)])
+
+    def test_cursor_past_tombstone_retention_resets(self):
+        stale = encode_cursor([None, None, (timezone.now() - timedelta(days=91)).isoformat(), 0])
+        page = self.sync(accounts=stale)
+        self.assertTrue(page['reset'])
+        self.assertEqual(len(page['changed']), 3)
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ('garbage', encode_cursor([None, 'not-a-uuid', timezone.now().isoformat(), 0])):
+            with self.assertRaises(ValidationError) as raised:
+                self.sync(accounts=cursor)
+            self.assertIn('accounts', raised.exception.detail)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/user/sync/', {'accounts': 'garbage'})
+        self.assertFalse(response.data['success'])
+        self.assertFalse(client.get('/user/sync/', {'entities': 'accounts,nope'}).data['success'])
+
+    def test_deactivated_wishlist_item_is_tombstoned_until_it_returns(self):
+        stock = Stock.objects.create(symbol='SYNC', name='Sync', exchange='NYSE', current_price=Decimal('5.0000'), previous_close=Decimal('5.0000'))
+        item = Wishlist.objects.create(user=self.user, stock=stock, target_buy_price=Decimal('4.0000'))
+        wishlist = lambda **params: sync_changes(self.user, {'entities': 'wishlist', **params})['entities']['wishlist']
+        cursor = wishlist()['cursor']
+
+        item.is_active = False
+        item.save()
+        page = wishlist(wishlist=cursor)
+        self.assertEqual((page['changed'], page['deleted']), ([], [str(item.pk)]))
+
+        item.is_active = True
+        item.save()
+        self.assertFalse(SyncTombstone.objects.filter(object_id=item.pk).exists())
+        self.assertEqual(self.ids(wishlist(wishlist=page['cursor'])), [str(item.pk)])
@@ -9,4 +9,5 @@ urlpatterns = [
     path('auth/resend-verification/', views.resend_verification_email_view, name='resend-verification'),
     path('auth/delete-user/', views.user_deletion_view, name='user-deletion'),
     path('auth/logout/', views.user_logout_view, name='user-logout'),
+    path('sync/', views.sync_view, name='sync'),
 ]
\ No newline at end of file
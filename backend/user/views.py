@@ -7,6 +7,7 @@ from django.conf import settings
 from django.db import transaction
 from django.utils import timezone
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import (api_view, 
                                        permission_classes,
                                        throttle_classes)
@@ -17,7 +18,8 @@ from rest_framework_simplejwt.tokens import RefreshToken
 
 from . import models, serializers, throttles
 from .error_codes import ErrorCodes
-from . import tasks
+from .emails import queue_verification_email
+from .sync import sync_changes
 from backend.utils import create_auth_response, create_success_response, create_error_response
 from rest_framework_simplejwt.exceptions import TokenError
 
@@ -128,7 +130,7 @@ def user_registration_view(request):
         if not otp_code:
             raise ValueError("OTP generation failed")   
          
-        tasks.send_verification_email.delay(otp_code, pending_user.email)
+        queue_verification_email(otp_code, pending_user.email)
     except ValueError as err:
         pending_user.delete()
         return create_error_response(message=str(err), error_codes=[ErrorCodes.OTP_GENERATION_FAILURE])
@@ -206,7 +208,7 @@ def resend_verification_email_view(request):
             pending_user.save()
         
         otp_code = pending_user.generate_otp()
-        send_verification_email.delay(otp_code, pending_user.email)
+        queue_verification_email(otp_code, pending_user.email)
 
         return create_success_response("Verification email sent successfully",data={"email": pending_user.email})
             
@@ -301,6 +303,21 @@ def user_logout_view(request):
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
         
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def sync_view(request):
+    try:
+        data = sync_changes(request.user, request.query_params, context={'request': request})
+        return create_success_response("Changes retrieved successfully", data=data)
+    except ValidationError as e:
+        return create_error_response("Invalid sync parameters", errors=e.detail, error_codes=[ErrorCodes.VALIDATION_ERROR])
+    except Exception as e:
+        return create_error_response(
+            "An unexpected error occurred while syncing", 
+            error_codes=[ErrorCodes.INTERNAL_ERROR],
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
 @api_view(['POST'])
 def password_reset_view(request):
     pass